@@ -15,6 +15,13 @@ import csv
 import re
 from numpy import arctan2
 from numpy import pi
+from scipy.spatial import cKDTree
+
+from railway_network import loadRailNetwork
+from linear_referencing import LinearReferencingIndex
+from vector_output import createVectorOutput, getLayerName
+from process_pool import getNumberOfWorkers, mapInOrder
+from vector_geometry import getLineStringWkb
 
 railwayWidth = 1.8
 
@@ -65,169 +72,91 @@ def is_number(n):
     return is_number
 
 
+def processRailway(arguments):
+    # centerline of a railway as WKB, in a worker process
+    firstRailWkb, secondRailWkb, output_measures, resample_step = arguments
+    firstRailGeom = ogr.CreateGeometryFromWkb(firstRailWkb)
+    secondRailGeom = ogr.CreateGeometryFromWkb(secondRailWkb)
+    if firstRailGeom.GetPointCount() == 0 or secondRailGeom.GetPointCount() < 2:
+        # empty centerline for rails without enough vertices
+        centerlineMeasures = None
+        if output_measures:
+            centerlineMeasures = numpy.zeros(0, dtype=numpy.float64)
+        return getLineStringWkb(numpy.zeros((0, 2), dtype=numpy.float64), centerlineMeasures)
+    firstRailPoints = numpy.array(firstRailGeom.GetPoints(), dtype=numpy.float64).reshape(
+        firstRailGeom.GetPointCount(), -1)[:, 0:2]
+    secondRailPoints = numpy.array(secondRailGeom.GetPoints(), dtype=numpy.float64).reshape(
+        secondRailGeom.GetPointCount(), -1)[:, 0:2]
+    # nearest and second nearest vertices of the second rail for all vertices of the first rail
+    secondRailTree = cKDTree(secondRailPoints)
+    nearestDistances, nearestPositions = secondRailTree.query(firstRailPoints, k=2)
+    firstSecondRailPoints = secondRailPoints[nearestPositions[:, 0]]
+    secondSecondRailPoints = secondRailPoints[nearestPositions[:, 1]]
+    # foot of the perpendicular from each first rail vertex to the line of its two
+    # second rail vertices by parametric projection, stable for vertical lines
+    directions = secondSecondRailPoints - firstSecondRailPoints
+    squaredLengths = numpy.einsum('ij,ij->i', directions, directions)
+    factors = numpy.einsum('ij,ij->i', firstRailPoints - firstSecondRailPoints, directions)
+    factors = numpy.divide(factors, squaredLengths, out=numpy.zeros_like(factors),
+                           where=squaredLengths > 0.)
+    footPoints = firstSecondRailPoints + factors[:, None] * directions
+    centerlinePoints = 0.5 * (firstRailPoints + footPoints)
+    centerlineMeasures = None
+    if resample_step is None and not output_measures:
+        return getLineStringWkb(centerlinePoints, centerlineMeasures)
+    centerlineIndex = LinearReferencingIndex(centerlinePoints)
+    centerlineChainages = centerlineIndex.vertex_chainages
+    if resample_step is not None and centerlineIndex.lengths.size > 0:
+        # vertices at fixed chainage step, and the last one at the end of the centerline
+        centerlineChainages = centerlineIndex.getStepChainages(resample_step)
+        centerlinePoints, centerlineDirections = centerlineIndex.pointAtChainage(centerlineChainages)
+    if output_measures:
+        # chainage along the centerline as M values
+        centerlineMeasures = centerlineChainages
+    return getLineStringWkb(centerlinePoints, centerlineMeasures)
+
+
 def process(input_shapefile,
             input_shapefile_field_idRail,
             input_shapefile_field_idRailway,
-            output_shapefile):
+            output_shapefile,
+            workers=1,
+            output_measures=False,
+            resample_step=None):
     str_error = ''
     str_error = ''
-    driver = ogr.GetDriverByName('ESRI Shapefile')
-    input_ds = None
-    try:
-        input_ds = driver.Open(input_shapefile, 0)  # 0 means read-only. 1 means writeable.
-    except Exception as e:
-        assert err.err_level == gdal.CE_Failure, (
-            'The handler error level should now be at failure')
-        assert err.err_msg == e.args[0], 'raised exception should contain the message'
-        str_error = "Function process"
-        str_error = ('Handled warning: level={}, no={}, msg={}'.format(
-            err.err_level, err.err_no, err.err_msg))
-        return str_error
-    layer = input_ds.GetLayer()
-    geometry_type = layer.GetGeomType()
-    if geometry_type != ogr.wkbLineString \
-            and geometry_type != ogr.wkbLineStringM \
-            and geometry_type != ogr.wkbLineStringZM \
-            and geometry_type != ogr.wkbLineString25D:
-        str_error = "Function process"
-        str_error += "\nNot LineString geometry type in file:\n{}".format(input_shapefile)
-        return str_error
-    layer_definition = layer.GetLayerDefn()
-    field_idRail_index = layer_definition.GetFieldIndex(input_shapefile_field_idRail)
-    if field_idRail_index == -1:
-        str_error = "Function process"
-        str_error += "\nField: {} not exists in file:\n{}".format(input_shapefile_field_idRail,
-                                                                     input_shapefile)
-        return str_error
-    field_idRail_type = layer_definition.GetFieldDefn(field_idRail_index).GetType()
-    if not field_idRail_type == ogr.OFTInteger \
-            and not field_idRail_type == ogr.OFTString \
-            and not field_idRail_type == ogr.OFTReal:
-        str_error = "Function process"
-        str_error += "\nField: {} is not valid type in file:\n{}".format(input_shapefile_field_idRail,
-                                                                 input_shapefile)
-        return str_error
-    field_idRailway_index = layer_definition.GetFieldIndex(input_shapefile_field_idRailway)
-    if field_idRailway_index == -1:
-        str_error = "Function process"
-        str_error += "\nField: {} not exists in file:\n{}".format(input_shapefile_field_idRailway,
-                                                                     input_shapefile)
-        return str_error
-    field_idRailway_type = layer_definition.GetFieldDefn(field_idRailway_index).GetType()
-    if not field_idRailway_type == ogr.OFTInteger \
-            and not field_idRailway_type == ogr.OFTString\
-            and not field_idRailway_type == ogr.OFTReal:
-        str_error = "Function process"
-        str_error += "\nField: {} is not valid type in file:\n{}".format(input_shapefile_field_idRailway,
-                                                                 input_shapefile)
+    str_error, network = loadRailNetwork(input_shapefile,
+                                         input_shapefile_field_idRail,
+                                         input_shapefile_field_idRailway)
+    if str_error:
         return str_error
-    number_of_features = layer.GetFeatureCount()
-    input_crs = layer.GetSpatialRef()
-    rails = {}
-    railways = {}
-    for feature in layer:
-        geom = feature.GetGeometryRef().Clone()
-        str_railId = feature.GetFieldAsString(field_idRail_index).lower()
-        if str_railId in rails:
-            str_error = "Function process"
-            str_error += "\nRepeated rail id: {} in file:\n{}".format(str_railId,
-                                                                      input_shapefile)
-            return str_error
-        str_railwayId = feature.GetFieldAsString(field_idRailway_index).lower()
-        rail = {}
-        rail['railwayId'] = str_railwayId
-        rail['geom'] = geom
-        rails[str_railId] = rail
-        if not str_railwayId in railways:
-            railsInRailway = []
-            railways[str_railwayId] = railsInRailway
-        if len(railways[str_railwayId]) == 2:
-            str_error = "Function process"
-            str_error += "\nMore than two rails in railway id: {} in file:\n{}".format(str_railwayId,
-                                                                                       input_shapefile)
-            return str_error
-        if str_railId in railways[str_railwayId]:
-            str_error = "Function process"
-            str_error += "\nRepeated rail id: {} in railway id: {} file:\n{}".format(str_railId,
-                                                                                     str_railwayId,
-                                                                                     input_shapefile)
-            return str_error
-        railways[str_railwayId].append(str_railId)
-    # Create the output Layer
-    outDriver = ogr.GetDriverByName("ESRI Shapefile")
-    # Remove output shapefile if it already exists
-    if os.path.exists(output_shapefile):
-        outDriver.DeleteDataSource(output_shapefile)
-    if os.path.exists(output_shapefile):
+    input_crs = network.getCrs()
+    railways = network.railways
+    # Create the output Layer, removing output file if it already exists
+    str_output_error, output_ds = createVectorOutput(output_shapefile)
+    if str_output_error:
         str_error = "Function process"
-        str_error += "\nError removing existing output file:\n{}".format(output_shapefile)
+        str_error += "\n" + str_output_error
         return str_error
-    output_ds = outDriver.CreateDataSource(output_shapefile)
-    outLayer = output_ds.CreateLayer(output_shapefile.split(".")[0], input_crs, geom_type=ogr.wkbLineString)
-    outLayerDefn = outLayer.GetLayerDefn()
-    outLayer.CreateField(ogr.FieldDefn("id", ogr.OFTInteger))
-    outLayer.CreateField(ogr.FieldDefn("railway", ogr.OFTString))
-    outLayer.CreateField(ogr.FieldDefn("enabled", ogr.OFTInteger))
+    geometry_type = ogr.wkbLineString
+    if output_measures:
+        geometry_type = ogr.wkbLineStringM
+    outLayer = output_ds.createLayer(getLayerName(output_shapefile), input_crs, geometry_type,
+                                     [("id", ogr.OFTInteger),
+                                      ("railway", ogr.OFTString),
+                                      ("enabled", ogr.OFTInteger)])
+    outLayerDefn = outLayer.getLayerDefinition()
     cont_feature = 0
     # geom_boxes = []
+    railways_arguments = []
     for railwayId in railways.keys():
-        geom_centerline = ogr.Geometry(ogr.wkbLineString)
-        firstRailId = railways[railwayId][0]
-        secondRailId = railways[railwayId][1]
-        firstRailGeom = rails[firstRailId]['geom']
-        secondRailGeom = rails[secondRailId]['geom']
-        firstRailPoints = firstRailGeom.GetPoints()
-        secondRailPoints = secondRailGeom.GetPoints()
-        for npto in range(len(firstRailPoints)):
-            pto_1 = firstRailPoints[npto]
-            minDistance = 100000
-            secondPoints = {}
-            cont = 0
-            posMinimumDistance = -1
-            for npto2 in range(len(secondRailPoints)):
-                pto_2 = secondRailPoints[npto2]
-                dis = distance(pto_1[0], pto_1[1], pto_2[0], pto_2[1])
-                secondPoint = {}
-                secondPoint['distance'] = dis
-                secondPoint['x'] = pto_2[0]
-                secondPoint['y'] = pto_2[1]
-                secondPoints[cont] = secondPoint
-                if dis < minDistance:
-                    posMinimumDistance = cont
-                    minDistance = dis
-                cont = cont + 1
-            minDistance = 100000
-            posSecondMinimumDistance = -1
-            for secondPointKey in secondPoints.keys():
-                if secondPointKey == posMinimumDistance:
-                    continue
-                if secondPoints[secondPointKey]['distance'] < minDistance:
-                    minDistance = secondPoints[secondPointKey]['distance']
-                    posSecondMinimumDistance = secondPointKey
-            x = pto_1[0]
-            y = pto_1[1]
-            x2_1 = secondPoints[posMinimumDistance]['x']
-            y2_1 = secondPoints[posMinimumDistance]['y']
-            x2_2 = secondPoints[posSecondMinimumDistance]['x']
-            y2_2 = secondPoints[posSecondMinimumDistance]['y']
-            # y = m x + n
-            m2 = tan(pi/2)
-            if abs(x2_2-x2_1) > 0.001:
-                m2 = (y2_2-y2_1) / (x2_2-x2_1)
-            n2 = y2_1 - m2 * x2_1
-            m1 = -1.0 / m2
-            n1 = y - m1 * x
-            # m1 * x + n1 = m2 * x + n2
-            # x = (n1 - n2) / (m2 - m1)
-            if abs(m2 - m1) > 0.000000000001:
-                xI = (n1 - n2) / (m2 - m1)
-            else:
-                xI = tan(pi/2)
-            yI = m1 * xI + n1
-            yI_2 = m2 * xI + n2
-            x_cl = (x + xI) / 2.
-            y_cl = (y + yI) / 2.
-            geom_centerline.AddPoint(x_cl, y_cl)
+        railways_arguments.append((network.getRailWkb(railways[railwayId][0]),
+                                   network.getRailWkb(railways[railwayId][1]),
+                                   output_measures,
+                                   resample_step))
+    centerlines_wkb = mapInOrder(processRailway, railways_arguments, workers)
+    for railwayId, centerline_wkb in zip(railways.keys(), centerlines_wkb):
+        geom_centerline = ogr.CreateGeometryFromWkb(centerline_wkb)
 
         outFeature = ogr.Feature(outLayerDefn)
         cont_feature = cont_feature + 1
@@ -236,9 +165,9 @@ def process(input_shapefile,
         outFeature.SetField("enabled", 1)
         outFeature.SetGeometry(geom_centerline)
         # Add new feature to output Layer
-        outLayer.CreateFeature(outFeature)
+        outLayer.createFeature(outFeature)
         outFeature = None
-    output_ds = None
+    output_ds.close()
     return str_error
 
 
@@ -255,7 +184,14 @@ def main():
     parser.add_option("--input_shapefile_field_idRailway", dest="input_shapefile_field_idRailway", action="store", type="string",
                       help="Identifier railway field name in input shapefile", default=None)
     parser.add_option("--output_shapefile", dest="output_shapefile", action="store", type="string",
-                      help="Output shapefile", default=None)
+                      help="Output file, shapefile, GeoPackage or FlatGeobuf by extension: shp, gpkg or fgb",
+                      default=None)
+    parser.add_option("--workers", dest="workers", action="store", type="string",
+                      help="Number of processes for railways, number of CPUs by default", default=None)
+    parser.add_option("--output_measures", dest="output_measures", action="store", type="string",
+                      help="Optional, 1 for centerlines with chainage as M values, 0 by default", default=None)
+    parser.add_option("--resample_step", dest="resample_step", action="store", type="string",
+                      help="Optional, centerline vertices at this chainage step, in meters", default=None)
     (options, args) = parser.parse_args()
     if not options.input_shapefile:
         parser.print_help()
@@ -276,6 +212,22 @@ def main():
     input_shapefile_field_idRail = options.input_shapefile_field_idRail
     input_shapefile_field_idRailway = options.input_shapefile_field_idRailway
     output_shapefile = options.output_shapefile
+    str_error, workers = getNumberOfWorkers(options.workers)
+    if str_error:
+        print("Error:\n{}".format(str_error))
+        return
+    output_measures = False
+    if options.output_measures:
+        if options.output_measures != '0' and options.output_measures != '1':
+            print("Error:\nInvalid output measures: {}, must be 0 or 1".format(options.output_measures))
+            return
+        output_measures = options.output_measures == '1'
+    resample_step = None
+    if options.resample_step:
+        if not is_number(options.resample_step) or float(options.resample_step) <= 0.:
+            print("Error:\nInvalid resample step: {}".format(options.resample_step))
+            return
+        resample_step = float(options.resample_step)
     # if exists(output_shapefile):
     #     try:
     #         os.remove(output_shapefile)
@@ -289,7 +241,10 @@ def main():
     str_error = process(input_shapefile,
                         input_shapefile_field_idRail,
                         input_shapefile_field_idRailway,
-                        output_shapefile)
+                        output_shapefile,
+                        workers,
+                        output_measures,
+                        resample_step)
     if str_error:
         print("Error:\n{}".format(str_error))
         return
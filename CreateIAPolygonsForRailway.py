@@ -16,6 +16,13 @@ import re
 from numpy import arctan2
 from numpy import pi
 
+from spatial_index import GridIndex, STRtree
+from linear_referencing import LinearReferencingIndex
+from railway_network import loadRailNetwork
+from vector_output import createVectorOutput, getLayerName
+from process_pool import getNumberOfWorkers, mapInOrder
+from vector_geometry import getLineStringWkb, getPolygonWkb, getPolygons
+
 railwayWidth = 1.8
 
 def azimuth(xi, yi, xj, yj):
@@ -34,6 +41,172 @@ def distance(xi,yi,xj,yj):
     return value
 
 
+def getSectionBoxes(points, sectionLength, sectionWidth, sectionsDistance):
+    # corners of the section boxes along a rail, as array (number of sections, 5, 2),
+    # centers every sectionLength + sectionsDistance from 1 m after the first point
+    rail_index = LinearReferencingIndex(points)
+    if rail_index.lengths.size == 0:
+        return numpy.zeros((0, 5, 2), dtype=numpy.float64)
+    centers = numpy.arange(1.0 + sectionLength / 2., rail_index.length, sectionLength + sectionsDistance)
+    center_points, directions = rail_index.pointAtChainage(centers)
+    normals = numpy.stack((-directions[:, 1], directions[:, 0]), axis=1)
+    starts = center_points - (sectionLength / 2.) * directions
+    boxes = numpy.empty((centers.size, 5, 2), dtype=numpy.float64)
+    boxes[:, 0] = starts + (sectionWidth / 2. + railwayWidth / 4.) * normals
+    boxes[:, 1] = boxes[:, 0] + sectionLength * directions
+    boxes[:, 2] = boxes[:, 1] - (sectionWidth + railwayWidth / 2.) * normals
+    boxes[:, 3] = boxes[:, 2] - sectionLength * directions
+    boxes[:, 4] = boxes[:, 0]
+    return boxes
+
+
+def getRailSegments(points):
+    # segments of a rail as starts and ends arrays, with an index of their boxes
+    points = numpy.array(points, dtype=numpy.float64).reshape(len(points), -1)[:, 0:2]
+    points = points[numpy.concatenate(([True], numpy.any(numpy.diff(points, axis=0) != 0., axis=1)))]
+    starts = points[:-1]
+    ends = points[1:]
+    boxes = numpy.concatenate((numpy.minimum(starts, ends), numpy.maximum(starts, ends)), axis=1)
+    return starts, ends, STRtree(boxes)
+
+
+def clipRingToHalfPlane(ring, normal, offset):
+    # Sutherland-Hodgman, keeps points with dot(normal, point) <= offset
+    clipped = []
+    number_of_points = len(ring)
+    for npto in range(number_of_points):
+        pto_1 = ring[npto]
+        pto_2 = ring[(npto + 1) % number_of_points]
+        value_1 = normal[0] * pto_1[0] + normal[1] * pto_1[1] - offset
+        value_2 = normal[0] * pto_2[0] + normal[1] * pto_2[1] - offset
+        if value_1 <= 0.:
+            clipped.append(pto_1)
+        if (value_1 < 0. < value_2) or (value_2 < 0. < value_1):
+            factor = value_1 / (value_1 - value_2)
+            clipped.append((pto_1[0] + factor * (pto_2[0] - pto_1[0]), pto_1[1] + factor * (pto_2[1] - pto_1[1])))
+    return clipped
+
+
+def clipBoxToRailBuffer(box, rail_segments, bufferDistance, tolerance=0.001):
+    # Intersection of a section box with the buffer of a rail when the rail is straight
+    # near the box, where the buffer is a strip between two parallel lines. Returns
+    # (True, ring or None if empty) or (False, None) if GEOS must be used
+    starts, ends, segments_tree = rail_segments
+    min_x, min_y = numpy.min(box, axis=0) - bufferDistance
+    max_x, max_y = numpy.max(box, axis=0) + bufferDistance
+    candidates = segments_tree.query((min_x, min_y, max_x, max_y))
+    if candidates.size == 0:
+        return True, None
+    # rail ends near the box are rounded caps
+    for rail_end in [starts[0], ends[-1]]:
+        if min_x <= rail_end[0] <= max_x and min_y <= rail_end[1] <= max_y:
+            return False, None
+    line_start = starts[candidates[0]]
+    direction = ends[candidates[0]] - line_start
+    length = sqrt(direction[0] ** 2 + direction[1] ** 2)
+    if length == 0.:
+        return False, None
+    normal = numpy.array((-direction[1], direction[0])) / length
+    points = numpy.concatenate((starts[candidates], ends[candidates]))
+    if numpy.max(numpy.abs((points - line_start) @ normal)) > tolerance:
+        return False, None
+    line_offset = float(normal @ line_start)
+    ring = [tuple(pto) for pto in box[:-1]]
+    ring = clipRingToHalfPlane(ring, normal, line_offset + bufferDistance)
+    ring = clipRingToHalfPlane(ring, -normal, -line_offset + bufferDistance)
+    if len(ring) < 3:
+        return True, None
+    ring.append(ring[0])
+    return True, numpy.array(ring, dtype=numpy.float64)
+
+
+def getRailwayChunks(firstRailPoints, secondRailPoints, chunkLength, bufferWidth):
+    # sublines of both rails by chunks of chunkLength along the first rail and the cell of
+    # each chunk, between the normals of the first rail at the chunk ends. The second rail is
+    # cut at the chainages of its nearest points to the chunk ends in the first rail. Sublines
+    # are longer than the chunk by the cell half width, so the buffers clipped by the cells
+    # have the same union as the buffers of the full rails
+    firstRailIndex = LinearReferencingIndex(firstRailPoints)
+    secondRailIndex = LinearReferencingIndex(secondRailPoints)
+    starts, ends = firstRailIndex.getChunkChainages(chunkLength)
+    end_points, end_directions = firstRailIndex.pointAtChainage(ends[:-1])
+    second_ends = []
+    rails_distance = 0.
+    for end_point in end_points:
+        second_end, distance = secondRailIndex.chainageOfPoint(end_point)
+        second_ends.append(second_end)
+        rails_distance = max(rails_distance, distance)
+    if secondRailIndex.length > 0.:
+        rails_distance = max(rails_distance, firstRailIndex.chainageOfPoint(secondRailPoints[0])[1],
+                             firstRailIndex.chainageOfPoint(secondRailPoints[-1])[1])
+    second_ends = numpy.maximum.accumulate(numpy.array(second_ends + [secondRailIndex.length]))
+    second_starts = numpy.concatenate(([0.], second_ends[:-1]))
+    half_width = 2. * (rails_distance + bufferWidth)
+    # first and last cells beyond the rail ends, so the buffer ends are not clipped
+    cell_starts = starts.copy()
+    cell_ends = ends.copy()
+    cell_starts[0] = -half_width
+    cell_ends[-1] = firstRailIndex.length + half_width
+    chunks = []
+    for chunk in range(starts.size):
+        chunks.append((firstRailIndex.getSubline(starts[chunk] - half_width, ends[chunk] + half_width),
+                       secondRailIndex.getSubline(second_starts[chunk] - half_width,
+                                                  second_ends[chunk] + half_width),
+                       firstRailIndex.getChunkCell(cell_starts[chunk], cell_ends[chunk], half_width)))
+    return chunks
+
+
+def getRailwayBuffers(firstRailGeom, secondRailGeom, widthForRailway, widthForRail):
+    geom_union = firstRailGeom.Union(secondRailGeom)
+    geom_box = geom_union.Buffer(widthForRailway)
+    geom_boxFirstRail = firstRailGeom.Buffer(widthForRail/2.)
+    geom_boxSecondRail = secondRailGeom.Buffer(widthForRail/2.)
+    return [geom_box, geom_boxFirstRail, geom_boxSecondRail]
+
+
+def processRailway(arguments):
+    # railway and rails polygons as lists of polygon WKB, in a worker process. With the cell
+    # of a chunk, buffers are clipped by it so chunks do not overlap
+    firstRailWkb, secondRailWkb, widthForRailway, widthForRail, cellWkb = arguments
+    firstRailGeom = ogr.CreateGeometryFromWkb(firstRailWkb)
+    secondRailGeom = ogr.CreateGeometryFromWkb(secondRailWkb)
+    geoms = getRailwayBuffers(firstRailGeom, secondRailGeom, widthForRailway, widthForRail)
+    if cellWkb is not None:
+        cellGeom = ogr.CreateGeometryFromWkb(cellWkb)
+        geoms = [geom.Intersection(cellGeom) for geom in geoms]
+    return [[polygon.ExportToWkb() for polygon in getPolygons(geom)] for geom in geoms]
+
+
+def processRailwaySegments(arguments):
+    # section boxes of a railway as WKB, in a worker process, before removing duplicated boxes
+    firstRailWkb, secondRailWkb, sectionLength, sectionWidth, sectionsDistance = arguments
+    firstRailGeom = ogr.CreateGeometryFromWkb(firstRailWkb)
+    secondRailGeom = ogr.CreateGeometryFromWkb(secondRailWkb)
+    # secondGeomBuffer = secondRailGeom.Buffer(sectionWidth/2.+railwayWidth/4.)
+    secondGeomBuffer = None
+    secondRailSegments = getRailSegments(secondRailGeom.GetPoints())
+    section_boxes = getSectionBoxes(firstRailGeom.GetPoints(), sectionLength, sectionWidth, sectionsDistance)
+    geom_boxes_wkb = []
+    for section_box in section_boxes:
+        # GEOS only for boxes near curves or ends of the second rail
+        fast_clip, clipped_box = clipBoxToRailBuffer(section_box, secondRailSegments, railwayWidth/4.)
+        if fast_clip:
+            if clipped_box is None:
+                continue
+            geom_box = ogr.CreateGeometryFromWkb(getPolygonWkb(clipped_box))
+        else:
+            if secondGeomBuffer is None:
+                secondGeomBuffer = secondRailGeom.Buffer(railwayWidth/4.)
+            geom_poly = ogr.CreateGeometryFromWkb(getPolygonWkb(section_box))
+            geom_box = geom_poly.Intersection(secondGeomBuffer)
+        if geom_box is None or geom_box.IsEmpty() or geom_box.GetGeometryType() != ogr.wkbPolygon:
+            continue
+        if len(geom_box.GetGeometryRef(0).GetPoints()) > 9:
+            continue
+        geom_boxes_wkb.append(geom_box.ExportToWkb())
+    return geom_boxes_wkb
+
+
 class OptionParser(optparse.OptionParser):
     def check_required(self, opt):
         option = self.get_option(opt)
@@ -72,166 +245,90 @@ def process(input_shapefile,
             widthForRailway,
             widthForRail,
             objectTypeRailway,
-            objectTypeRail):
+            objectTypeRail,
+            workers=1,
+            chunkLength=None):
     str_error = ''
-    driver = ogr.GetDriverByName('ESRI Shapefile')
-    input_ds = None
-    try:
-        input_ds = driver.Open(input_shapefile, 0)  # 0 means read-only. 1 means writeable.
-    except Exception as e:
-        assert err.err_level == gdal.CE_Failure, (
-            'The handler error level should now be at failure')
-        assert err.err_msg == e.args[0], 'raised exception should contain the message'
-        str_error = "Function process"
-        str_error = ('Handled warning: level={}, no={}, msg={}'.format(
-            err.err_level, err.err_no, err.err_msg))
-        return str_error
-    layer = input_ds.GetLayer()
-    geometry_type = layer.GetGeomType()
-    if geometry_type != ogr.wkbLineString \
-            and geometry_type != ogr.wkbLineStringM \
-            and geometry_type != ogr.wkbLineStringZM \
-            and geometry_type != ogr.wkbLineString25D:
-        str_error = "Function process"
-        str_error += "\nNot LineString geometry type in file:\n{}".format(input_shapefile)
-        return str_error
-    layer_definition = layer.GetLayerDefn()
-    field_idRail_index = layer_definition.GetFieldIndex(input_shapefile_field_idRail)
-    if field_idRail_index == -1:
-        str_error = "Function process"
-        str_error += "\nField: {} not exists in file:\n{}".format(input_shapefile_field_idRail,
-                                                                     input_shapefile)
-        return str_error
-    field_idRail_type = layer_definition.GetFieldDefn(field_idRail_index).GetType()
-    if not field_idRail_type == ogr.OFTInteger \
-            and not field_idRail_type == ogr.OFTString \
-            and not field_idRail_type == ogr.OFTReal:
-        str_error = "Function process"
-        str_error += "\nField: {} is not valid type in file:\n{}".format(input_shapefile_field_idRail,
-                                                                 input_shapefile)
-        return str_error
-    field_idRailway_index = layer_definition.GetFieldIndex(input_shapefile_field_idRailway)
-    if field_idRailway_index == -1:
-        str_error = "Function process"
-        str_error += "\nField: {} not exists in file:\n{}".format(input_shapefile_field_idRailway,
-                                                                     input_shapefile)
-        return str_error
-    field_idRailway_type = layer_definition.GetFieldDefn(field_idRailway_index).GetType()
-    if not field_idRailway_type == ogr.OFTInteger \
-            and not field_idRailway_type == ogr.OFTString\
-            and not field_idRailway_type == ogr.OFTReal:
-        str_error = "Function process"
-        str_error += "\nField: {} is not valid type in file:\n{}".format(input_shapefile_field_idRailway,
-                                                                 input_shapefile)
+    str_error, network = loadRailNetwork(input_shapefile,
+                                         input_shapefile_field_idRail,
+                                         input_shapefile_field_idRailway)
+    if str_error:
         return str_error
-    number_of_features = layer.GetFeatureCount()
-    input_crs = layer.GetSpatialRef()
-    rails = {}
-    railways = {}
-    for feature in layer:
-        geom = feature.GetGeometryRef().Clone()
-        str_railId = feature.GetFieldAsString(field_idRail_index).lower()
-        if str_railId in rails:
-            str_error = "Function process"
-            str_error += "\nRepeated rail id: {} in file:\n{}".format(str_railId,
-                                                                      input_shapefile)
-            return str_error
-        str_railwayId = feature.GetFieldAsString(field_idRailway_index).lower()
-        rail = {}
-        rail['railwayId'] = str_railwayId
-        rail['geom'] = geom
-        rails[str_railId] = rail
-        if not str_railwayId in railways:
-            railsInRailway = []
-            railways[str_railwayId] = railsInRailway
-        if len(railways[str_railwayId]) == 2:
-            str_error = "Function process"
-            str_error += "\nMore than two rails in railway id: {} in file:\n{}".format(str_railwayId,
-                                                                                       input_shapefile)
-            return str_error
-        if str_railId in railways[str_railwayId]:
-            str_error = "Function process"
-            str_error += "\nRepeated rail id: {} in railway id: {} file:\n{}".format(str_railId,
-                                                                                     str_railwayId,
-                                                                                     input_shapefile)
-            return str_error
-        railways[str_railwayId].append(str_railId)
-    # Create the output Layer
-    outDriver = ogr.GetDriverByName("ESRI Shapefile")
-    # Remove output shapefile if it already exists
-    if os.path.exists(output_shapefile):
-        outDriver.DeleteDataSource(output_shapefile)
-    if os.path.exists(output_shapefile):
+    input_crs = network.getCrs()
+    railways = network.railways
+    # Create the output Layer, removing output file if it already exists
+    str_output_error, output_ds = createVectorOutput(output_shapefile)
+    if str_output_error:
         str_error = "Function process"
-        str_error += "\nError removing existing output file:\n{}".format(output_shapefile)
+        str_error += "\n" + str_output_error
         return str_error
-    output_ds = outDriver.CreateDataSource(output_shapefile)
-    outLayer = output_ds.CreateLayer(output_shapefile.split(".")[0], input_crs, geom_type=ogr.wkbPolygon)
-    outLayerDefn = outLayer.GetLayerDefn()
-    outLayer.CreateField(ogr.FieldDefn("id", ogr.OFTInteger))
-    outLayer.CreateField(ogr.FieldDefn("railway", ogr.OFTString))
-    outLayer.CreateField(ogr.FieldDefn("rail_1", ogr.OFTString))
-    outLayer.CreateField(ogr.FieldDefn("rail_2", ogr.OFTString))
-    outLayer.CreateField(ogr.FieldDefn("type", ogr.OFTString))
-    outLayer.CreateField(ogr.FieldDefn("enabled", ogr.OFTInteger))
+    fields = [("id", ogr.OFTInteger),
+              ("railway", ogr.OFTString),
+              ("rail_1", ogr.OFTString),
+              ("rail_2", ogr.OFTString),
+              ("type", ogr.OFTString),
+              ("enabled", ogr.OFTInteger)]
+    if chunkLength is not None:
+        fields.append(("chunk", ogr.OFTInteger))
+    outLayer = output_ds.createLayer(getLayerName(output_shapefile), input_crs, ogr.wkbPolygon, fields)
+    outLayerDefn = outLayer.getLayerDefinition()
     cont_feature = 0
     # geom_boxes = []
+    railways_arguments = []
+    # railway id and chunk of each polygons
+    railways_chunks = []
     for railwayId in railways.keys():
+        if chunkLength is None:
+            railways_arguments.append((network.getRailWkb(railways[railwayId][0]),
+                                       network.getRailWkb(railways[railwayId][1]),
+                                       widthForRailway,
+                                       widthForRail,
+                                       None))
+            railways_chunks.append((railwayId, None))
+            continue
+        # chunks buffered independently, in parallel with the chunks of all railways, and
+        # clipped by their cells
+        chunks = getRailwayChunks(network.getRailPoints(railways[railwayId][0]),
+                                  network.getRailPoints(railways[railwayId][1]),
+                                  chunkLength,
+                                  max(widthForRailway, widthForRail / 2.))
+        for chunk in range(len(chunks)):
+            firstRailPoints, secondRailPoints, cellRing = chunks[chunk]
+            cellWkb = None
+            if cellRing is not None:
+                cellWkb = getPolygonWkb(cellRing)
+            railways_arguments.append((getLineStringWkb(firstRailPoints),
+                                       getLineStringWkb(secondRailPoints),
+                                       widthForRailway,
+                                       widthForRail,
+                                       cellWkb))
+            railways_chunks.append((railwayId, chunk))
+    railways_geometries = mapInOrder(processRailway, railways_arguments, workers)
+    for (railwayId, chunk), railway_geometries in zip(railways_chunks, railways_geometries):
         firstRailId = railways[railwayId][0]
         secondRailId = railways[railwayId][1]
-        firstRailGeom = rails[firstRailId]['geom']
-        secondRailGeom = rails[secondRailId]['geom']
-        # firstGeomBuffer = firstRailGeom.Buffer(sectionWidth/2.+railwayWidth/4.)
-        # secondGeomBuffer = secondRailGeom.Buffer(sectionWidth/2.+railwayWidth/4.)
-        # railway
-        geom_union = firstRailGeom.Union(secondRailGeom)
-        geom_box = geom_union.Buffer(widthForRailway)
-        outFeature = ogr.Feature(outLayerDefn)
-        cont_feature = cont_feature + 1
-        outFeature.SetField("id", cont_feature)
-        outFeature.SetField("railway", railwayId)
-        outFeature.SetField("rail_1", firstRailId)
-        outFeature.SetField("rail_2", secondRailId)
-        outFeature.SetField("type", objectTypeRailway)
-        outFeature.SetField("enabled", 1)
-        outFeature.SetGeometry(geom_box)
-        # Add new feature to output Layer
-        outLayer.CreateFeature(outFeature)
-        # geom_boxes.append(geom_box)
-        outFeature = None
-        # first rail
-        outFeatureFirstRail = ogr.Feature(outLayerDefn)
-        geom_boxFirstRail = firstRailGeom.Buffer(widthForRail/2.)
-        cont_feature = cont_feature + 1
-        outFeatureFirstRail.SetField("id", cont_feature)
-        outFeatureFirstRail.SetField("railway", railwayId)
-        outFeatureFirstRail.SetField("rail_1", firstRailId)
-        outFeatureFirstRail.SetField("rail_2", '')
-        outFeatureFirstRail.SetField("type", objectTypeRail)
-        outFeatureFirstRail.SetField("enabled", 1)
-        outFeatureFirstRail.SetGeometry(geom_boxFirstRail)
-        # Add new feature to output Layer
-        outLayer.CreateFeature(outFeatureFirstRail)
-        # geom_boxes.append(geom_box)
-        outFeatureFirstRail = None
-        # second rail
-        outFeatureSecondRail = ogr.Feature(outLayerDefn)
-        geom_boxSecondRail = secondRailGeom.Buffer(widthForRail/2.)
-        cont_feature = cont_feature + 1
-        outFeatureSecondRail.SetField("id", cont_feature)
-        outFeatureSecondRail.SetField("railway", railwayId)
-        outFeatureSecondRail.SetField("rail_1", '')
-        outFeatureSecondRail.SetField("rail_2", secondRailId)
-        outFeatureSecondRail.SetField("type", objectTypeRail)
-        outFeatureSecondRail.SetField("enabled", 1)
-        outFeatureSecondRail.SetGeometry(geom_boxSecondRail)
-        # Add new feature to output Layer
-        outLayer.CreateFeature(outFeatureSecondRail)
-        # geom_boxes.append(geom_box)
-        outFeatureSecondRail = None
-        yo = 1
+        # railway, first rail and second rail, a feature by polygon
+        for geometries_wkb, objectType, rail_1, rail_2 in zip(railway_geometries,
+                                                              [objectTypeRailway, objectTypeRail, objectTypeRail],
+                                                              [firstRailId, firstRailId, ''],
+                                                              [secondRailId, '', secondRailId]):
+            for geometry_wkb in geometries_wkb:
+                outFeature = ogr.Feature(outLayerDefn)
+                cont_feature = cont_feature + 1
+                outFeature.SetField("id", cont_feature)
+                outFeature.SetField("railway", railwayId)
+                outFeature.SetField("rail_1", rail_1)
+                outFeature.SetField("rail_2", rail_2)
+                outFeature.SetField("type", objectType)
+                outFeature.SetField("enabled", 1)
+                if chunk is not None:
+                    outFeature.SetField("chunk", chunk)
+                outFeature.SetGeometry(ogr.CreateGeometryFromWkb(geometry_wkb))
+                # Add new feature to output Layer
+                outLayer.createFeature(outFeature)
+                outFeature = None
     # input_ds = None
-    output_ds = None
+    output_ds.close()
     return str_error
 
 
@@ -242,158 +339,52 @@ def process_segments(input_shapefile,
             sectionLength,
             sectionWidth,
             sectionsDistance,
-            objectType):
+            objectType,
+            workers=1):
     str_error = ''
-    driver = ogr.GetDriverByName('ESRI Shapefile')
-    input_ds = None
-    try:
-        input_ds = driver.Open(input_shapefile, 0)  # 0 means read-only. 1 means writeable.
-    except Exception as e:
-        assert err.err_level == gdal.CE_Failure, (
-            'The handler error level should now be at failure')
-        assert err.err_msg == e.args[0], 'raised exception should contain the message'
-        str_error = "Function process"
-        str_error = ('Handled warning: level={}, no={}, msg={}'.format(
-            err.err_level, err.err_no, err.err_msg))
-        return str_error
-    layer = input_ds.GetLayer()
-    geometry_type = layer.GetGeomType()
-    if geometry_type != ogr.wkbLineString \
-            and geometry_type != ogr.wkbLineStringM \
-            and geometry_type != ogr.wkbLineStringZM \
-            and geometry_type != ogr.wkbLineString25D:
-        str_error = "Function process"
-        str_error += "\nNot LineString geometry type in file:\n{}".format(input_shapefile)
-        return str_error
-    layer_definition = layer.GetLayerDefn()
-    field_idRail_index = layer_definition.GetFieldIndex(input_shapefile_field_idRail)
-    if field_idRail_index == -1:
-        str_error = "Function process"
-        str_error += "\nField: {} not exists in file:\n{}".format(input_shapefile_field_idRail,
-                                                                     input_shapefile)
-        return str_error
-    field_idRail_type = layer_definition.GetFieldDefn(field_idRail_index).GetType()
-    if not field_idRail_type == ogr.OFTInteger \
-            and not field_idRail_type == ogr.OFTString \
-            and not field_idRail_type == ogr.OFTReal:
-        str_error = "Function process"
-        str_error += "\nField: {} is not valid type in file:\n{}".format(input_shapefile_field_idRail,
-                                                                 input_shapefile)
-        return str_error
-    field_idRailway_index = layer_definition.GetFieldIndex(input_shapefile_field_idRailway)
-    if field_idRailway_index == -1:
-        str_error = "Function process"
-        str_error += "\nField: {} not exists in file:\n{}".format(input_shapefile_field_idRailway,
-                                                                     input_shapefile)
-        return str_error
-    field_idRailway_type = layer_definition.GetFieldDefn(field_idRailway_index).GetType()
-    if not field_idRailway_type == ogr.OFTInteger \
-            and not field_idRailway_type == ogr.OFTString\
-            and not field_idRailway_type == ogr.OFTReal:
-        str_error = "Function process"
-        str_error += "\nField: {} is not valid type in file:\n{}".format(input_shapefile_field_idRailway,
-                                                                 input_shapefile)
+    str_error, network = loadRailNetwork(input_shapefile,
+                                         input_shapefile_field_idRail,
+                                         input_shapefile_field_idRailway)
+    if str_error:
         return str_error
-    number_of_features = layer.GetFeatureCount()
-    input_crs = layer.GetSpatialRef()
-    rails = {}
-    railways = {}
-    for feature in layer:
-        geom = feature.GetGeometryRef().Clone()
-        str_railId = feature.GetFieldAsString(field_idRail_index).lower()
-        if str_railId in rails:
-            str_error = "Function process"
-            str_error += "\nRepeated rail id: {} in file:\n{}".format(str_railId,
-                                                                      input_shapefile)
-            return str_error
-        str_railwayId = feature.GetFieldAsString(field_idRailway_index).lower()
-        rail = {}
-        rail['railwayId'] = str_railwayId
-        rail['geom'] = geom
-        rails[str_railId] = rail
-        if not str_railwayId in railways:
-            railsInRailway = []
-            railways[str_railwayId] = railsInRailway
-        if len(railways[str_railwayId]) == 2:
-            str_error = "Function process"
-            str_error += "\nMore than two rails in railway id: {} in file:\n{}".format(str_railwayId,
-                                                                                       input_shapefile)
-            return str_error
-        if str_railId in railways[str_railwayId]:
-            str_error = "Function process"
-            str_error += "\nRepeated rail id: {} in railway id: {} file:\n{}".format(str_railId,
-                                                                                     str_railwayId,
-                                                                                     input_shapefile)
-            return str_error
-        railways[str_railwayId].append(str_railId)
-    # Create the output Layer
-    outDriver = ogr.GetDriverByName("ESRI Shapefile")
-    # Remove output shapefile if it already exists
-    if os.path.exists(output_shapefile):
-        outDriver.DeleteDataSource(output_shapefile)
-    if os.path.exists(output_shapefile):
+    input_crs = network.getCrs()
+    railways = network.railways
+    # Create the output Layer, removing output file if it already exists
+    str_output_error, output_ds = createVectorOutput(output_shapefile)
+    if str_output_error:
         str_error = "Function process"
-        str_error += "\nError removing existing output file:\n{}".format(output_shapefile)
+        str_error += "\n" + str_output_error
         return str_error
-    output_ds = outDriver.CreateDataSource(output_shapefile)
-    outLayer = output_ds.CreateLayer(output_shapefile.split(".")[0], input_crs, geom_type=ogr.wkbPolygon)
-    outLayerDefn = outLayer.GetLayerDefn()
-    outLayer.CreateField(ogr.FieldDefn("id", ogr.OFTInteger))
-    outLayer.CreateField(ogr.FieldDefn("railway", ogr.OFTString))
-    outLayer.CreateField(ogr.FieldDefn("rail_1", ogr.OFTString))
-    outLayer.CreateField(ogr.FieldDefn("rail_2", ogr.OFTString))
-    outLayer.CreateField(ogr.FieldDefn("type", ogr.OFTString))
-    outLayer.CreateField(ogr.FieldDefn("enabled", ogr.OFTInteger))
+    outLayer = output_ds.createLayer(getLayerName(output_shapefile), input_crs, ogr.wkbPolygon,
+                                     [("id", ogr.OFTInteger),
+                                      ("railway", ogr.OFTString),
+                                      ("rail_1", ogr.OFTString),
+                                      ("rail_2", ogr.OFTString),
+                                      ("type", ogr.OFTString),
+                                      ("enabled", ogr.OFTInteger)])
+    outLayerDefn = outLayer.getLayerDefinition()
     cont_feature = 0
     geom_boxes = []
+    # accepted boxes in a grid of cells of the section size, only neighbours are tested
+    geom_boxes_index = GridIndex(max(sectionLength, sectionWidth + railwayWidth / 2.))
+    railways_arguments = []
     for railwayId in railways.keys():
+        railways_arguments.append((network.getRailWkb(railways[railwayId][0]),
+                                   network.getRailWkb(railways[railwayId][1]),
+                                   sectionLength,
+                                   sectionWidth,
+                                   sectionsDistance))
+    railways_geom_boxes = mapInOrder(processRailwaySegments, railways_arguments, workers)
+    for railwayId, railway_geom_boxes in zip(railways.keys(), railways_geom_boxes):
         firstRailId = railways[railwayId][0]
         secondRailId = railways[railwayId][1]
-        firstRailGeom = rails[firstRailId]['geom']
-        secondRailGeom = rails[secondRailId]['geom']
-        # secondGeomBuffer = secondRailGeom.Buffer(sectionWidth/2.+railwayWidth/4.)
-        secondGeomBuffer = secondRailGeom.Buffer(railwayWidth/4.)
-        firstRailPoints = firstRailGeom.GetPoints()
-        # distance_to_origin_next_center = 1.0 + sectionLength / 2.# empizo a 1 m del primer punto
-        distance_to_origin_next_center = 1.0 + sectionLength / 2.# empizo a 1 m del primer punto
-        distance_to_origin_section_starts = 0
-        for npto in range(len(firstRailPoints)-1):
-            pto_1 = firstRailPoints[npto]
-            pto_2 = firstRailPoints[npto+1]
-            azi = azimuth(pto_1[0],pto_1[1],pto_2[0],pto_2[1])
-            dis = distance(pto_1[0],pto_1[1],pto_2[0],pto_2[1])
-            if (distance_to_origin_section_starts+dis) < distance_to_origin_next_center:
-                distance_to_origin_section_starts += dis
-                continue
-            dis_to_star = distance_to_origin_next_center - distance_to_origin_section_starts
-            pto_start_x = pto_1[0] + (dis_to_star - sectionLength/2.) * sin(azi)
-            pto_start_y = pto_1[1] + (dis_to_star - sectionLength/2.) * cos(azi)
-            pto_box_1_x = pto_start_x + (sectionWidth/2.+railwayWidth/4.) * sin(azi - pi/2.)
-            pto_box_1_y = pto_start_y + (sectionWidth/2.+railwayWidth/4.) * cos(azi - pi/2.)
-            pto_box_2_x = pto_box_1_x + sectionLength * sin(azi)
-            pto_box_2_y = pto_box_1_y + sectionLength * cos(azi)
-            pto_box_3_x = pto_box_2_x + (sectionWidth+railwayWidth/2.) * sin(azi + pi/2.)
-            pto_box_3_y = pto_box_2_y + (sectionWidth+railwayWidth/2.) * cos(azi + pi/2.)
-            pto_box_4_x = pto_box_3_x + sectionLength * sin(azi + pi)
-            pto_box_4_y = pto_box_3_y + sectionLength * cos(azi + pi)
-            geom_outRing = ogr.Geometry(ogr.wkbLinearRing)
-            geom_outRing.AddPoint(pto_box_1_x, pto_box_1_y)
-            geom_outRing.AddPoint(pto_box_2_x, pto_box_2_y)
-            geom_outRing.AddPoint(pto_box_3_x, pto_box_3_y)
-            geom_outRing.AddPoint(pto_box_4_x, pto_box_4_y)
-            geom_outRing.AddPoint(pto_box_1_x, pto_box_1_y)
-            geom_poly = ogr.Geometry(ogr.wkbPolygon)
-            geom_poly.AddGeometry(geom_outRing)
-            wkt = geom_poly.ExportToWkt()
-            geom_box = geom_poly.Intersection(secondGeomBuffer)
-            box_wkt = geom_box.ExportToWkt()
-            distance_to_origin_next_center += (sectionLength + sectionsDistance)
-            distance_to_origin_section_starts += dis
+        for geom_box_wkb in railway_geom_boxes:
+            geom_box = ogr.CreateGeometryFromWkb(geom_box_wkb)
             geom_box_area = geom_box.GetArea()
-            if len(geom_box.GetGeometryRef(0).GetPoints()) > 9:
-                continue
             duplicated_box = False
-            for nb in range(len(geom_boxes)):
+            envelope = geom_box.GetEnvelope()
+            box = (envelope[0], envelope[2], envelope[1], envelope[3])
+            for nb in geom_boxes_index.query(box):
                 if geom_box.Intersects(geom_boxes[nb]):
                     geom_int = geom_box.Intersection(geom_boxes[nb])
                     if geom_int.GetArea()/geom_box_area > 0.5:
@@ -411,12 +402,13 @@ def process_segments(input_shapefile,
             outFeature.SetField("enabled", 1)
             outFeature.SetGeometry(geom_box)
             # Add new feature to output Layer
-            outLayer.CreateFeature(outFeature)
+            outLayer.createFeature(outFeature)
+            geom_boxes_index.insert(len(geom_boxes), box)
             geom_boxes.append(geom_box)
             outFeature = None
         yo = 1
     # input_ds = None
-    output_ds = None
+    output_ds.close()
     return str_error
 
 
@@ -441,7 +433,12 @@ def main():
     parser.add_option("--object_type_rail", dest="object_type_rail", action="store", type="string",
                       help="Object type for rail", default=None)
     parser.add_option("--output_shapefile", dest="output_shapefile", action="store", type="string",
-                      help="Output shapefile", default=None)
+                      help="Output file, shapefile, GeoPackage or FlatGeobuf by extension: shp, gpkg or fgb",
+                      default=None)
+    parser.add_option("--workers", dest="workers", action="store", type="string",
+                      help="Number of processes for railways, number of CPUs by default", default=None)
+    parser.add_option("--chunk_length", dest="chunk_length", action="store", type="string",
+                      help="Optional, length of railway chunks buffered independently, in meters", default=None)
     (options, args) = parser.parse_args()
     if not options.input_shapefile:
         parser.print_help()
@@ -486,6 +483,16 @@ def main():
     objectTypeRailway = options.object_type_railway
     objectTypeRail = options.object_type_rail
     output_shapefile = options.output_shapefile
+    str_error, workers = getNumberOfWorkers(options.workers)
+    if str_error:
+        print("Error:\n{}".format(str_error))
+        return
+    chunkLength = None
+    if options.chunk_length:
+        if not is_number(options.chunk_length) or float(options.chunk_length) <= 0.:
+            print("Error:\nInvalid chunk length: {}".format(options.chunk_length))
+            return
+        chunkLength = float(options.chunk_length)
     # if exists(output_shapefile):
     #     try:
     #         os.remove(output_shapefile)
@@ -503,7 +510,9 @@ def main():
                         widthForRailway,
                         widthForRail,
                         objectTypeRailway,
-                        objectTypeRail)
+                        objectTypeRail,
+                        workers,
+                        chunkLength)
     if str_error:
         print("Error:\n{}".format(str_error))
         return
@@ -13,6 +13,7 @@ import glob
 from math import floor, ceil, sqrt, isnan, modf, trunc, sin, cos
 import csv
 import re
+from tile_catalog import TileCatalog
 
 
 class OptionParser(optparse.OptionParser):
@@ -23,43 +24,79 @@ class OptionParser(optparse.OptionParser):
             self.error("%s option not supplied" % option)
 
 
-def createTile(file_path, tile_columns, tile_rows, output_path):
+def getTileSize(width, height, tile_columns, tile_rows):
+    new_width = 0
+    new_height = 0
+    if isinstance(tile_columns, int):
+        new_width = tile_columns
+    else:
+        new_width = floor(width * tile_columns)
+    if isinstance(tile_rows, int):
+        new_height = tile_rows
+    else:
+        new_height = floor(height * tile_rows)
+    return new_width, new_height
+
+
+def getTiles(width, height, tile_columns, tile_rows):
+    tiles = []
+    new_width, new_height = getTileSize(width, height, tile_columns, tile_rows)
+    tile_first_row = 0
+    tile_row = 1
+    # while tile_first_row <= (height - new_height):
+    while tile_first_row < height:
+        tile_last_row = tile_first_row + new_height
+        tile_first_column = 0
+        tile_column = 1
+        # while tile_first_column <= (width - new_width):
+        while tile_first_column < width:
+            tile_last_column = tile_first_column + new_width
+            tile = {}
+            tile['row'] = tile_row
+            tile['column'] = tile_column
+            tile['box'] = (tile_first_column, tile_first_row, tile_last_column, tile_last_row)
+            tiles.append(tile)
+            tile_first_column = tile_first_column + new_width
+            tile_column = tile_column + 1
+        tile_first_row = tile_first_row + new_height
+        tile_row = tile_row + 1
+    return tiles
+
+
+def getTileImage(image, box):
+    tile_first_column, tile_first_row, tile_last_column, tile_last_row = box
+    tile_image = image[tile_first_row:tile_last_row, tile_first_column:tile_last_column]
+    tile_height = tile_last_row - tile_first_row
+    tile_width = tile_last_column - tile_first_column
+    if tile_image.shape[0] < tile_height or tile_image.shape[1] < tile_width:
+        # same black padding as PIL crop
+        padded_tile_image = numpy.zeros((tile_height, tile_width, image.shape[2]), dtype=image.dtype)
+        padded_tile_image[:tile_image.shape[0], :tile_image.shape[1]] = tile_image
+        tile_image = padded_tile_image
+    return numpy.ascontiguousarray(tile_image)
+
+
+def getTileFileName(file_name, tile_row, tile_column, file_ext):
+    return f"{file_name}_row_{tile_row}_column_{tile_column}{file_ext}"
+
+
+def createTile(file_path, tile_columns, tile_rows, output_path, catalog=None):
     try:
         file_name, file_ext = os.path.splitext(file_path)
         file_name = os.path.basename(file_name)
         output_path = output_path + '\\'
         img = Image.open(file_path)
         width, height = img.size
-        new_width = 0
-        new_height = 0
-        if isinstance(tile_columns, int):
-            new_width = tile_columns
-        else:
-            new_width = floor(width * tile_columns)
-        if isinstance(tile_rows, int):
-            new_height = tile_rows
-        else:
-            new_height = floor(height * tile_rows)
-        tile_first_row = 0
-        tile_row = 1
-        # while tile_first_row <= (height - new_height):
-        while tile_first_row < height:
-            tile_last_row = tile_first_row + new_height
-            tile_first_column = 0
-            tile_column = 1
-            # while tile_first_column <= (width - new_width):
-            while tile_first_column < width:
-                tile_last_column = tile_first_column + new_width
-                tile = (tile_first_column, tile_first_row, tile_last_column, tile_last_row)
-                new_img = img.crop(tile)
-                new_file_name = f"{file_name}_row_{tile_row}_column_{tile_column}{file_ext}"
-                new_file_path = os.path.join(os.path.dirname(output_path), new_file_name)
-                new_img.save(new_file_path)
-                tile_first_column = tile_first_column + new_width
-                tile_column = tile_column + 1
-                # os.remove(file_path)
-            tile_first_row = tile_first_row + new_height
-            tile_row = tile_row + 1
+        tiles = getTiles(width, height, tile_columns, tile_rows)
+        for tile in tiles:
+            new_img = img.crop(tile['box'])
+            new_file_name = getTileFileName(file_name, tile['row'], tile['column'], file_ext)
+            new_file_path = os.path.join(os.path.dirname(output_path), new_file_name)
+            new_img.save(new_file_path)
+            tile['file'] = new_file_path
+            # os.remove(file_path)
+        if catalog is not None:
+            catalog.addTiles(file_name, tiles)
     except Exception as e:
         print(f"An error occurred: {e}")
 
@@ -81,6 +118,8 @@ def main():
                       help="Integer for absolute number of rows or float for relative size as per unit", default=None)
     parser.add_option("--output_path", dest="output_path", action="store", type="string",
                       help="Path for output image tiles", default=None)
+    parser.add_option("--catalog_file", dest="catalog_file", action="store", type="string",
+                      help="Optional SQLite tiles catalog file to create or update", default=None)
     (options, args) = parser.parse_args()
     if not options.images_path:
         parser.print_help()
@@ -142,12 +181,17 @@ def main():
     if not os.path.exists(output_path):
         print("Error:\nNot exists output path:\n{}".format(output_path))
         return
+    catalog = None
+    if options.catalog_file:
+        catalog = TileCatalog(options.catalog_file)
     # cont = 0 # debug
     for image in images:
-        createTile(image, tile_columns, tile_rows, output_path)
+        createTile(image, tile_columns, tile_rows, output_path, catalog)
         # cont = cont + 1 # debug
         # if cont > 1:
         #     break
+    if catalog is not None:
+        catalog.close()
 
 
 if __name__ == '__main__':
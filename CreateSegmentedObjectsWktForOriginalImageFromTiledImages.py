@@ -13,6 +13,11 @@ import glob
 from math import floor, ceil, sqrt, isnan, modf, trunc, sin, cos
 import csv
 import re
+from multiprocessing import Pool
+from yolo_labels import readYoloLabels
+from tile_catalog import TileCatalog, status_joined
+from georeference import findGeoTransform, transformPixelCoordinates, getCoordinatesFormat, writeProjectionFile
+from process_pool import getNumberOfWorkers
 
 
 class OptionParser(optparse.OptionParser):
@@ -25,11 +30,48 @@ class OptionParser(optparse.OptionParser):
 def joinTiles(image_file_name, image_tiles,
               tile_width,
               tile_height,
-              output_path):
+              output_path,
+              georeference_path=None):
     str_error = ''
+    try:
+        success, str_error = joinImageTiles(image_file_name, image_tiles,
+                                            tile_width,
+                                            tile_height,
+                                            output_path,
+                                            georeference_path)
+    except Exception as e:
+        str_error = str(e)
+        # no partial output for failed images
+        output_file_name = os.path.join(output_path, image_file_name + '.txt')
+        if os.path.exists(output_file_name):
+            os.remove(output_file_name)
+        return False, str_error
+    return success, str_error
+
+
+def joinTilesFromArguments(arguments):
+    image_file_name = arguments[0]
+    success, str_error = joinTiles(*arguments)
+    return image_file_name, success, str_error
+
+
+def joinImageTiles(image_file_name, image_tiles,
+                   tile_width,
+                   tile_height,
+                   output_path,
+                   georeference_path=None):
+    str_error = ''
+    geo_transform = None
+    crs_wkt = ''
+    if georeference_path:
+        geo_transform, crs_wkt = findGeoTransform(georeference_path, image_file_name)
+        if geo_transform is None:
+            str_error = "Not exists georeference for image: {} in path:\n{}".format(image_file_name,
+                                                                                 georeference_path)
+            return False, str_error
+    coordinates_format = getCoordinatesFormat(geo_transform)
     wkt_file_name = image_file_name + '.txt'
     output_file_name = os.path.join(output_path, wkt_file_name)
-    output_file = open(output_file_name, "w")
     output_lines = []
     output_lines.append('type;wkt\n')
     # output_file.write('type;wkt')
@@ -37,43 +79,34 @@ def joinTiles(image_file_name, image_tiles,
         column = tile['column']
         row = tile['row']
         file = tile['file']
-        input_file = open(file, 'r')
-        input_lines = input_file.readlines()
-        for input_line in input_lines:
-            str_line = input_line.strip()#remove /n
-            str_values = str_line.split(' ')
-            str_type = str_values[0]
-            # if int(str_type) == 0:
-            #     continue
-            pos = 1
-            str_output_line = str_type + ';POLYGON(('
-            str_first_pto_column = ''
-            str_first_pto_row = ''
-            while pos < (len(str_values) - 1):
-                str_pto_col = str_values[pos]
-                str_pto_row = str_values[pos+1]
-                pto_col = float(str_pto_col)
-                pto_row = float(str_pto_row)
-                pto_col = tile_width * pto_col + (column - 1) * tile_width
-                pto_row = tile_height * pto_row + (row - 1) * tile_height
-                pto_row = -1.0 * pto_row
-                str_pto_column = "{0:.2f}".format(pto_col)
-                str_pto_row = "{0:.2f}".format(pto_row)
-                if pos == 1:
-                    str_first_pto_column = str_pto_column
-                    str_first_pto_row = str_pto_row
-                str_output_line = str_output_line + str_pto_column
-                str_output_line = str_output_line + ' '
-                str_output_line = str_output_line + str_pto_row
-                str_output_line = str_output_line + ','
-                pos = pos + 2
-            str_output_line = str_output_line + str_first_pto_column
-            str_output_line = str_output_line + ' '
-            str_output_line = str_output_line + str_first_pto_row
+        try:
+            classes, offsets, points = readYoloLabels(file)
+        except FileNotFoundError:
+            # no label file for tiles without objects
+            continue
+        # if int(str_type) == 0:
+        #     continue
+        ptos_col = tile_width * points[:, 0] + (column - 1) * tile_width
+        ptos_row = tile_height * points[:, 1] + (row - 1) * tile_height
+        if geo_transform is None:
+            ptos_row = -1.0 * ptos_row
+        else:
+            ptos_col, ptos_row = transformPixelCoordinates(geo_transform, ptos_col, ptos_row)
+        str_ptos = list(map(coordinates_format.format, ptos_col.tolist(), ptos_row.tolist()))
+        for npol in range(len(classes)):
+            first_pto = offsets[npol]
+            last_pto = offsets[npol + 1]
+            if last_pto == first_pto:
+                continue
+            str_output_line = str(classes[npol]) + ';POLYGON(('
+            str_output_line = str_output_line + ','.join(str_ptos[first_pto:last_pto])
+            str_output_line = str_output_line + ',' + str_ptos[first_pto]
             str_output_line = str_output_line + '))\n'
             output_lines.append(str_output_line)
+    output_file = open(output_file_name, "w")
     output_file.writelines(output_lines)
     output_file.close()
+    writeProjectionFile(output_file_name, crs_wkt)
     return True, str_error
 
 def main():
@@ -98,6 +131,14 @@ def main():
                       default=None)
     parser.add_option("--output_path", dest="output_path", action="store", type="string",
                       help="Path for output image tiles", default=None)
+    parser.add_option("--workers", dest="workers", action="store", type="string",
+                      help="Number of processes for joining images, number of CPUs by default", default=None)
+    parser.add_option("--catalog_file", dest="catalog_file", action="store", type="string",
+                      help="Optional SQLite tiles catalog file from CreateImageTiles, used instead of listing "
+                           "tiles txt files path. Images with joined status are not processed again", default=None)
+    parser.add_option("--georeference_path", dest="georeference_path", action="store", type="string",
+                      help="Optional path of original images with world files (.jgw, .tfw, .wld) or georeferenced "
+                           "by GDAL, for output in map coordinates", default=None)
     (options, args) = parser.parse_args()
     if not options.tiles_txt_files_path:
         parser.print_help()
@@ -121,31 +162,55 @@ def main():
     if not exists(tiles_txt_files_path):
         print("Error:\nNot exists tiles txt files path:\n{}".format(tiles_txt_files_path))
         return
-    tiles_txt_file_extension = "txt"
-    tiles_txt_file_extension = tiles_txt_file_extension.lower()
-    files = os.listdir(tiles_txt_files_path)
+    catalog = None
     images = {}
-    for file in files:
-        if not file.lower().endswith(tiles_txt_file_extension):
-            continue
-        if not '_row' in file.lower():
-            continue
-        image_path = os.path.join(tiles_txt_files_path, file)
-        original_image_file_name_without_extension = file.split('_row')[0]
-        str_aux = file.split('_row')[1]
-        str_row = str_aux.split('_')[1]
-        str_aux = str_aux.split('_column_')[1]
-        str_column = str_aux.split('.')[0]
-        image_tile = {}
-        image_tile['row'] = int(str_row)
-        image_tile['column'] = int(str_column)
-        image_tile['file'] = image_path
-        if not original_image_file_name_without_extension in images:
-            images[original_image_file_name_without_extension] = []
-        images[original_image_file_name_without_extension].append(image_tile)
-    if len(images) < 1:
-        print("Error:\nNot exists tiles txt files in path:\n{}".format(tiles_txt_files_path))
-        return
+    if options.catalog_file:
+        if not exists(options.catalog_file):
+            print("Error:\nNot exists catalog file:\n{}".format(options.catalog_file))
+            return
+        catalog = TileCatalog(options.catalog_file)
+        catalog_images = catalog.getImages(exclude_status=status_joined)
+        for image_file_name in catalog_images.keys():
+            images[image_file_name] = []
+            for catalog_tile in catalog_images[image_file_name]:
+                label_file = catalog_tile['label_file']
+                if not label_file:
+                    label_file_name = os.path.splitext(os.path.basename(catalog_tile['file']))[0] + '.txt'
+                    label_file = os.path.join(tiles_txt_files_path, label_file_name)
+                image_tile = {}
+                image_tile['id'] = catalog_tile['id']
+                image_tile['row'] = catalog_tile['row']
+                image_tile['column'] = catalog_tile['column']
+                image_tile['file'] = label_file
+                images[image_file_name].append(image_tile)
+        if len(images) < 1:
+            print("Not exists image tiles to join in catalog:\n{}".format(options.catalog_file))
+            return
+    else:
+        tiles_txt_file_extension = "txt"
+        tiles_txt_file_extension = tiles_txt_file_extension.lower()
+        files = os.listdir(tiles_txt_files_path)
+        for file in files:
+            if not file.lower().endswith(tiles_txt_file_extension):
+                continue
+            if not '_row' in file.lower():
+                continue
+            image_path = os.path.join(tiles_txt_files_path, file)
+            original_image_file_name_without_extension = file.split('_row')[0]
+            str_aux = file.split('_row')[1]
+            str_row = str_aux.split('_')[1]
+            str_aux = str_aux.split('_column_')[1]
+            str_column = str_aux.split('.')[0]
+            image_tile = {}
+            image_tile['row'] = int(str_row)
+            image_tile['column'] = int(str_column)
+            image_tile['file'] = image_path
+            if not original_image_file_name_without_extension in images:
+                images[original_image_file_name_without_extension] = []
+            images[original_image_file_name_without_extension].append(image_tile)
+        if len(images) < 1:
+            print("Error:\nNot exists tiles txt files in path:\n{}".format(tiles_txt_files_path))
+            return
     str_tiles_n_columns = options.tiles_n_columns
     flag = True
     try:
@@ -190,19 +255,49 @@ def main():
     if not os.path.exists(output_path):
         print("Error:\nNot exists output path:\n{}".format(output_path))
         return
-    cont = 0 # debug
+    georeference_path = options.georeference_path
+    if georeference_path and not exists(georeference_path):
+        print("Error:\nNot exists georeference path:\n{}".format(georeference_path))
+        return
+    str_error, workers = getNumberOfWorkers(options.workers)
+    if str_error:
+        print("Error:\n{}".format(str_error))
+        return
+    join_arguments = []
     for image_file_name in images.keys():
-        if cont > 2:# debug
-            break
-        success, str_error = joinTiles(image_file_name, images[image_file_name],
-                                       tile_width, tile_height,
-                                       output_path)
-        if not success:
-            if not flag:
-                print("Joining tiles for image {}, error: {}".format(image, str_error))
-                return
-            break
-        cont = cont + 1
+        image_tiles = sorted(images[image_file_name], key=lambda tile: (tile['row'], tile['column']))
+        join_arguments.append((image_file_name, image_tiles,
+                               tile_width, tile_height,
+                               output_path,
+                               georeference_path))
+    failed_images = {}
+    cont = 0
+    if workers == 1:
+        joined_images = map(joinTilesFromArguments, join_arguments)
+        for image_file_name, success, str_error in joined_images:
+            if not success:
+                failed_images[image_file_name] = str_error
+            cont = cont + 1
+    else:
+        with Pool(processes=workers) as pool:
+            chunk_size = max(1, min(64, len(join_arguments) // (4 * workers)))
+            joined_images = pool.imap_unordered(joinTilesFromArguments, join_arguments, chunk_size)
+            for image_file_name, success, str_error in joined_images:
+                if not success:
+                    failed_images[image_file_name] = str_error
+                cont = cont + 1
+    if catalog is not None:
+        for image_file_name in images.keys():
+            if image_file_name in failed_images:
+                continue
+            joined_file = os.path.join(output_path, image_file_name + '.txt')
+            catalog.setLabelFiles([(tile['id'], tile['file']) for tile in images[image_file_name]])
+            catalog.setImageStatus(image_file_name, status_joined, 'joined_file', joined_file)
+        catalog.close()
+    for image_file_name in sorted(failed_images.keys()):
+        print("Joining tiles for image {}, error: {}".format(image_file_name, failed_images[image_file_name]))
+    print("Joined images: {}, failed: {}".format(cont - len(failed_images), len(failed_images)))
+
 
 if __name__ == '__main__':
     # https://gdal.org/api/python_gotchas.html
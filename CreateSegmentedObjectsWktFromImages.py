@@ -0,0 +1,216 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+import optparse
+import os
+from os.path import exists
+from ultralytics import YOLO
+import cv2
+from CreateImageTiles import getTiles, getTileFileName, getTileImage
+from PredictWktFormat import readImage, getImageInstances, getWktLines, getInferenceParameters
+from inference_cache import InferenceCache
+from georeference import findGeoTransform, writeProjectionFile
+
+
+class OptionParser(optparse.OptionParser):
+    def check_required(self, opt):
+        option = self.get_option(opt)
+        # Assumes the option's 'default' is set to None!
+        if getattr(self.values, option.dest) is None:
+            self.error("%s option not supplied" % option)
+
+
+def processImage(model,
+                 file_path,
+                 tile_columns,
+                 tile_rows,
+                 output_path,
+                 tiles_output_path,
+                 cache=None,
+                 georeference_path=None):
+    str_error = ''
+    file_name, file_ext = os.path.splitext(file_path)
+    file_name = os.path.basename(file_name)
+    image = readImage(file_path)
+    if image is None:
+        str_error = "Error reading image file:\n{}".format(file_path)
+        return False, str_error
+    geo_transform = None
+    crs_wkt = ''
+    if georeference_path:
+        geo_transform, crs_wkt = findGeoTransform(georeference_path, file_name)
+        if geo_transform is None:
+            str_error = "Not exists georeference for image: {} in path:\n{}".format(file_name, georeference_path)
+            return False, str_error
+    height = image.shape[0]
+    width = image.shape[1]
+    output_lines = []
+    output_lines.append('type;wkt\n')
+    for tile in getTiles(width, height, tile_columns, tile_rows):
+        tile_image = getTileImage(image, tile['box'])
+        if tiles_output_path:
+            tile_file_name = getTileFileName(file_name, tile['row'], tile['column'], file_ext)
+            tile_file_path = os.path.join(tiles_output_path, tile_file_name)
+            success, tile_buffer = cv2.imencode(file_ext, tile_image)
+            if not success:
+                str_error = "Error writing tile image file:\n{}".format(tile_file_path)
+                return False, str_error
+            tile_buffer.tofile(tile_file_path)
+        instances = getImageInstances(model, tile_image, cache)
+        tile_first_column = tile['box'][0]
+        tile_first_row = tile['box'][1]
+        output_lines.extend(getWktLines(instances, tile_first_column, tile_first_row, geo_transform))
+    output_file_path = os.path.join(output_path, file_name + '.txt')
+    output_file = open(output_file_path, 'w')
+    output_file.writelines(output_lines)
+    output_file.close()
+    writeProjectionFile(output_file_path, crs_wkt)
+    return True, str_error
+
+
+def main():
+    # ==================
+    # parse command line
+    # ==================
+    usage = "usage: %prog [options] "
+    parser = OptionParser(usage=usage)
+    parser.add_option("--model_file", dest="model_file", action="store", type="string",
+                      help="Model file", default=None)
+    parser.add_option("--images_path", dest="images_path", action="store", type="string",
+                      help="Images path", default=None)
+    parser.add_option("--images_file_extension", dest="images_file_extension", action="store", type="string",
+                      help="Images file extension", default=None)
+    parser.add_option("--tile_columns", dest="tile_columns", action="store", type="string",
+                      help="Integer for absolute number of columns or float for relative size as per unit",
+                      default=None)
+    parser.add_option("--tile_rows", dest="tile_rows", action="store", type="string",
+                      help="Integer for absolute number of rows or float for relative size as per unit", default=None)
+    parser.add_option("--output_path", dest="output_path", action="store", type="string",
+                      help="Path for output wkt files, one for each image", default=None)
+    parser.add_option("--tiles_output_path", dest="tiles_output_path", action="store", type="string",
+                      help="Optional path for output image tiles, not written if not supplied", default=None)
+    parser.add_option("--cache_path", dest="cache_path", action="store", type="string",
+                      help="Optional path for inference results cache", default=None)
+    parser.add_option("--cache_max_size", dest="cache_max_size", action="store", type="string",
+                      help="Maximum size in MB for inference results cache, 1024 by default", default=None)
+    parser.add_option("--georeference_path", dest="georeference_path", action="store", type="string",
+                      help="Optional path of world files (.jgw, .tfw, .wld) or georeferenced images, it can be the "
+                           "images path, for output polygons in map coordinates", default=None)
+    (options, args) = parser.parse_args()
+    if not options.model_file:
+        parser.print_help()
+        return
+    if not options.images_path:
+        parser.print_help()
+        return
+    if not options.images_file_extension:
+        parser.print_help()
+        return
+    if not options.tile_columns:
+        parser.print_help()
+        return
+    if not options.tile_rows:
+        parser.print_help()
+        return
+    if not options.output_path:
+        parser.print_help()
+        return
+    model_file = options.model_file
+    if not exists(model_file):
+        print("Error:\nNot exists model file:\n{}".format(model_file))
+        return
+    images_path = options.images_path
+    if not exists(images_path):
+        print("Error:\nNot exists images path:\n{}".format(images_path))
+        return
+    images_file_extension = options.images_file_extension
+    images_file_extension = images_file_extension.lower()
+    files = os.listdir(images_path)
+    images = []
+    for file in files:
+        if file.lower().endswith(images_file_extension):
+            image_path = os.path.join(images_path, file)
+            images.append(image_path)
+    if len(images) < 1:
+        print("Error:\nNot exists images {} in path:\n{}".format(images_file_extension, images_path))
+        return
+    str_tile_columns = options.tile_columns
+    flag = True
+    try:
+        tile_columns = int(str_tile_columns)
+    except ValueError:
+        try:
+            tile_columns = float(str_tile_columns)
+        except ValueError:
+            flag = False
+    if not flag:
+        print("Error:\nInvalid tile columns: {}".format(str_tile_columns))
+        return
+    str_tile_rows = options.tile_rows
+    flag = True
+    try:
+        tile_rows = int(str_tile_rows)
+    except ValueError:
+        try:
+            tile_rows = float(str_tile_rows)
+        except ValueError:
+            flag = False
+    if not flag:
+        print("Error:\nInvalid tile rows: {}".format(str_tile_rows))
+        return
+    output_path = options.output_path
+    if not os.path.exists(output_path):
+        os.makedirs(output_path)
+    if not os.path.exists(output_path):
+        print("Error:\nNot exists output path:\n{}".format(output_path))
+        return
+    tiles_output_path = options.tiles_output_path
+    if tiles_output_path:
+        if not os.path.exists(tiles_output_path):
+            os.makedirs(tiles_output_path)
+        if not os.path.exists(tiles_output_path):
+            print("Error:\nNot exists tiles output path:\n{}".format(tiles_output_path))
+            return
+    georeference_path = options.georeference_path
+    if georeference_path and not exists(georeference_path):
+        print("Error:\nNot exists georeference path:\n{}".format(georeference_path))
+        return
+    cache = None
+    if options.cache_path:
+        str_cache_max_size = options.cache_max_size
+        if not str_cache_max_size:
+            str_cache_max_size = "1024"
+        try:
+            cache_max_size = float(str_cache_max_size)
+        except ValueError:
+            print("Error:\nInvalid cache maximum size: {}".format(str_cache_max_size))
+            return
+        cache = InferenceCache(options.cache_path, int(cache_max_size * 1024 * 1024),
+                               model_file, getInferenceParameters())
+    model = YOLO(model_file)
+    cont = 0
+    failed_images = []
+    for image in images:
+        success, str_error = processImage(model,
+                                          image,
+                                          tile_columns,
+                                          tile_rows,
+                                          output_path,
+                                          tiles_output_path,
+                                          cache,
+                                          georeference_path)
+        cont = cont + 1
+        if not success:
+            # an unreadable image or a failed prediction does not stop the other images
+            print("Prediction for image {}, error: {}".format(image, str_error))
+            failed_images.append(image)
+            continue
+        print("Number of images to process ....: {}".format(str(len(images) - cont)))
+    if cache is not None:
+        print("Inference cache hits: {}, misses: {}".format(cache.hits, cache.misses))
+    if len(failed_images) > 0:
+        print("Error:\nImages not predicted:\n{}".format('\n'.join(failed_images)))
+
+
+if __name__ == '__main__':
+    main()
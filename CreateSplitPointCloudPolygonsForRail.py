@@ -16,6 +16,10 @@ import re
 from numpy import arctan2
 from numpy import pi
 
+from railway_network import loadRailNetwork
+from vector_output import SplitOutput
+from split_layout import output_formats, output_layouts
+
 
 railwayWidth = 1.8
 
@@ -55,119 +59,37 @@ def process(input_shapefile,
             input_shapefile_field_idRail,
             input_shapefile_field_idRailway,
             output_path,
-            rail_buffer):
+            rail_buffer,
+            output_format='shp',
+            output_layout='files'):
     str_error = ''
-    driver = ogr.GetDriverByName('ESRI Shapefile')
-    input_ds = None
-    try:
-        input_ds = driver.Open(input_shapefile, 0)  # 0 means read-only. 1 means writeable.
-    except Exception as e:
-        assert err.err_level == gdal.CE_Failure, (
-            'The handler error level should now be at failure')
-        assert err.err_msg == e.args[0], 'raised exception should contain the message'
-        str_error = "Function process"
-        str_error = ('Handled warning: level={}, no={}, msg={}'.format(
-            err.err_level, err.err_no, err.err_msg))
-        return str_error
-    layer = input_ds.GetLayer()
-    geometry_type = layer.GetGeomType()
-    if geometry_type != ogr.wkbLineString \
-            and geometry_type != ogr.wkbLineStringM \
-            and geometry_type != ogr.wkbLineStringZM \
-            and geometry_type != ogr.wkbLineString25D:
-        str_error = "Function process"
-        str_error += "\nNot LineString geometry type in file:\n{}".format(input_shapefile)
-        return str_error
-    layer_definition = layer.GetLayerDefn()
-    field_idRail_index = layer_definition.GetFieldIndex(input_shapefile_field_idRail)
-    if field_idRail_index == -1:
-        str_error = "Function process"
-        str_error += "\nField: {} not exists in file:\n{}".format(input_shapefile_field_idRail,
-                                                                     input_shapefile)
-        return str_error
-    field_idRail_type = layer_definition.GetFieldDefn(field_idRail_index).GetType()
-    if not field_idRail_type == ogr.OFTInteger \
-            and not field_idRail_type == ogr.OFTString \
-            and not field_idRail_type == ogr.OFTReal:
-        str_error = "Function process"
-        str_error += "\nField: {} is not valid type in file:\n{}".format(input_shapefile_field_idRail,
-                                                                 input_shapefile)
-        return str_error
-    field_idRailway_index = layer_definition.GetFieldIndex(input_shapefile_field_idRailway)
-    if field_idRailway_index == -1:
-        str_error = "Function process"
-        str_error += "\nField: {} not exists in file:\n{}".format(input_shapefile_field_idRailway,
-                                                                     input_shapefile)
-        return str_error
-    field_idRailway_type = layer_definition.GetFieldDefn(field_idRailway_index).GetType()
-    if not field_idRailway_type == ogr.OFTInteger \
-            and not field_idRailway_type == ogr.OFTString\
-            and not field_idRailway_type == ogr.OFTReal:
-        str_error = "Function process"
-        str_error += "\nField: {} is not valid type in file:\n{}".format(input_shapefile_field_idRailway,
-                                                                 input_shapefile)
+    str_error, network = loadRailNetwork(input_shapefile,
+                                         input_shapefile_field_idRail,
+                                         input_shapefile_field_idRailway)
+    if str_error:
         return str_error
-    number_of_features = layer.GetFeatureCount()
-    input_crs = layer.GetSpatialRef()
-    rails = {}
-    railways = {}
-    for feature in layer:
-        geom = feature.GetGeometryRef().Clone()
-        str_railId = feature.GetFieldAsString(field_idRail_index).lower()
-        if str_railId in rails:
-            str_error = "Function process"
-            str_error += "\nRepeated rail id: {} in file:\n{}".format(str_railId,
-                                                                      input_shapefile)
-            return str_error
-        str_railwayId = feature.GetFieldAsString(field_idRailway_index).lower()
-        rail = {}
-        rail['railwayId'] = str_railwayId
-        rail['geom'] = geom
-        rails[str_railId] = rail
-        if not str_railwayId in railways:
-            railsInRailway = []
-            railways[str_railwayId] = railsInRailway
-        if len(railways[str_railwayId]) == 2:
-            str_error = "Function process"
-            str_error += "\nMore than two rails in railway id: {} in file:\n{}".format(str_railwayId,
-                                                                                       input_shapefile)
-            return str_error
-        if str_railId in railways[str_railwayId]:
-            str_error = "Function process"
-            str_error += "\nRepeated rail id: {} in railway id: {} file:\n{}".format(str_railId,
-                                                                                     str_railwayId,
-                                                                                     input_shapefile)
-            return str_error
-        railways[str_railwayId].append(str_railId)
+    input_crs = network.getCrs()
+    railways = network.railways
     cont_feature = 0
+    split_output = SplitOutput(output_path, os.path.splitext(os.path.basename(input_shapefile))[0],
+                               output_format, output_layout, input_crs, ogr.wkbPolygon,
+                               [("id", ogr.OFTInteger),
+                                ("railway", ogr.OFTString),
+                                ("rail", ogr.OFTString),
+                                ("str_id", ogr.OFTString)])
     for railwayId in railways.keys():
         firstRailId = railways[railwayId][0]
         secondRailId = railways[railwayId][1]
-        firstRailGeom = rails[firstRailId]['geom']
-        secondRailGeom = rails[secondRailId]['geom']
+        firstRailGeom = network.getRailGeometry(firstRailId)
+        secondRailGeom = network.getRailGeometry(secondRailId)
         firstGeomBuffer = firstRailGeom.Buffer(rail_buffer)
         secondGeomBuffer = secondRailGeom.Buffer(rail_buffer)
-        output_shapefile = output_path + "/"
-        output_shapefile += os.path.splitext(os.path.basename(input_shapefile))[0]
-        output_shapefile += "_Railway_"
-        output_shapefile += railwayId
-        output_shapefile += ".shp"
-        output_shapefile = os.path.normpath(output_shapefile)
-        outDriver = ogr.GetDriverByName("ESRI Shapefile")
-        # Remove output shapefile if it already exists
-        if os.path.exists(output_shapefile):
-            outDriver.DeleteDataSource(output_shapefile)
-        if os.path.exists(output_shapefile):
+        str_output_error, outLayer = split_output.getLayer(railwayId)
+        if str_output_error:
             str_error = "Function process"
-            str_error += "\nError removing existing output file:\n{}".format(output_shapefile)
+            str_error += "\n" + str_output_error
             return str_error
-        output_ds = outDriver.CreateDataSource(output_shapefile)
-        outLayer = output_ds.CreateLayer(output_shapefile.split(".")[0], input_crs, geom_type=ogr.wkbPolygon)
-        outLayerDefn = outLayer.GetLayerDefn()
-        outLayer.CreateField(ogr.FieldDefn("id", ogr.OFTInteger))
-        outLayer.CreateField(ogr.FieldDefn("railway", ogr.OFTString))
-        outLayer.CreateField(ogr.FieldDefn("rail", ogr.OFTString))
-        outLayer.CreateField(ogr.FieldDefn("str_id", ogr.OFTString))
+        outLayerDefn = outLayer.getLayerDefinition()
         cont_feature = cont_feature + 1
         outFeatureFirst = ogr.Feature(outLayerDefn)
         outFeatureFirst.SetField("id", cont_feature)
@@ -176,7 +98,7 @@ def process(input_shapefile,
         str_id = "railway_" + railwayId + "_" + firstRailId
         outFeatureFirst.SetField("str_id", str_id)
         outFeatureFirst.SetGeometry(firstGeomBuffer)
-        outLayer.CreateFeature(outFeatureFirst)
+        outLayer.createFeature(outFeatureFirst)
         cont_feature = cont_feature + 1
         outFeatureSecond = ogr.Feature(outLayerDefn)
         outFeatureSecond.SetField("id", cont_feature)
@@ -186,9 +108,9 @@ def process(input_shapefile,
         outFeatureSecond.SetField("str_id", str_id)
         outFeatureSecond.SetGeometry(secondGeomBuffer)
         # Add new feature to output Layer
-        outLayer.CreateFeature(outFeatureSecond)
+        outLayer.createFeature(outFeatureSecond)
         outFeature = None
-        output_ds = None
+    split_output.close()
     return str_error
 
 
@@ -208,6 +130,11 @@ def main():
                       help="Rail buffer distance", default=None)
     parser.add_option("--output_path", dest="output_path", action="store", type="string",
                       help="Output path for shapefiles", default=None)
+    parser.add_option("--output_format", dest="output_format", action="store", type="string",
+                      help="Output format: shp (default), gpkg or fgb", default=None)
+    parser.add_option("--output_layout", dest="output_layout", action="store", type="string",
+                      help="Output layout: files (default), one file by railway, layers, one GeoPackage"
+                           " with one layer by railway, or layer, one GeoPackage with one layer", default=None)
     (options, args) = parser.parse_args()
     if not options.input_shapefile:
         parser.print_help()
@@ -241,11 +168,30 @@ def main():
     if not os.path.exists(output_path):
         print("Error:\nNot exists output path:\n{}".format(output_path))
         return
+    output_format = 'shp'
+    if options.output_format:
+        output_format = options.output_format.lower()
+    if not output_format in output_formats:
+        print("Error:\nInvalid output format: {}".format(options.output_format))
+        return
+    output_layout = 'files'
+    if options.output_layout:
+        output_layout = options.output_layout.lower()
+    if not output_layout in output_layouts:
+        print("Error:\nInvalid output layout: {}".format(options.output_layout))
+        return
+    if output_layout != 'files':
+        if options.output_format and output_format != 'gpkg':
+            print("Error:\nOutput layout: {} requires gpkg output format".format(output_layout))
+            return
+        output_format = 'gpkg'
     str_error = process(input_shapefile,
                         input_shapefile_field_idRail,
                         input_shapefile_field_idRailway,
                         output_path,
-                        rail_buffer)
+                        rail_buffer,
+                        output_format,
+                        output_layout)
     if str_error:
         print("Error:\n{}".format(str_error))
         return
@@ -16,6 +16,13 @@ import re
 from numpy import arctan2
 from numpy import pi
 
+from linear_referencing import LinearReferencingIndex
+from railway_network import loadRailNetwork
+from vector_output import SplitOutput, createVectorOutput, getLayerName
+from split_layout import output_formats, output_layouts
+from process_pool import getNumberOfWorkers, mapInOrder
+from vector_geometry import getLineStringWkb, getPolygonWkb, getPolygons
+
 
 railwayWidth = 1.8
 
@@ -51,110 +58,117 @@ def is_number(n):
     return is_number
 
 
+def processChunk(arguments):
+    # buffer of a centerline, or of a chunk clipped by its cell so chunks do not overlap, as
+    # a list of polygon WKB, in a worker process
+    chunkWkb, railway_buffer, cellWkb = arguments
+    geomBuffer = ogr.CreateGeometryFromWkb(chunkWkb).Buffer(railway_buffer)
+    if cellWkb is not None:
+        geomBuffer = geomBuffer.Intersection(ogr.CreateGeometryFromWkb(cellWkb))
+    return [polygon.ExportToWkb() for polygon in getPolygons(geomBuffer)]
+
+
 def process(input_shapefile,
             input_shapefile_field_idRailway,
             output_path,
-            railway_buffer):
+            railway_buffer,
+            output_format='shp',
+            workers=1,
+            chunk_length=None,
+            output_layout='files'):
     str_error = ''
-    driver = ogr.GetDriverByName('ESRI Shapefile')
-    input_ds = None
-    try:
-        input_ds = driver.Open(input_shapefile, 0)  # 0 means read-only. 1 means writeable.
-    except Exception as e:
-        assert err.err_level == gdal.CE_Failure, (
-            'The handler error level should now be at failure')
-        assert err.err_msg == e.args[0], 'raised exception should contain the message'
-        str_error = "Function process"
-        str_error = ('Handled warning: level={}, no={}, msg={}'.format(
-            err.err_level, err.err_no, err.err_msg))
-        return str_error
-    layer = input_ds.GetLayer()
-    geometry_type = layer.GetGeomType()
-    if geometry_type != ogr.wkbLineString \
-            and geometry_type != ogr.wkbLineStringM \
-            and geometry_type != ogr.wkbLineStringZM \
-            and geometry_type != ogr.wkbLineString25D:
-        str_error = "Function process"
-        str_error += "\nNot LineString geometry type in file:\n{}".format(input_shapefile)
-        return str_error
-    layer_definition = layer.GetLayerDefn()
-    field_idRailway_index = layer_definition.GetFieldIndex(input_shapefile_field_idRailway)
-    if field_idRailway_index == -1:
-        str_error = "Function process"
-        str_error += "\nField: {} not exists in file:\n{}".format(input_shapefile_field_idRailway,
-                                                                     input_shapefile)
-        return str_error
-    field_idRailway_type = layer_definition.GetFieldDefn(field_idRailway_index).GetType()
-    if not field_idRailway_type == ogr.OFTInteger \
-            and not field_idRailway_type == ogr.OFTString\
-            and not field_idRailway_type == ogr.OFTReal:
-        str_error = "Function process"
-        str_error += "\nField: {} is not valid type in file:\n{}".format(input_shapefile_field_idRailway,
-                                                                 input_shapefile)
+    str_error, network = loadRailNetwork(input_shapefile,
+                                         None,
+                                         input_shapefile_field_idRailway,
+                                         None)
+    if str_error:
         return str_error
-    number_of_features = layer.GetFeatureCount()
-    input_crs = layer.GetSpatialRef()
-    railways = {}
+    input_crs = network.getCrs()
     cont_feature = 0
-    output_shapefile_all = output_path + "/"
-    output_shapefile_all += os.path.splitext(os.path.basename(input_shapefile))[0]
-    output_shapefile_all += "_Railway_"
-    output_shapefile_all += "all"
-    output_shapefile_all += ".shp"
-    output_shapefile_all = os.path.normpath(output_shapefile_all)
-    outDriver_all = ogr.GetDriverByName("ESRI Shapefile")
-    # Remove output shapefile if it already exists
-    if os.path.exists(output_shapefile_all):
-        outDriver_all.DeleteDataSource(output_shapefile_all)
-    if os.path.exists(output_shapefile_all):
-        str_error = "Function process"
-        str_error += "\nError removing existing output file:\n{}".format(output_shapefile_all)
-        return str_error
-    output_ds_all = outDriver_all.CreateDataSource(output_shapefile_all)
-    outLayer_all = output_ds_all.CreateLayer(output_shapefile_all.split(".")[0], input_crs, geom_type=ogr.wkbPolygon)
-    outLayerDefn_all = outLayer_all.GetLayerDefn()
-    outLayer_all.CreateField(ogr.FieldDefn("id", ogr.OFTInteger))
-    outLayer_all.CreateField(ogr.FieldDefn("railway", ogr.OFTString))
-    outLayer_all.CreateField(ogr.FieldDefn("str_id", ogr.OFTString))
-    outLayer_all.CreateField(ogr.FieldDefn("enabled", ogr.OFTInteger))
-    for feature in layer:
-        geom = feature.GetGeometryRef().Clone()
-        railwayId = feature.GetFieldAsString(field_idRailway_index).lower()
-        geomBuffer = geom.Buffer(railway_buffer)
-        output_shapefile = output_path + "/"
-        output_shapefile += os.path.splitext(os.path.basename(input_shapefile))[0]
-        output_shapefile += "_Railway_"
-        output_shapefile += railwayId
-        output_shapefile += ".shp"
-        output_shapefile = os.path.normpath(output_shapefile)
-        outDriver = ogr.GetDriverByName("ESRI Shapefile")
-        # Remove output shapefile if it already exists
-        if os.path.exists(output_shapefile):
-            outDriver.DeleteDataSource(output_shapefile)
-        if os.path.exists(output_shapefile):
+    fields = [("id", ogr.OFTInteger),
+              ("railway", ogr.OFTString),
+              ("str_id", ogr.OFTString),
+              ("enabled", ogr.OFTInteger)]
+    if chunk_length is not None:
+        fields.append(("chunk", ogr.OFTInteger))
+    # all railways in one file, except for layer layout where split output is already that file
+    output_ds_all = None
+    outLayer_all = None
+    if output_layout != 'layer':
+        output_shapefile_all = output_path + "/"
+        output_shapefile_all += os.path.splitext(os.path.basename(input_shapefile))[0]
+        output_shapefile_all += "_Railway_"
+        output_shapefile_all += "all"
+        output_shapefile_all += output_formats[output_format]
+        output_shapefile_all = os.path.normpath(output_shapefile_all)
+        # Remove output file if it already exists
+        str_output_error, output_ds_all = createVectorOutput(output_shapefile_all)
+        if str_output_error:
             str_error = "Function process"
-            str_error += "\nError removing existing output file:\n{}".format(output_shapefile)
+            str_error += "\n" + str_output_error
             return str_error
-        output_ds = outDriver.CreateDataSource(output_shapefile)
-        outLayer = output_ds.CreateLayer(output_shapefile.split(".")[0], input_crs, geom_type=ogr.wkbPolygon)
-        outLayerDefn = outLayer.GetLayerDefn()
-        outLayer.CreateField(ogr.FieldDefn("id", ogr.OFTInteger))
-        outLayer.CreateField(ogr.FieldDefn("railway", ogr.OFTString))
-        outLayer.CreateField(ogr.FieldDefn("str_id", ogr.OFTString))
-        outLayer.CreateField(ogr.FieldDefn("enabled", ogr.OFTInteger))
-        outFeature = ogr.Feature(outLayerDefn)
-        outFeature.SetField("id", cont_feature)
-        outFeature.SetField("railway", railwayId)
-        str_id = "railway_" + railwayId
-        outFeature.SetField("str_id", str_id)
-        outFeature.SetField("enabled", 1)
-        outFeature.SetGeometry(geomBuffer)
-        outLayer.CreateFeature(outFeature)
-        outLayer_all.CreateFeature(outFeature)
-        cont_feature = cont_feature + 1
-        outFeature = None
-        output_ds = None
-    output_ds_all = None
+        outLayer_all = output_ds_all.createLayer(getLayerName(output_shapefile_all), input_crs, ogr.wkbPolygon,
+                                                 fields)
+    chunks_arguments = []
+    # railway id and chunk of each buffer
+    railways_chunks = []
+    for railId, railwayId in zip(network.rail_ids, network.railway_ids):
+        railwayId = str(railwayId)
+        if chunk_length is None:
+            chunks_arguments.append((network.getRailWkb(str(railId)), railway_buffer, None))
+            railways_chunks.append((railwayId, None))
+            continue
+        # chunks buffered independently, in parallel with the chunks of all railways, and
+        # clipped by cells between the normals at the chunk ends. Sublines are longer than the
+        # chunks so the clipped buffers have the same union as the buffer of the centerline
+        rail_index = LinearReferencingIndex(network.getRailPoints(str(railId)))
+        starts, ends = rail_index.getChunkChainages(chunk_length)
+        half_width = 2. * railway_buffer
+        cell_starts = starts.copy()
+        cell_ends = ends.copy()
+        cell_starts[0] = -half_width
+        cell_ends[-1] = rail_index.length + half_width
+        for chunk in range(starts.size):
+            chunkWkb = getLineStringWkb(rail_index.getSubline(starts[chunk] - half_width, ends[chunk] + half_width))
+            cellRing = rail_index.getChunkCell(cell_starts[chunk], cell_ends[chunk], half_width)
+            cellWkb = None
+            if cellRing is not None:
+                cellWkb = getPolygonWkb(cellRing)
+            chunks_arguments.append((chunkWkb, railway_buffer, cellWkb))
+            railways_chunks.append((railwayId, chunk))
+    split_output = SplitOutput(output_path, os.path.splitext(os.path.basename(input_shapefile))[0],
+                               output_format, output_layout, input_crs, ogr.wkbPolygon, fields)
+    for (railwayId, chunk), buffers_wkb in zip(railways_chunks,
+                                               mapInOrder(processChunk, chunks_arguments, workers)):
+        # railway output with all its chunks
+        str_output_error, outLayer = split_output.getLayer(railwayId)
+        if str_output_error:
+            str_error = "Function process"
+            str_error += "\n" + str_output_error
+            return str_error
+        outLayerDefn = outLayer.getLayerDefinition()
+        # a feature by polygon
+        for buffer_wkb in buffers_wkb:
+            geomBuffer = ogr.CreateGeometryFromWkb(buffer_wkb)
+            outFeature = ogr.Feature(outLayerDefn)
+            outFeature.SetField("id", cont_feature)
+            outFeature.SetField("railway", railwayId)
+            str_id = "railway_" + railwayId
+            outFeature.SetField("str_id", str_id)
+            outFeature.SetField("enabled", 1)
+            if chunk is not None:
+                outFeature.SetField("chunk", chunk)
+            outFeature.SetGeometry(geomBuffer)
+            outLayer.createFeature(outFeature)
+            if outLayer_all is not None:
+                # FID set by the first layer is not valid in the second one
+                outFeature.SetFID(ogr.NullFID)
+                outLayer_all.createFeature(outFeature)
+            cont_feature = cont_feature + 1
+            outFeature = None
+    split_output.close()
+    if output_ds_all is not None:
+        output_ds_all.close()
     return str_error
 
 
@@ -172,6 +186,15 @@ def main():
                       help="Rail buffer distance", default=None)
     parser.add_option("--output_path", dest="output_path", action="store", type="string",
                       help="Output path for shapefiles", default=None)
+    parser.add_option("--output_format", dest="output_format", action="store", type="string",
+                      help="Output format: shp (default), gpkg or fgb", default=None)
+    parser.add_option("--output_layout", dest="output_layout", action="store", type="string",
+                      help="Output layout: files (default), one file by railway, layers, one GeoPackage"
+                           " with one layer by railway, or layer, one GeoPackage with one layer", default=None)
+    parser.add_option("--workers", dest="workers", action="store", type="string",
+                      help="Number of processes for railways, number of CPUs by default", default=None)
+    parser.add_option("--chunk_length", dest="chunk_length", action="store", type="string",
+                      help="Optional, length of railway chunks buffered independently, in meters", default=None)
     (options, args) = parser.parse_args()
     if not options.input_shapefile:
         parser.print_help()
@@ -201,10 +224,41 @@ def main():
     if not os.path.exists(output_path):
         print("Error:\nNot exists output path:\n{}".format(output_path))
         return
+    output_format = 'shp'
+    if options.output_format:
+        output_format = options.output_format.lower()
+    if not output_format in output_formats:
+        print("Error:\nInvalid output format: {}".format(options.output_format))
+        return
+    output_layout = 'files'
+    if options.output_layout:
+        output_layout = options.output_layout.lower()
+    if not output_layout in output_layouts:
+        print("Error:\nInvalid output layout: {}".format(options.output_layout))
+        return
+    if output_layout != 'files':
+        if options.output_format and output_format != 'gpkg':
+            print("Error:\nOutput layout: {} requires gpkg output format".format(output_layout))
+            return
+        output_format = 'gpkg'
+    str_error, workers = getNumberOfWorkers(options.workers)
+    if str_error:
+        print("Error:\n{}".format(str_error))
+        return
+    chunk_length = None
+    if options.chunk_length:
+        if not is_number(options.chunk_length) or float(options.chunk_length) <= 0.:
+            print("Error:\nInvalid chunk length: {}".format(options.chunk_length))
+            return
+        chunk_length = float(options.chunk_length)
     str_error = process(input_shapefile,
                         input_shapefile_field_idRailway,
                         output_path,
-                        railway_buffer)
+                        railway_buffer,
+                        output_format,
+                        workers,
+                        chunk_length,
+                        output_layout)
     if str_error:
         print("Error:\n{}".format(str_error))
         return
@@ -0,0 +1,402 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+import optparse
+import os
+from os.path import exists, isdir
+import glob
+import numpy as np
+from osgeo import gdal, ogr
+
+from object_matching import matchPairs
+from spatial_index import STRtree
+from vector_geometry import getValidGeometry, getBox
+from vector_output import createVectorOutput, getLayerName
+
+change_appeared = 'appeared'
+change_disappeared = 'disappeared'
+change_changed = 'changed'
+
+
+class OptionParser(optparse.OptionParser):
+    def check_required(self, opt):
+        option = self.get_option(opt)
+        # Assumes the option's 'default' is set to None!
+        if getattr(self.values, option.dest) is None:
+            self.error("%s option not supplied" % option)
+
+
+class GdalErrorHandler(object):
+    def __init__(self):
+        self.err_level = gdal.CE_None
+        self.err_no = 0
+        self.err_msg = ''
+
+    def handler(self, err_level, err_no, err_msg):
+        self.err_level = err_level
+        self.err_no = err_no
+        self.err_msg = err_msg
+
+
+def is_number(n):
+    is_number = True
+    try:
+        num = float(n)
+        # check for "nan" floats
+        is_number = num == num  # or use `math.isnan(num)`
+    except ValueError:
+        is_number = False
+    return is_number
+
+
+class OgrObjects(object):
+    # polygons of an OGR layer (outputs of the railway scripts), random access by FID
+    def __init__(self, file_path, field_type):
+        self.file_path = file_path
+        self.ds = ogr.Open(file_path, 0)
+        self.layer = self.ds.GetLayer()
+        self.crs = self.layer.GetSpatialRef()
+        self.field_type_index = self.layer.GetLayerDefn().GetFieldIndex(field_type)
+
+    def getType(self, feature):
+        if self.field_type_index == -1:
+            return ''
+        return feature.GetFieldAsString(self.field_type_index).lower()
+
+    def iterate(self):
+        # (key, type, geometry), key is used in getGeometries
+        self.layer.ResetReading()
+        for feature in self.layer:
+            geom = feature.GetGeometryRef()
+            if geom is None:
+                continue
+            geom = getValidGeometry(geom.Clone())
+            if geom is None:
+                continue
+            yield feature.GetFID(), self.getType(feature), geom
+
+    def getGeometries(self, keys):
+        geometries = {}
+        for key in sorted(keys):
+            feature = self.layer.GetFeature(int(key))
+            geometries[key] = getValidGeometry(feature.GetGeometryRef().Clone())
+        return geometries
+
+    def getId(self, key):
+        return str(key)
+
+
+class WktObjects(object):
+    # type;wkt files of a predictions path, random access by file and line
+    def __init__(self, predictions_path, predictions_file_extension):
+        self.crs = None
+        self.file_paths = sorted(glob.glob(os.path.join(predictions_path, '*.' + predictions_file_extension)))
+
+    def iterateFile(self, file_index, line_numbers=None):
+        with open(self.file_paths[file_index], 'r') as input_file:
+            for line_number, line in enumerate(input_file):
+                if line_numbers is not None and not line_number in line_numbers:
+                    continue
+                values = line.strip().split(';')
+                if len(values) != 2 or values[0] == 'type':
+                    continue
+                try:
+                    geom = ogr.CreateGeometryFromWkt(values[1])
+                except Exception:
+                    geom = None
+                geom = getValidGeometry(geom)
+                if geom is None:
+                    continue
+                yield (file_index, line_number), values[0].lower(), geom
+
+    def iterate(self):
+        for file_index in range(len(self.file_paths)):
+            for values in self.iterateFile(file_index):
+                yield values
+
+    def getGeometries(self, keys):
+        lines_by_file = {}
+        for file_index, line_number in keys:
+            if not file_index in lines_by_file:
+                lines_by_file[file_index] = set()
+            lines_by_file[file_index].add(line_number)
+        geometries = {}
+        for file_index in sorted(lines_by_file.keys()):
+            for key, object_type, geom in self.iterateFile(file_index, lines_by_file[file_index]):
+                geometries[key] = geom
+        return geometries
+
+    def getId(self, key):
+        return os.path.basename(self.file_paths[key[0]]) + ':' + str(key[1] + 1)
+
+
+def openObjects(input_path, field_type):
+    if isdir(input_path):
+        objects = WktObjects(input_path, 'txt')
+        if len(objects.file_paths) == 0:
+            return "Not exists prediction files in path:\n{}".format(input_path), None
+        return '', objects
+    try:
+        objects = OgrObjects(input_path, field_type)
+    except Exception as e:
+        return "Error opening file:\n{}\n{}".format(input_path, str(e)), None
+    return '', objects
+
+
+def getChangeValues(geom_a, geom_b):
+    # iou, area of a, area of b and centroids offset
+    area_a = geom_a.GetArea()
+    area_b = geom_b.GetArea()
+    intersection_area = 0.
+    if geom_a.Intersects(geom_b):
+        intersection_area = geom_a.Intersection(geom_b).GetArea()
+    union_area = area_a + area_b - intersection_area
+    iou = 0.
+    if union_area > 0.:
+        iou = intersection_area / union_area
+    offset = geom_a.Centroid().Distance(geom_b.Centroid())
+    return iou, area_a, area_b, offset
+
+
+class ChangesWriter(object):
+    def __init__(self, output, layer_name, crs):
+        self.output = output
+        fields = [("id", ogr.OFTInteger), ("change", ogr.OFTString), ("type", ogr.OFTString),
+                  ("id_a", ogr.OFTString), ("id_b", ogr.OFTString)]
+        for field_name in ["iou", "area_a", "area_b", "area_delta", "offset"]:
+            fields.append((field_name, ogr.OFTReal))
+        self.layer = output.createLayer(layer_name, crs, ogr.wkbMultiPolygon, fields)
+        self.layer_definition = self.layer.getLayerDefinition()
+        self.number_of_features = 0
+        self.counts = {change_appeared: 0, change_disappeared: 0, change_changed: 0}
+
+    def write(self, change, object_type, id_a, id_b, geom, iou=0., area_a=0., area_b=0., offset=0.):
+        feature = ogr.Feature(self.layer_definition)
+        self.number_of_features = self.number_of_features + 1
+        feature.SetField("id", self.number_of_features)
+        feature.SetField("change", change)
+        feature.SetField("type", object_type)
+        feature.SetField("id_a", id_a)
+        feature.SetField("id_b", id_b)
+        feature.SetField("iou", iou)
+        feature.SetField("area_a", area_a)
+        feature.SetField("area_b", area_b)
+        feature.SetField("area_delta", area_b - area_a)
+        feature.SetField("offset", offset)
+        feature.SetGeometry(ogr.ForceToMultiPolygon(geom))
+        self.layer.createFeature(feature)
+        feature = None
+        self.counts[change] += 1
+
+    def close(self):
+        self.output.close()
+
+
+def getChunkPairs(chunk, first_index_b, objects_a, keys_a, types_a, tree_a, iou_threshold):
+    # pairs (iou, index a, index b, values) of a chunk of objects of b with all their candidates
+    # of a, matched later with the pairs of all chunks
+    candidates = []
+    for chunk_index in range(len(chunk)):
+        key_b, object_type, geom_b = chunk[chunk_index]
+        indexes_a = tree_a.query(getBox(geom_b))
+        candidates.append(indexes_a[types_a[indexes_a] == object_type])
+    all_indexes_a = np.unique(np.concatenate(candidates))
+    geometries_a = objects_a.getGeometries([keys_a[index_a] for index_a in all_indexes_a])
+    pairs = []
+    for chunk_index in range(len(chunk)):
+        geom_b = chunk[chunk_index][2]
+        for index_a in candidates[chunk_index]:
+            geom_a = geometries_a[keys_a[index_a]]
+            if geom_a is None:
+                continue
+            values = getChangeValues(geom_a, geom_b)
+            if values[0] >= iou_threshold:
+                pairs.append((values[0], int(index_a), first_index_b + chunk_index, values))
+    return pairs
+
+
+def writeChanged(pairs, objects_a, objects_b, keys_a, keys_b, types_b, writer, area_tolerance, offset_tolerance):
+    changed_pairs = []
+    for iou, index_a, index_b, values in pairs:
+        iou, area_a, area_b, offset = values
+        relative_area_delta = abs(area_b - area_a) / area_a if area_a > 0. else 0.
+        if relative_area_delta > area_tolerance or offset > offset_tolerance:
+            changed_pairs.append((index_a, index_b, values))
+    geometries_b = objects_b.getGeometries([keys_b[index_b] for index_a, index_b, values in changed_pairs])
+    for index_a, index_b, values in changed_pairs:
+        iou, area_a, area_b, offset = values
+        writer.write(change_changed, types_b[index_b], objects_a.getId(keys_a[index_a]),
+                     objects_b.getId(keys_b[index_b]), geometries_b[keys_b[index_b]], iou, area_a, area_b, offset)
+
+
+def writeAppeared(indexes_b, objects_b, keys_b, types_b, writer):
+    geometries_b = objects_b.getGeometries([keys_b[index_b] for index_b in indexes_b])
+    for index_b in indexes_b:
+        geom_b = geometries_b[keys_b[index_b]]
+        if geom_b is None:
+            continue
+        writer.write(change_appeared, types_b[index_b], '', objects_b.getId(keys_b[index_b]),
+                     geom_b, 0., 0., geom_b.GetArea(), 0.)
+
+
+def writeDisappeared(indexes_a, objects_a, keys_a, types_a, writer):
+    geometries_a = objects_a.getGeometries([keys_a[index_a] for index_a in indexes_a])
+    for index_a in indexes_a:
+        geom_a = geometries_a[keys_a[index_a]]
+        if geom_a is None:
+            continue
+        writer.write(change_disappeared, types_a[index_a], objects_a.getId(keys_a[index_a]), '',
+                     geom_a, 0., geom_a.GetArea(), 0., 0.)
+
+
+def process(input_a,
+            input_b,
+            field_type,
+            output_shapefile,
+            iou_threshold,
+            area_tolerance,
+            offset_tolerance,
+            chunk_size):
+    str_error, objects_a = openObjects(input_a, field_type)
+    if str_error:
+        return str_error
+    str_error, objects_b = openObjects(input_b, field_type)
+    if str_error:
+        return str_error
+    # only keys, types and boxes of a are kept in memory
+    keys_a = []
+    types_a = []
+    boxes_a = []
+    for key, object_type, geom in objects_a.iterate():
+        keys_a.append(key)
+        types_a.append(object_type)
+        boxes_a.append(getBox(geom))
+    types_a = np.array(types_a, dtype=object)
+    tree_a = STRtree(boxes_a)
+    boxes_a = None
+    crs = objects_a.crs
+    if crs is None:
+        crs = objects_b.crs
+    str_error, output = createVectorOutput(output_shapefile)
+    if str_error:
+        return str_error
+    writer = ChangesWriter(output, getLayerName(output_shapefile), crs)
+    # candidate pairs of all chunks of b, only keys and types of b are kept in memory
+    keys_b = []
+    types_b = []
+    pairs = []
+    chunk = []
+    for values in objects_b.iterate():
+        chunk.append(values)
+        if len(chunk) == chunk_size:
+            pairs.extend(getChunkPairs(chunk, len(keys_b), objects_a, keys_a, types_a, tree_a, iou_threshold))
+            keys_b.extend([values[0] for values in chunk])
+            types_b.extend([values[1] for values in chunk])
+            chunk = []
+    if len(chunk) > 0:
+        pairs.extend(getChunkPairs(chunk, len(keys_b), objects_a, keys_a, types_a, tree_a, iou_threshold))
+        keys_b.extend([values[0] for values in chunk])
+        types_b.extend([values[1] for values in chunk])
+    chunk = None
+    matches, matched_a, matched_b = matchPairs(pairs, len(keys_a), len(keys_b))
+    pairs = [pairs[position] for position in matches]
+    for chunk_start in range(0, len(pairs), chunk_size):
+        writeChanged(pairs[chunk_start:chunk_start + chunk_size], objects_a, objects_b, keys_a, keys_b, types_b,
+                     writer, area_tolerance, offset_tolerance)
+    indexes_b = np.flatnonzero(np.logical_not(matched_b))
+    for chunk_start in range(0, len(indexes_b), chunk_size):
+        writeAppeared(indexes_b[chunk_start:chunk_start + chunk_size], objects_b, keys_b, types_b, writer)
+    indexes_a = np.flatnonzero(np.logical_not(matched_a))
+    for chunk_start in range(0, len(indexes_a), chunk_size):
+        writeDisappeared(indexes_a[chunk_start:chunk_start + chunk_size], objects_a, keys_a, types_a, writer)
+    print("Appeared: {}, disappeared: {}, changed: {}".format(writer.counts[change_appeared],
+                                                              writer.counts[change_disappeared],
+                                                              writer.counts[change_changed]))
+    writer.close()
+    return str_error
+
+
+def main():
+    # ==================
+    # parse command line
+    # ==================
+    usage = "usage: %prog [options] "
+    parser = OptionParser(usage=usage)
+    parser.add_option("--input_a", dest="input_a", action="store", type="string",
+                      help="First epoch polygons, vector file or path of type;wkt prediction files", default=None)
+    parser.add_option("--input_b", dest="input_b", action="store", type="string",
+                      help="Second epoch polygons, vector file or path of type;wkt prediction files", default=None)
+    parser.add_option("--field_type", dest="field_type", action="store", type="string",
+                      help="Object type field name in vector files, type by default", default=None)
+    parser.add_option("--iou_threshold", dest="iou_threshold", action="store", type="string",
+                      help="Minimum IoU for the same object in both epochs, 0.3 by default", default=None)
+    parser.add_option("--area_tolerance", dest="area_tolerance", action="store", type="string",
+                      help="Relative area difference for a changed object, 0.1 by default", default=None)
+    parser.add_option("--offset_tolerance", dest="offset_tolerance", action="store", type="string",
+                      help="Centroids distance for a changed object, 0.5 by default", default=None)
+    parser.add_option("--chunk_size", dest="chunk_size", action="store", type="string",
+                      help="Number of objects of second epoch processed together, 10000 by default",
+                      default=None)
+    parser.add_option("--output_shapefile", dest="output_shapefile", action="store", type="string",
+                      help="Output vector file, shp, gpkg or fgb", default=None)
+    (options, args) = parser.parse_args()
+    if not options.input_a:
+        parser.print_help()
+        return
+    if not options.input_b:
+        parser.print_help()
+        return
+    if not options.output_shapefile:
+        parser.print_help()
+        return
+    input_a = options.input_a
+    if not exists(input_a):
+        print("Error:\nNot exists input:\n{}".format(input_a))
+        return
+    input_b = options.input_b
+    if not exists(input_b):
+        print("Error:\nNot exists input:\n{}".format(input_b))
+        return
+    field_type = 'type'
+    if options.field_type:
+        field_type = options.field_type
+    values = []
+    for value, default_value, name in [(options.iou_threshold, 0.3, 'IoU threshold'),
+                                       (options.area_tolerance, 0.1, 'area tolerance'),
+                                       (options.offset_tolerance, 0.5, 'offset tolerance')]:
+        if not value:
+            values.append(default_value)
+            continue
+        if not is_number(value) or float(value) < 0.:
+            print("Error:\nInvalid {}: {}".format(name, value))
+            return
+        values.append(float(value))
+    iou_threshold, area_tolerance, offset_tolerance = values
+    chunk_size = 10000
+    if options.chunk_size:
+        if not options.chunk_size.isdigit() or int(options.chunk_size) < 1:
+            print("Error:\nInvalid chunk size: {}".format(options.chunk_size))
+            return
+        chunk_size = int(options.chunk_size)
+    output_shapefile = options.output_shapefile
+    str_error = process(input_a,
+                        input_b,
+                        field_type,
+                        output_shapefile,
+                        iou_threshold,
+                        area_tolerance,
+                        offset_tolerance,
+                        chunk_size)
+    if str_error:
+        print("Error:\n{}".format(str_error))
+        return
+    print("... Process finished")
+
+
+if __name__ == '__main__':
+    # https://gdal.org/api/python_gotchas.html
+    err = GdalErrorHandler()
+    gdal.PushErrorHandler(err.handler)
+    gdal.UseExceptions()  # Exceptions will get raised on anything >= gdal.CE_Failure
+    assert err.err_level == gdal.CE_None, 'the error level starts at 0'
+    main()
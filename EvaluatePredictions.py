@@ -0,0 +1,297 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+import optparse
+import os
+from os.path import exists
+import glob
+import csv
+import numpy as np
+from osgeo import gdal, ogr
+
+from spatial_index import STRtree
+from vector_geometry import getValidGeometry, getBox
+
+
+class OptionParser(optparse.OptionParser):
+    def check_required(self, opt):
+        option = self.get_option(opt)
+        # Assumes the option's 'default' is set to None!
+        if getattr(self.values, option.dest) is None:
+            self.error("%s option not supplied" % option)
+
+
+class GdalErrorHandler(object):
+    def __init__(self):
+        self.err_level = gdal.CE_None
+        self.err_no = 0
+        self.err_msg = ''
+
+    def handler(self, err_level, err_no, err_msg):
+        self.err_level = err_level
+        self.err_no = err_no
+        self.err_msg = err_msg
+
+
+def is_number(n):
+    is_number = True
+    try:
+        num = float(n)
+        # check for "nan" floats
+        is_number = num == num  # or use `math.isnan(num)`
+    except ValueError:
+        is_number = False
+    return is_number
+
+
+def readReference(input_shapefile):
+    # polygons from CreateIAPolygonsForRailway, only enabled features
+    str_error = ''
+    objects = []
+    # any OGR vector format, shapefile or GeoPackage from CreateIAPolygonsForRailway
+    try:
+        input_ds = ogr.Open(input_shapefile, 0)  # 0 means read-only. 1 means writeable.
+    except Exception as e:
+        str_error = "Function readReference"
+        str_error += "\nError opening file:\n{}\n{}".format(input_shapefile, str(e))
+        return str_error, objects
+    if input_ds is None:
+        str_error = "Function readReference"
+        str_error += "\nError opening file:\n{}".format(input_shapefile)
+        return str_error, objects
+    layer = input_ds.GetLayer()
+    layer_definition = layer.GetLayerDefn()
+    field_type_index = layer_definition.GetFieldIndex("type")
+    field_railway_index = layer_definition.GetFieldIndex("railway")
+    field_enabled_index = layer_definition.GetFieldIndex("enabled")
+    if field_type_index == -1 or field_railway_index == -1:
+        str_error = "Function readReference"
+        str_error += "\nFields type and railway must exist in file:\n{}".format(input_shapefile)
+        return str_error, objects
+    for feature in layer:
+        if field_enabled_index != -1 and feature.GetFieldAsInteger(field_enabled_index) != 1:
+            continue
+        geom = feature.GetGeometryRef()
+        if geom is None:
+            continue
+        geom = getValidGeometry(geom.Clone())
+        if geom is None:
+            continue
+        reference_object = {}
+        reference_object['type'] = feature.GetFieldAsString(field_type_index).lower()
+        reference_object['railway'] = feature.GetFieldAsString(field_railway_index).lower()
+        reference_object['geom'] = geom
+        objects.append(reference_object)
+    input_ds = None
+    return str_error, objects
+
+
+def readPredictions(predictions_path, predictions_file_extension):
+    # type;wkt files from PredictWktFormat or from the tiles joiner, in the reference CRS
+    str_error = ''
+    objects = []
+    file_paths = sorted(glob.glob(os.path.join(predictions_path, '*.' + predictions_file_extension)))
+    if len(file_paths) == 0:
+        str_error = "Function readPredictions"
+        str_error += "\nNo prediction files in path:\n{}".format(predictions_path)
+        return str_error, objects
+    for file_path in file_paths:
+        with open(file_path, 'r') as input_file:
+            for line in input_file:
+                values = line.strip().split(';')
+                if len(values) != 2 or values[0] == 'type':
+                    continue
+                try:
+                    geom = ogr.CreateGeometryFromWkt(values[1])
+                except Exception:
+                    geom = None
+                geom = getValidGeometry(geom)
+                if geom is None:
+                    continue
+                prediction_object = {}
+                prediction_object['type'] = values[0].lower()
+                prediction_object['file'] = os.path.basename(file_path)
+                prediction_object['geom'] = geom
+                objects.append(prediction_object)
+    return str_error, objects
+
+
+def getMatches(reference_objects, prediction_objects, reference_tree, iou_threshold):
+    # one to one matches by greater IoU first, as (reference, prediction, iou)
+    pairs = []
+    for prediction_index in range(len(prediction_objects)):
+        prediction_geom = prediction_objects[prediction_index]['geom']
+        prediction_area = prediction_geom.GetArea()
+        for reference_index in reference_tree.query(getBox(prediction_geom)):
+            reference_geom = reference_objects[reference_index]['geom']
+            if not prediction_geom.Intersects(reference_geom):
+                continue
+            intersection_area = prediction_geom.Intersection(reference_geom).GetArea()
+            union_area = prediction_area + reference_geom.GetArea() - intersection_area
+            if union_area <= 0.:
+                continue
+            iou = intersection_area / union_area
+            if iou >= iou_threshold:
+                pairs.append((iou, reference_index, prediction_index))
+    pairs.sort(key=lambda pair: pair[0], reverse=True)
+    matches = []
+    matched_references = set()
+    matched_predictions = set()
+    for iou, reference_index, prediction_index in pairs:
+        if reference_index in matched_references or prediction_index in matched_predictions:
+            continue
+        matched_references.add(reference_index)
+        matched_predictions.add(prediction_index)
+        matches.append((reference_index, prediction_index, iou))
+    return matches
+
+
+def getCoveredArea(reference_geom, prediction_objects, prediction_tree):
+    candidates = ogr.Geometry(ogr.wkbMultiPolygon)
+    for prediction_index in prediction_tree.query(getBox(reference_geom)):
+        prediction_geom = prediction_objects[prediction_index]['geom']
+        if not prediction_geom.Intersects(reference_geom):
+            continue
+        if prediction_geom.GetGeometryType() == ogr.wkbMultiPolygon:
+            for number_of_geometry in range(prediction_geom.GetGeometryCount()):
+                candidates.AddGeometry(prediction_geom.GetGeometryRef(number_of_geometry))
+        else:
+            candidates.AddGeometry(prediction_geom)
+    if candidates.GetGeometryCount() == 0:
+        return 0.
+    return reference_geom.Intersection(candidates.UnionCascaded()).GetArea()
+
+
+def getRatio(numerator, denominator):
+    if denominator == 0:
+        return 0.
+    return numerator / denominator
+
+
+def process(input_shapefile,
+            predictions_path,
+            predictions_file_extension,
+            iou_threshold,
+            output_csv):
+    str_error, reference_objects = readReference(input_shapefile)
+    if str_error:
+        return str_error
+    str_error, prediction_objects = readPredictions(predictions_path, predictions_file_extension)
+    if str_error:
+        return str_error
+    object_types = sorted(set([reference_object['type'] for reference_object in reference_objects])
+                          | set([prediction_object['type'] for prediction_object in prediction_objects]))
+    types_rows = []
+    railways = {}
+    for object_type in object_types:
+        type_references = [reference_object for reference_object in reference_objects
+                           if reference_object['type'] == object_type]
+        type_predictions = [prediction_object for prediction_object in prediction_objects
+                            if prediction_object['type'] == object_type]
+        reference_tree = STRtree([getBox(reference_object['geom']) for reference_object in type_references])
+        prediction_tree = STRtree([getBox(prediction_object['geom']) for prediction_object in type_predictions])
+        matches = getMatches(type_references, type_predictions, reference_tree, iou_threshold)
+        number_of_matches = len(matches)
+        mean_iou = 0.
+        if number_of_matches > 0:
+            mean_iou = float(np.mean([match[2] for match in matches]))
+        types_rows.append([object_type, len(type_references), len(type_predictions), number_of_matches,
+                           "{0:.4f}".format(getRatio(number_of_matches, len(type_predictions))),
+                           "{0:.4f}".format(getRatio(number_of_matches, len(type_references))),
+                           "{0:.4f}".format(mean_iou)])
+        matched_references = set([match[0] for match in matches])
+        for reference_index in range(len(type_references)):
+            reference_object = type_references[reference_index]
+            railway_key = (reference_object['railway'], object_type)
+            if not railway_key in railways:
+                railways[railway_key] = [0, 0, 0., 0.]
+            railway_values = railways[railway_key]
+            railway_values[0] += 1
+            if reference_index in matched_references:
+                railway_values[1] += 1
+            railway_values[2] += reference_object['geom'].GetArea()
+            railway_values[3] += getCoveredArea(reference_object['geom'], type_predictions, prediction_tree)
+    with open(output_csv, 'w', newline='') as output_file:
+        writer = csv.writer(output_file, delimiter=';')
+        writer.writerow(['type', 'references', 'predictions', 'true_positives', 'precision', 'recall', 'mean_iou'])
+        writer.writerows(types_rows)
+    railways_csv = os.path.splitext(output_csv)[0] + '_railways.csv'
+    with open(railways_csv, 'w', newline='') as output_file:
+        writer = csv.writer(output_file, delimiter=';')
+        writer.writerow(['railway', 'type', 'references', 'true_positives', 'recall',
+                         'reference_area', 'covered_area', 'coverage'])
+        for railway_key in sorted(railways.keys()):
+            railway_values = railways[railway_key]
+            writer.writerow([railway_key[0], railway_key[1], railway_values[0], railway_values[1],
+                             "{0:.4f}".format(getRatio(railway_values[1], railway_values[0])),
+                             "{0:.3f}".format(railway_values[2]),
+                             "{0:.3f}".format(railway_values[3]),
+                             "{0:.4f}".format(getRatio(railway_values[3], railway_values[2]))])
+    return str_error
+
+
+def main():
+    # ==================
+    # parse command line
+    # ==================
+    usage = "usage: %prog [options] "
+    parser = OptionParser(usage=usage)
+    parser.add_option("--input_shapefile", dest="input_shapefile", action="store", type="string",
+                      help="Reference polygons file, shapefile or GeoPackage, from CreateIAPolygonsForRailway", default=None)
+    parser.add_option("--predictions_path", dest="predictions_path", action="store", type="string",
+                      help="Predictions path, type;wkt files georeferenced in reference CRS", default=None)
+    parser.add_option("--predictions_file_extension", dest="predictions_file_extension", action="store",
+                      type="string", help="Predictions file extension, txt by default", default=None)
+    parser.add_option("--iou_threshold", dest="iou_threshold", action="store", type="string",
+                      help="Minimum IoU for a true positive, 0.5 by default", default=None)
+    parser.add_option("--output_csv", dest="output_csv", action="store", type="string",
+                      help="Output CSV file for types, railways are written in *_railways.csv", default=None)
+    (options, args) = parser.parse_args()
+    if not options.input_shapefile:
+        parser.print_help()
+        return
+    if not options.predictions_path:
+        parser.print_help()
+        return
+    if not options.output_csv:
+        parser.print_help()
+        return
+    input_shapefile = options.input_shapefile
+    if not exists(input_shapefile):
+        print("Error:\nNot exists input shapefile:\n{}".format(input_shapefile))
+        return
+    predictions_path = options.predictions_path
+    if not exists(predictions_path):
+        print("Error:\nNot exists predictions path:\n{}".format(predictions_path))
+        return
+    predictions_file_extension = 'txt'
+    if options.predictions_file_extension:
+        predictions_file_extension = options.predictions_file_extension
+    iou_threshold = 0.5
+    if options.iou_threshold:
+        if not is_number(options.iou_threshold):
+            print("Error:\nInvalid IoU threshold: {}".format(options.iou_threshold))
+            return
+        iou_threshold = float(options.iou_threshold)
+        if iou_threshold <= 0. or iou_threshold > 1.:
+            print("Error:\nIoU threshold must be in (0, 1]: {}".format(options.iou_threshold))
+            return
+    output_csv = options.output_csv
+    str_error = process(input_shapefile,
+                        predictions_path,
+                        predictions_file_extension,
+                        iou_threshold,
+                        output_csv)
+    if str_error:
+        print("Error:\n{}".format(str_error))
+        return
+    print("... Process finished")
+
+
+if __name__ == '__main__':
+    # https://gdal.org/api/python_gotchas.html
+    err = GdalErrorHandler()
+    gdal.PushErrorHandler(err.handler)
+    gdal.UseExceptions()  # Exceptions will get raised on anything >= gdal.CE_Failure
+    assert err.err_level == gdal.CE_None, 'the error level starts at 0'
+    main()
@@ -4,11 +4,19 @@
 import optparse
 import os
 from os.path import exists
+import ultralytics
 from ultralytics import YOLO
 from ultralytics.utils import ops
 import cv2
 import numpy as np
 import torch
+from PIL import Image
+from inference_cache import InferenceCache
+from work_queue import SharedWorkQueue, getDefaultNodeId
+from mask_rle import encodeMask, writeRleFile
+from tile_catalog import TileCatalog, status_predicted
+from georeference import findGeoTransform, transformPixelCoordinates, getCoordinatesFormat, writeProjectionFile
+from instance_mosaic import InstanceMosaic, getTileBoxes, getMosaicSize
 
 
 class OptionParser(optparse.OptionParser):
@@ -18,90 +26,285 @@ class OptionParser(optparse.OptionParser):
             self.error("%s option not supplied" % option)
 
 
-def predict(model,
-            file_path,
-            column,
-            row,
-            output_file_path):
+def readImage(file_path):
+    # cv2.imread fails on non ascii paths in Windows and applies exif orientation,
+    # PIL tiles in CreateImageTiles are never rotated
+    image = None
+    try:
+        data = np.fromfile(file_path, dtype=np.uint8)
+        image = cv2.imdecode(data, cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION)
+    except Exception:
+        image = None
+    return image
+
+
+def getInstancesContours(result):
+    instances = []
+    if result.masks == None:
+        return instances
+    seg_classes = list(result.names.values())
+    masks = result.masks.data
+    boxes = result.boxes.data
+    clss = boxes[:, 5]
+    for i, seg_class in enumerate(seg_classes):
+        obj_indices = torch.where(clss == i)
+        for obj_index in obj_indices[0].cpu().numpy():
+            obj_masks = masks[torch.tensor([obj_index])]
+            obj_mask = torch.any(obj_masks, dim=0).int() * 255
+            data_mask = obj_mask.cpu().numpy()
+            data_mask_u8 = data_mask.astype(np.uint8)
+            contours, hierarchy = cv2.findContours(data_mask_u8, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+            instance_contours = []
+            for contour in contours:
+                x = contour.astype("float32")
+                ops.scale_coords(result.masks.data.shape[1:], x, result.masks.orig_shape, normalize=False)
+                instance_contours.append(x.reshape(-1, 2))
+            instances.append([seg_class, instance_contours])
+    return instances
+
+
+def getInstancesMasks(result):
+    # instance masks scaled to tile size, as boolean arrays
+    instances = []
+    if result.masks == None:
+        return instances
+    seg_classes = list(result.names.values())
+    clss = result.boxes.data[:, 5].cpu().numpy().astype(np.int32)
+    masks = result.masks.data.cpu().numpy().transpose(1, 2, 0)
+    masks = ops.scale_image(masks, result.masks.orig_shape)
+    for obj_index in range(len(clss)):
+        seg_class = seg_classes[clss[obj_index]]
+        instances.append([seg_class, clss[obj_index], masks[:, :, obj_index] > 0.5])
+    return instances
+
+
+def getWktLine(str_type, contours, first_column, first_row, geo_transform=None):
+    str_output_line = str_type + ";"
+    if len(contours) > 1:
+        str_output_line = str_output_line + "MULTIPOLYGON("
+    for number_of_contour in range(len(contours)):
+        if len(contours) > 1:
+            if number_of_contour > 0:
+                str_output_line = str_output_line + ","
+            str_output_line = str_output_line + "(("
+        else:
+            str_output_line = str_output_line + "POLYGON(("
+        contour = contours[number_of_contour]
+        ptos_col = contour[:, 0].astype(np.float64) + first_column
+        ptos_row = contour[:, 1].astype(np.float64) + first_row
+        if geo_transform is None:
+            ptos_row = -1.0 * ptos_row
+        else:
+            ptos_col, ptos_row = transformPixelCoordinates(geo_transform, ptos_col, ptos_row)
+        str_ptos = list(map(getCoordinatesFormat(geo_transform).format, ptos_col.tolist(), ptos_row.tolist()))
+        str_ptos.append(str_ptos[0])
+        str_output_line = str_output_line + ",".join(str_ptos) + "))"
+    if len(contours) > 1:
+        str_output_line = str_output_line + ")"
+    str_output_line = str_output_line + '\n'
+    return str_output_line
+
+
+def getInferenceParameters():
+    parameters = {}
+    parameters['ultralytics'] = ultralytics.__version__
+    return parameters
+
+
+def getRleInstances(result):
+    # instance masks of a tile as rle, in tile pixel coordinates
+    rle_instances = []
+    for seg_class, class_index, mask in getInstancesMasks(result):
+        rle_instance = encodeMask(mask)
+        rle_instance['type'] = seg_class
+        rle_instances.append(rle_instance)
+    return rle_instances
+
+
+def getTileInstances(model, image, cache=None, with_contours=True, with_rle=False):
+    # contours and rle instances of a tile, the model only runs on a cache miss. With cache
+    # both are computed so the entry is valid for any output format
+    key = None
+    if cache is not None:
+        key = cache.getKey(image)
+        cached = cache.get(key, with_rle)
+        if cached is not None:
+            return cached
+    results = model(image)
+    instances = []
+    rle_instances = None
+    if with_contours or cache is not None:
+        for result in results:
+            instances.extend(getInstancesContours(result))
+    if with_rle:
+        rle_instances = []
+        for result in results:
+            rle_instances.extend(getRleInstances(result))
+    if cache is not None:
+        cache.put(key, instances, rle_instances)
+    return instances, rle_instances
+
+
+def getImageInstances(model, image, cache=None):
+    instances, rle_instances = getTileInstances(model, image, cache)
+    return instances
+
+
+def getWktLines(instances, first_column, first_row, geo_transform=None):
+    output_lines = []
+    for seg_class, contours in instances:
+        output_lines.append(getWktLine(seg_class, contours, first_column, first_row, geo_transform))
+    return output_lines
+
+
+def predictImage(model,
+                 image_tiles,
+                 output_file_path,
+                 cache=None,
+                 queue=None,
+                 unit=None,
+                 output_format='wkt',
+                 geo_transform=None,
+                 crs_wkt=''):
     str_error = ''
     output_lines = []
-    if exists(output_file_path):
-        input_file = open(output_file_path, 'r')
-        input_lines = input_file.readlines()
-        for input_line in input_lines:
-            output_lines.append(input_line)
-        input_file.close()
-    output_file = open(output_file_path, 'w')
-    # results = model(filename, save=True, save_conf=True, conf=0.5, save_txt=False, stream=True)
-    results = model(file_path)
-    result = results[0]
-    seg_classes = list(result.names.values())
-    tile_height = result.orig_shape[0]
-    tile_width = result.orig_shape[1]
-    for result in results:
-        if result.masks == None:
+    rle_instances = []
+    # tiles sorted by row and column, same output for any node or listing order
+    for tile in sorted(image_tiles, key=lambda tile: (tile['row'], tile['column'])):
+        column = tile['column']
+        row = tile['row']
+        file_path = tile['file']
+        image = readImage(file_path)
+        if image is None:
+            str_error = "Error reading image file:\n{}".format(file_path)
+            return False, str_error
+        tile_height = image.shape[0]
+        tile_width = image.shape[1]
+        first_column = (column - 1) * tile_width
+        first_row = (row - 1) * tile_height
+        instances, tile_rle_instances = getTileInstances(model, image, cache,
+                                                         output_format != 'rle', output_format != 'wkt')
+        if output_format != 'wkt':
+            for rle_instance in tile_rle_instances:
+                rle_instance = dict(rle_instance)
+                rle_instance['column'] = int(first_column)
+                rle_instance['row'] = int(first_row)
+                rle_instances.append(rle_instance)
+        if output_format != 'rle':
+            output_lines.extend(getWktLines(instances, first_column, first_row, geo_transform))
+        if queue is not None:
+            if not queue.renew(unit):
+                str_error = "Lost lease for image: {}".format(unit)
+                return False, str_error
+    if output_format != 'rle':
+        tmp_output_file_path = output_file_path + '.' + str(os.getpid()) + '.tmp'
+        output_file = open(tmp_output_file_path, 'w')
+        output_file.writelines(output_lines)
+        output_file.close()
+        os.replace(tmp_output_file_path, output_file_path)
+        writeProjectionFile(output_file_path, crs_wkt)
+    if output_format != 'wkt':
+        rle_file_path = os.path.splitext(output_file_path)[0] + '.json'
+        tmp_rle_file_path = rle_file_path + '.' + str(os.getpid()) + '.tmp'
+        writeRleFile(tmp_rle_file_path, rle_instances)
+        os.replace(tmp_rle_file_path, rle_file_path)
+    return True, str_error
+
+
+def getTileSize(file_path):
+    # width and height from the image header, without reading pixels
+    try:
+        with Image.open(file_path) as image:
+            return image.size
+    except Exception:
+        return None
+
+
+def predictImageMosaic(model,
+                       image_tiles,
+                       output_file_path,
+                       queue=None,
+                       unit=None,
+                       geo_transform=None,
+                       crs_wkt=''):
+    # tile instance masks are written with a unique id in a memory mapped label raster for the
+    # full image, polygonized once at the end, so objects crossing tile limits are not split
+    str_error = ''
+    try:
+        from osgeo import gdal, ogr, gdal_array
+    except ImportError:
+        str_error = "GDAL python bindings are needed for mosaic output mode"
+        return False, str_error
+    image_tiles = sorted(image_tiles, key=lambda tile: (tile['row'], tile['column']))
+    tile_sizes = []
+    for tile in image_tiles:
+        tile_size = getTileSize(tile['file'])
+        if tile_size is None:
+            str_error = "Error reading image file:\n{}".format(tile['file'])
+            return False, str_error
+        tile_sizes.append(tile_size)
+    boxes = getTileBoxes(image_tiles, tile_sizes)
+    width, height = getMosaicSize(boxes)
+    labels_file_path = output_file_path + '.' + str(os.getpid()) + '.labels'
+    mosaic = InstanceMosaic(labels_file_path, width, height)
+    for tile, box in zip(image_tiles, boxes):
+        file_path = tile['file']
+        image = readImage(file_path)
+        if image is None:
+            str_error = "Error reading image file:\n{}".format(file_path)
+            break
+        instances_masks = []
+        for result in model(image):
+            for seg_class, class_index, mask in getInstancesMasks(result):
+                instances_masks.append((seg_class, mask))
+        mosaic.addTile(box, instances_masks)
+        if queue is not None:
+            if not queue.renew(unit):
+                str_error = "Lost lease for image: {}".format(unit)
+                break
+    if str_error:
+        mosaic.remove()
+        return False, str_error
+    mosaic.relabel()
+    labels_ds = gdal_array.OpenArray(mosaic.labels)
+    if geo_transform is None:
+        # y = -row, as in tiles output mode
+        labels_ds.SetGeoTransform((0., 1., 0., 0., 0., -1.))
+    else:
+        labels_ds.SetGeoTransform(geo_transform)
+    labels_band = labels_ds.GetRasterBand(1)
+    polygons_ds = ogr.GetDriverByName('Memory').CreateDataSource('polygons')
+    polygons_layer = polygons_ds.CreateLayer('polygons', geom_type=ogr.wkbPolygon)
+    polygons_layer.CreateField(ogr.FieldDefn("label", ogr.OFTInteger64))
+    gdal.Polygonize(labels_band, labels_band, polygons_layer, 0, [], callback=None)
+    # polygons of the same instance, split by other instances over it, in one multipolygon
+    instances_geometries = {}
+    for feature in polygons_layer:
+        label = feature.GetFieldAsInteger64(0)
+        if label == 0:
             continue
-        masks = result.masks.data
-        boxes = result.boxes.data
-        clss = boxes[:, 5]
-        for i, seg_class in enumerate(seg_classes):
-            obj_indices = torch.where(clss == i)
-            obj_masks = masks[obj_indices]
-            # obj_mask = torch.any(obj_masks, dim=0).int() * 255
-            for i, obj_index in enumerate(obj_indices[0].cpu().numpy()):
-                obj_masks = masks[torch.tensor([obj_index])]
-                obj_mask = torch.any(obj_masks, dim=0).int() * 255
-                data_mask = obj_mask.cpu().numpy()
-                # data_rows = data_mask.shape[0]
-                # data_columns = data_mask.shape[1]
-                data_mask_u8 = data_mask.astype(np.uint8)
-                contours, hierarchy = cv2.findContours(data_mask_u8, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-                str_type = seg_class
-                str_output_line = str_type + ";"
-                if len(contours) > 1:
-                    str_output_line = str_output_line + "MULTIPOLYGON("
-                number_of_contour = 0
-                for c in range(len(contours)):
-                    if len(contours) > 1:
-                        if number_of_contour > 0:
-                            str_output_line = str_output_line + ","
-                        str_output_line = str_output_line + "(("
-                    else:
-                        str_output_line = str_output_line + "POLYGON(("
-                    n_pto = 1
-                    str_first_pto_column = ''
-                    str_first_pto_row = ''
-                    contour = contours[c]
-                    x = contour.astype("float32")
-                    ops.scale_coords(result.masks.data.shape[1:], x, result.masks.orig_shape, normalize=False)
-                    for npto in range(len(x)):
-                        coor = x[npto]
-                        pto_col = coor[0][0]
-                        pto_row = coor[0][1]
-                        pto_col = pto_col + (column - 1) * tile_width
-                        pto_row = pto_row + (row - 1) * tile_height
-                        pto_row = -1.0 * pto_row
-                        str_pto_column = "{0:.2f}".format(pto_col)
-                        str_pto_row = "{0:.2f}".format(pto_row)
-                        if n_pto == 1:
-                            str_first_pto_column = str_pto_column
-                            str_first_pto_row = str_pto_row
-                        n_pto = n_pto + 1
-                        str_output_line = str_output_line + str_pto_column
-                        str_output_line = str_output_line + " "
-                        str_output_line = str_output_line + str_pto_row
-                        str_output_line = str_output_line + ","
-                    str_output_line = str_output_line + str_first_pto_column
-                    str_output_line = str_output_line + " "
-                    str_output_line = str_output_line + str_first_pto_row
-                    str_output_line = str_output_line + "))"
-                    number_of_contour = number_of_contour + 1
-                if len(contours) > 1:
-                    str_output_line = str_output_line + ")"
-                str_output_line = str_output_line + '\n'
-                output_lines.append(str_output_line)
+        if not label in instances_geometries:
+            instances_geometries[label] = []
+        instances_geometries[label].append(feature.GetGeometryRef().Clone())
+    output_lines = []
+    for label in sorted(instances_geometries.keys()):
+        geometries = instances_geometries[label]
+        geom = geometries[0]
+        if len(geometries) > 1:
+            geom = ogr.Geometry(ogr.wkbMultiPolygon)
+            for polygon in geometries:
+                geom.AddGeometry(polygon)
+        output_lines.append(mosaic.getClass(label) + ';' + geom.ExportToWkt() + '\n')
+    polygons_ds = None
+    labels_band = None
+    labels_ds = None
+    mosaic.remove()
+    tmp_output_file_path = output_file_path + '.' + str(os.getpid()) + '.tmp'
+    output_file = open(tmp_output_file_path, 'w')
     output_file.writelines(output_lines)
     output_file.close()
+    os.replace(tmp_output_file_path, output_file_path)
+    writeProjectionFile(output_file_path, crs_wkt)
     return True, str_error
 
 
@@ -119,16 +322,43 @@ def main():
                       help="Images file extension", default=None)
     parser.add_option("--output_path", dest="output_path", action="store", type="string",
                       help="Path for output image tiles", default=None)
+    parser.add_option("--cache_path", dest="cache_path", action="store", type="string",
+                      help="Optional path for inference results cache, not for mosaic output mode", default=None)
+    parser.add_option("--cache_max_size", dest="cache_max_size", action="store", type="string",
+                      help="Maximum size in MB for inference results cache, 1024 by default", default=None)
+    parser.add_option("--queue_path", dest="queue_path", action="store", type="string",
+                      help="Optional shared path for work queue between several nodes", default=None)
+    parser.add_option("--node_id", dest="node_id", action="store", type="string",
+                      help="Node identifier for work queue, host name and process id by default", default=None)
+    parser.add_option("--lease_time", dest="lease_time", action="store", type="string",
+                      help="Seconds without activity to recover an image leased by other node, 600 by default",
+                      default=None)
+    parser.add_option("--output_mode", dest="output_mode", action="store", type="string",
+                      help="tiles (default), polygons for each tile, or mosaic, polygons from full image instance "
+                           "label raster, with vertices at pixel corners, only wkt output format and without cache",
+                      default=None)
+    parser.add_option("--output_format", dest="output_format", action="store", type="string",
+                      help="wkt (default), rle, COCO run length encoded masks in json files, or both. Only wkt "
+                           "for mosaic output mode",
+                      default=None)
+    parser.add_option("--catalog_file", dest="catalog_file", action="store", type="string",
+                      help="Optional SQLite tiles catalog file from CreateImageTiles, used instead of images path. "
+                           "Images with predicted or joined status are not processed again",
+                      default=None)
+    parser.add_option("--georeference_path", dest="georeference_path", action="store", type="string",
+                      help="Optional path of original images with world files (.jgw, .tfw, .wld) or georeferenced "
+                           "by GDAL, for output polygons in map coordinates", default=None)
     (options, args) = parser.parse_args()
     if not options.model_file:
         parser.print_help()
         return
-    if not options.images_path:
-        parser.print_help()
-        return
-    if not options.images_file_extension:
-        parser.print_help()
-        return
+    if not options.catalog_file:
+        if not options.images_path:
+            parser.print_help()
+            return
+        if not options.images_file_extension:
+            parser.print_help()
+            return
     if not options.output_path:
         parser.print_help()
         return
@@ -136,66 +366,165 @@ def main():
     if not exists(model_file):
         print("Error:\nNot exists model file:\n{}".format(model_file))
         return
-    images_path = options.images_path
-    if not exists(images_path):
-        print("Error:\nNot exists images path:\n{}".format(images_path))
-        return
-    images_file_extension = options.images_file_extension
-    images_file_extension = images_file_extension.lower()
-    files = os.listdir(images_path)
+    catalog = None
     images = {}
     number_of_image_tiles = 0
-    for file in files:
-        if not file.lower().endswith(images_file_extension):
-            continue
-        if not '_row' in file.lower():
-            continue
-        image_path = os.path.join(images_path, file)
-        original_image_file_name_without_extension = file.split('_row')[0]
-        str_aux = file.split('_row')[1]
-        str_row = str_aux.split('_')[1]
-        str_aux = str_aux.split('_column_')[1]
-        str_column = str_aux.split('.')[0]
-        image_tile = {}
-        image_tile['row'] = int(str_row)
-        image_tile['column'] = int(str_column)
-        image_tile['file'] = image_path
-        if not original_image_file_name_without_extension in images:
-            images[original_image_file_name_without_extension] = []
-        images[original_image_file_name_without_extension].append(image_tile)
-        number_of_image_tiles = number_of_image_tiles + 1
-    if len(images) < 1:
-        print("Error:\nNot exists tiles image files in path:\n{}".format(images_path))
-        return
+    if options.catalog_file:
+        if not exists(options.catalog_file):
+            print("Error:\nNot exists catalog file:\n{}".format(options.catalog_file))
+            return
+        catalog = TileCatalog(options.catalog_file)
+        images = catalog.getImages(exclude_status=status_predicted)
+        for image_file_name in images.keys():
+            number_of_image_tiles = number_of_image_tiles + len(images[image_file_name])
+        if len(images) < 1:
+            print("Not exists image tiles to predict in catalog:\n{}".format(options.catalog_file))
+            return
+    else:
+        images_path = options.images_path
+        if not exists(images_path):
+            print("Error:\nNot exists images path:\n{}".format(images_path))
+            return
+        images_file_extension = options.images_file_extension
+        images_file_extension = images_file_extension.lower()
+        files = os.listdir(images_path)
+        for file in files:
+            if not file.lower().endswith(images_file_extension):
+                continue
+            if not '_row' in file.lower():
+                continue
+            image_path = os.path.join(images_path, file)
+            original_image_file_name_without_extension = file.split('_row')[0]
+            str_aux = file.split('_row')[1]
+            str_row = str_aux.split('_')[1]
+            str_aux = str_aux.split('_column_')[1]
+            str_column = str_aux.split('.')[0]
+            image_tile = {}
+            image_tile['row'] = int(str_row)
+            image_tile['column'] = int(str_column)
+            image_tile['file'] = image_path
+            if not original_image_file_name_without_extension in images:
+                images[original_image_file_name_without_extension] = []
+            images[original_image_file_name_without_extension].append(image_tile)
+            number_of_image_tiles = number_of_image_tiles + 1
+        if len(images) < 1:
+            print("Error:\nNot exists tiles image files in path:\n{}".format(images_path))
+            return
     output_path = options.output_path
     if not os.path.exists(output_path):
         os.makedirs(output_path)
     if not os.path.exists(output_path):
         print("Error:\nNot exists output path:\n{}".format(output_path))
         return
+    output_mode = options.output_mode
+    if not output_mode:
+        output_mode = 'tiles'
+    output_mode = output_mode.lower()
+    if output_mode != 'tiles' and output_mode != 'mosaic':
+        print("Error:\nInvalid output mode: {}".format(output_mode))
+        return
+    output_format = options.output_format
+    if not output_format:
+        output_format = 'wkt'
+    output_format = output_format.lower()
+    if output_format != 'wkt' and output_format != 'rle' and output_format != 'both':
+        print("Error:\nInvalid output format: {}".format(output_format))
+        return
+    if output_mode == 'mosaic':
+        # mosaic polygons come from the polygonized label raster, not from the inference of each tile
+        if output_format != 'wkt':
+            print("Error:\nOutput format: {} is not available for mosaic output mode".format(output_format))
+            return
+        if options.cache_path:
+            print("Error:\nInference results cache is not available for mosaic output mode")
+            return
+    cache = None
+    if options.cache_path:
+        str_cache_max_size = options.cache_max_size
+        if not str_cache_max_size:
+            str_cache_max_size = "1024"
+        try:
+            cache_max_size = float(str_cache_max_size)
+        except ValueError:
+            print("Error:\nInvalid cache maximum size: {}".format(str_cache_max_size))
+            return
+        cache = InferenceCache(options.cache_path, int(cache_max_size * 1024 * 1024),
+                               model_file, getInferenceParameters())
+    georeference_path = options.georeference_path
+    if georeference_path and not exists(georeference_path):
+        print("Error:\nNot exists georeference path:\n{}".format(georeference_path))
+        return
+    queue = None
+    if options.queue_path:
+        node_id = options.node_id
+        if not node_id:
+            node_id = getDefaultNodeId()
+        str_lease_time = options.lease_time
+        if not str_lease_time:
+            str_lease_time = "600"
+        try:
+            lease_time = float(str_lease_time)
+        except ValueError:
+            print("Error:\nInvalid lease time: {}".format(str_lease_time))
+            return
+        queue = SharedWorkQueue(options.queue_path, node_id, lease_time)
     model = YOLO(model_file)
     cont = 0
-    for image_file_name in images.keys():
+    image_file_names = sorted(images.keys())
+    if queue is not None:
+        image_file_names = queue.iterateUnits(image_file_names)
+    failed_image_file_names = []
+    for image_file_name in image_file_names:
         output_file_name = image_file_name + '.txt'
         output_file_path = os.path.join(output_path, output_file_name)
-        if exists(output_file_path):
-            os.remove(output_file_path)
-        for tile in images[image_file_name]:
-            # if cont > 0:  # debug
-            #     break
-            column = tile['column']
-            row = tile['row']
-            file_path = tile['file']
-            success, str_error = predict(model,
-                                         file_path,
-                                         column,
-                                         row,
-                                         output_file_path)
-            if not success:
-                print("Prediction for image {}, error: {}".format(file_path, str_error))
-                return
-            cont = cont + 1
-            print("Number of image tiles to process ....: {}", (str(number_of_image_tiles-cont)))
+        geo_transform = None
+        crs_wkt = ''
+        if georeference_path:
+            geo_transform, crs_wkt = findGeoTransform(georeference_path, image_file_name)
+            if geo_transform is None:
+                print("Error:\nNot exists georeference for image: {} in path:\n{}".format(image_file_name,
+                                                                                      georeference_path))
+                if queue is not None:
+                    queue.release(image_file_name)
+                failed_image_file_names.append(image_file_name)
+                continue
+        if output_mode == 'mosaic':
+            success, str_error = predictImageMosaic(model,
+                                                    images[image_file_name],
+                                                    output_file_path,
+                                                    queue,
+                                                    image_file_name,
+                                                    geo_transform,
+                                                    crs_wkt)
+        else:
+            success, str_error = predictImage(model,
+                                              images[image_file_name],
+                                              output_file_path,
+                                              cache,
+                                              queue,
+                                              image_file_name,
+                                              output_format,
+                                              geo_transform,
+                                              crs_wkt)
+        if not success:
+            # a lost lease or a failed image does not stop the prediction of the other images
+            print("Prediction for image {}, error: {}".format(image_file_name, str_error))
+            if queue is not None:
+                queue.release(image_file_name)
+            failed_image_file_names.append(image_file_name)
+            continue
+        if queue is not None:
+            queue.complete(image_file_name)
+        if catalog is not None:
+            catalog.setImageStatus(image_file_name, status_predicted, 'prediction_file', output_file_path)
+        cont = cont + len(images[image_file_name])
+        print("Number of image tiles to process ....: {}".format(str(number_of_image_tiles-cont)))
+    if cache is not None:
+        print("Inference cache hits: {}, misses: {}".format(cache.hits, cache.misses))
+    if catalog is not None:
+        catalog.close()
+    if len(failed_image_file_names) > 0:
+        print("Error:\nImages not predicted:\n{}".format('\n'.join(failed_image_file_names)))
 
 
 if __name__ == '__main__':
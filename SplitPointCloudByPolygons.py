@@ -0,0 +1,226 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+import optparse
+import os
+from os.path import exists
+import glob
+import numpy as np
+from osgeo import gdal, ogr
+
+from point_cloud_clipping import checkLazBackend, clipPointCloud
+from split_layout import output_formats
+from process_pool import getNumberOfWorkers
+
+polygon_types = [ogr.wkbPolygon, ogr.wkbMultiPolygon]
+
+
+class OptionParser(optparse.OptionParser):
+    def check_required(self, opt):
+        option = self.get_option(opt)
+        # Assumes the option's 'default' is set to None!
+        if getattr(self.values, option.dest) is None:
+            self.error("%s option not supplied" % option)
+
+
+class GdalErrorHandler(object):
+    def __init__(self):
+        self.err_level = gdal.CE_None
+        self.err_no = 0
+        self.err_msg = ''
+
+    def handler(self, err_level, err_no, err_msg):
+        self.err_level = err_level
+        self.err_no = err_no
+        self.err_msg = err_msg
+
+
+def getPolygonRings(geom):
+    rings = []
+    for ring_index in range(geom.GetGeometryCount()):
+        ring = geom.GetGeometryRef(ring_index)
+        if ring.GetPointCount() < 3:
+            continue
+        rings.append(np.array(ring.GetPoints(), dtype=np.float64).reshape(ring.GetPointCount(), -1)[:, 0:2])
+    return rings
+
+
+def readPolygons(input_polygons, field_id):
+    # polygons of all layers in a vector file, or in all vector files of a path, as from
+    # CreateSplitPointCloudPolygonsForRail and CreateSplitPointCloudPolygonsForRailway
+    str_error = ''
+    polygons_rings = []
+    polygons_ids = []
+    if os.path.isdir(input_polygons):
+        input_files = []
+        for file_extension in output_formats.values():
+            input_files.extend(glob.glob(os.path.join(input_polygons, '*' + file_extension)))
+        input_files = sorted(input_files)
+    else:
+        input_files = [input_polygons]
+    for input_file in input_files:
+        try:
+            input_ds = ogr.Open(input_file, 0)  # 0 means read-only. 1 means writeable.
+        except Exception as e:
+            str_error = "Function readPolygons"
+            str_error += "\nError opening file:\n{}\n{}".format(input_file, str(e))
+            return str_error, polygons_rings, polygons_ids
+        if input_ds is None:
+            str_error = "Function readPolygons"
+            str_error += "\nError opening file:\n{}".format(input_file)
+            return str_error, polygons_rings, polygons_ids
+        for layer_index in range(input_ds.GetLayerCount()):
+            layer = input_ds.GetLayer(layer_index)
+            if not ogr.GT_Flatten(layer.GetGeomType()) in polygon_types:
+                continue
+            field_id_index = layer.GetLayerDefn().GetFieldIndex(field_id)
+            if field_id_index == -1:
+                str_error = "Function readPolygons"
+                str_error += "\nField: {} not exists in layer: {} of file:\n{}".format(field_id, layer.GetName(),
+                                                                                   input_file)
+                return str_error, polygons_rings, polygons_ids
+            for feature in layer:
+                geom = feature.GetGeometryRef()
+                if geom is None or geom.IsEmpty():
+                    continue
+                output_id = feature.GetFieldAsString(field_id_index)
+                if ogr.GT_Flatten(geom.GetGeometryType()) == ogr.wkbMultiPolygon:
+                    parts = [geom.GetGeometryRef(part_index) for part_index in range(geom.GetGeometryCount())]
+                else:
+                    parts = [geom]
+                for part in parts:
+                    rings = getPolygonRings(part)
+                    if len(rings) == 0:
+                        continue
+                    polygons_rings.append(rings)
+                    polygons_ids.append(output_id)
+        input_ds = None
+    if len(polygons_rings) == 0:
+        str_error = "Function readPolygons"
+        str_error += "\nNot polygons in:\n{}".format(input_polygons)
+    return str_error, polygons_rings, polygons_ids
+
+
+def process(input_point_cloud,
+            input_polygons,
+            field_id,
+            output_path,
+            chunk_size,
+            max_open_files,
+            workers=1):
+    # a missing LAZ backend is reported before reading the polygons
+    str_error = checkLazBackend(input_point_cloud)
+    if str_error:
+        return str_error
+    str_error, polygons_rings, polygons_ids = readPolygons(input_polygons, field_id)
+    if str_error:
+        return str_error
+    str_error, number_of_points = clipPointCloud(input_point_cloud,
+                                                 polygons_rings,
+                                                 polygons_ids,
+                                                 output_path,
+                                                 chunk_size,
+                                                 max_open_files,
+                                                 workers)
+    if str_error:
+        return str_error
+    for output_file_path in sorted(number_of_points.keys()):
+        print("{}: {} points".format(output_file_path, number_of_points[output_file_path]))
+    return str_error
+
+
+def main():
+    # ==================
+    # parse command line
+    # ==================
+    usage = "usage: %prog [options] "
+    parser = OptionParser(usage=usage)
+    parser.add_option("--input_point_cloud", dest="input_point_cloud", action="store", type="string",
+                      help="Input point cloud, LAS or LAZ", default=None)
+    parser.add_option("--input_polygons", dest="input_polygons", action="store", type="string",
+                      help="Input polygons file, or path of files, from CreateSplitPointCloudPolygonsForRail"
+                           " or CreateSplitPointCloudPolygonsForRailway", default=None)
+    parser.add_option("--field_id", dest="field_id", action="store", type="string",
+                      help="Identifier field name of output point clouds, str_id by default", default=None)
+    parser.add_option("--output_path", dest="output_path", action="store", type="string",
+                      help="Output path for point clouds", default=None)
+    parser.add_option("--chunk_size", dest="chunk_size", action="store", type="string",
+                      help="Number of points read by chunk, 1000000 by default", default=None)
+    parser.add_option("--max_open_files", dest="max_open_files", action="store", type="string",
+                      help="Maximum number of output point clouds open at the same time, 256 by default",
+                      default=None)
+    parser.add_option("--workers", dest="workers", action="store", type="string",
+                      help="Number of processes for point chunks, number of CPUs by default", default=None)
+    (options, args) = parser.parse_args()
+    if not options.input_point_cloud:
+        parser.print_help()
+        return
+    if not options.input_polygons:
+        parser.print_help()
+        return
+    if not options.output_path:
+        parser.print_help()
+        return
+    input_point_cloud = options.input_point_cloud
+    if not exists(input_point_cloud):
+        print("Error:\nNot exists input point cloud:\n{}".format(input_point_cloud))
+        return
+    input_polygons = options.input_polygons
+    if not exists(input_polygons):
+        print("Error:\nNot exists input polygons:\n{}".format(input_polygons))
+        return
+    field_id = 'str_id'
+    if options.field_id:
+        field_id = options.field_id
+    output_path = options.output_path
+    if not os.path.exists(output_path):
+        os.makedirs(output_path)
+    if not os.path.exists(output_path):
+        print("Error:\nNot exists output path:\n{}".format(output_path))
+        return
+    str_chunk_size = options.chunk_size
+    if not str_chunk_size:
+        str_chunk_size = '1000000'
+    flag = True
+    try:
+        chunk_size = int(str_chunk_size)
+    except ValueError:
+        flag = False
+    if not flag or chunk_size < 1:
+        print("Error:\nInvalid chunk size: {}".format(str_chunk_size))
+        return
+    str_max_open_files = options.max_open_files
+    if not str_max_open_files:
+        str_max_open_files = '256'
+    flag = True
+    try:
+        max_open_files = int(str_max_open_files)
+    except ValueError:
+        flag = False
+    if not flag or max_open_files < 1:
+        print("Error:\nInvalid maximum number of open files: {}".format(str_max_open_files))
+        return
+    str_error, workers = getNumberOfWorkers(options.workers)
+    if str_error:
+        print("Error:\n{}".format(str_error))
+        return
+    str_error = process(input_point_cloud,
+                        input_polygons,
+                        field_id,
+                        output_path,
+                        chunk_size,
+                        max_open_files,
+                        workers)
+    if str_error:
+        print("Error:\n{}".format(str_error))
+        return
+    print("... Process finished")
+
+
+if __name__ == '__main__':
+    # https://gdal.org/api/python_gotchas.html
+    err = GdalErrorHandler()
+    gdal.PushErrorHandler(err.handler)
+    gdal.UseExceptions()  # Exceptions will get raised on anything >= gdal.CE_Failure
+    assert err.err_level == gdal.CE_None, 'the error level starts at 0'
+    main()
@@ -5,6 +5,10 @@ from imgaug.augmentables.polys import Polygon, PolygonsOnImage
 from shapely.geometry import Polygon as ShapelyPolygon
 from shapely.geometry import MultiPoint
 
+# lector de etiquetas YOLO compartido con los scripts de la raíz del repositorio, que debe
+# estar en PYTHONPATH
+from yolo_labels import readYoloLabels
+
 def get_polygon_area(polygon):
     """
     Calcula el área de un polígono.
@@ -145,14 +149,11 @@ def load_polygon_data(polygon_path):
     Returns:
     - Lista de objetos polígonos de imgaug.
     """
+    classes, offsets, points = readYoloLabels(polygon_path)
     polygons = []
-    with open(polygon_path, 'r') as f:
-        for line in f:
-            data = line.strip().split()
-            class_id = int(data[0])
-            points = [float(val) for val in data[1:]]
-            polygon = Polygon([(points[i], points[i + 1]) for i in range(0, len(points), 2)], data[0])
-            polygons.append(polygon)
+    for i in range(len(classes)):
+        polygon = Polygon(points[offsets[i]:offsets[i + 1]], str(classes[i]))
+        polygons.append(polygon)
     return polygons
 
 def calculate_polygon_intersection(polygon):
@@ -0,0 +1,123 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+# Pixel to map coordinates for images with world file (.jgw, .tfw, .wld, ...) or
+# georeferenced by GDAL (GeoTIFF tags, .aux.xml), as a GDAL geotransform:
+# x = gt[0] + column * gt[1] + row * gt[2], y = gt[3] + column * gt[4] + row * gt[5]
+# with column and row continuous image coordinates from the upper left corner
+
+import os
+from math import ceil, log10
+import numpy as np
+
+world_file_extensions = ['.jgw', '.jpgw', '.tfw', '.tifw', '.pgw', '.pngw', '.wld']
+georeferenced_image_extensions = ['.tif', '.tiff', '.jpg', '.jpeg', '.png']
+
+
+def readWorldFile(file_path):
+    values = []
+    with open(file_path, 'r') as input_file:
+        for line in input_file:
+            if line.strip():
+                values.append(float(line.strip()))
+    if len(values) != 6:
+        return None
+    a, d, b, e, c, f = values
+    # world file refers to center of upper left pixel
+    return (c - 0.5 * a - 0.5 * b, a, b, f - 0.5 * d - 0.5 * e, d, e)
+
+
+def getWorldFilePath(image_path):
+    base, ext = os.path.splitext(image_path)
+    candidates = []
+    if len(ext) > 2:
+        candidates.append(ext[0:2] + ext[-1] + 'w')
+        candidates.append(ext + 'w')
+    candidates.append('.wld')
+    for candidate in candidates:
+        for world_file_ext in [candidate.lower(), candidate.upper()]:
+            if os.path.exists(base + world_file_ext):
+                return base + world_file_ext
+    return None
+
+
+def readProjectionFile(file_path):
+    base = os.path.splitext(file_path)[0]
+    for prj_file_path in [base + '.prj', file_path + '.prj']:
+        if os.path.exists(prj_file_path):
+            with open(prj_file_path, 'r') as input_file:
+                return input_file.read().strip()
+    return ''
+
+
+def getGeoTransform(image_path):
+    # geotransform and crs wkt, crs is empty if unknown, geotransform is None if not georeferenced
+    world_file_path = getWorldFilePath(image_path)
+    if world_file_path is not None:
+        geo_transform = readWorldFile(world_file_path)
+        if geo_transform is not None:
+            return geo_transform, readProjectionFile(image_path)
+    if not os.path.exists(image_path):
+        return None, ''
+    try:
+        from osgeo import gdal
+    except ImportError:
+        return None, ''
+    try:
+        ds = gdal.Open(image_path)
+    except Exception:
+        return None, ''
+    if ds is None:
+        return None, ''
+    geo_transform = ds.GetGeoTransform(can_return_null=True)
+    crs_wkt = ds.GetProjection()
+    ds = None
+    if geo_transform is None:
+        return None, ''
+    return tuple(geo_transform), crs_wkt
+
+
+def findGeoTransform(path, image_file_name):
+    # georeference for an image name without extension, from world files or images in path
+    for ext in world_file_extensions:
+        for file_ext in [ext, ext.upper()]:
+            world_file_path = os.path.join(path, image_file_name + file_ext)
+            if os.path.exists(world_file_path):
+                geo_transform = readWorldFile(world_file_path)
+                if geo_transform is not None:
+                    return geo_transform, readProjectionFile(world_file_path)
+    for ext in georeferenced_image_extensions:
+        for file_ext in [ext, ext.upper()]:
+            image_path = os.path.join(path, image_file_name + file_ext)
+            if os.path.exists(image_path):
+                geo_transform, crs_wkt = getGeoTransform(image_path)
+                if geo_transform is not None:
+                    return geo_transform, crs_wkt
+    return None, ''
+
+
+def transformPixelCoordinates(geo_transform, columns, rows):
+    columns = np.asarray(columns, dtype=np.float64)
+    rows = np.asarray(rows, dtype=np.float64)
+    xs = geo_transform[0] + columns * geo_transform[1] + rows * geo_transform[2]
+    ys = geo_transform[3] + columns * geo_transform[4] + rows * geo_transform[5]
+    return xs, ys
+
+
+def getCoordinatesFormat(geo_transform):
+    # two decimals for pixels, for map coordinates two more than pixel size
+    if geo_transform is None:
+        return "{0:.2f} {1:.2f}"
+    pixel_size = max(abs(geo_transform[1]), abs(geo_transform[2]), abs(geo_transform[4]), abs(geo_transform[5]))
+    decimals = 2
+    if pixel_size > 0.:
+        decimals = max(2, int(ceil(-log10(pixel_size))) + 2)
+    return "{0:." + str(decimals) + "f} {1:." + str(decimals) + "f}"
+
+
+def writeProjectionFile(file_path, crs_wkt):
+    if not crs_wkt:
+        return
+    prj_file_path = os.path.splitext(file_path)[0] + '.prj'
+    with open(prj_file_path, 'w') as output_file:
+        output_file.write(crs_wkt)
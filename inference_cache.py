@@ -0,0 +1,124 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+import os
+import json
+import hashlib
+import numpy as np
+
+cache_file_extension = '.json'
+# entries of other formats are not used, their keys are different
+cache_format = 2
+hash_block_size = 1024 * 1024
+
+
+def getFileHash(file_path):
+    hash = hashlib.sha256()
+    with open(file_path, 'rb') as input_file:
+        while True:
+            block = input_file.read(hash_block_size)
+            if not block:
+                break
+            hash.update(block)
+    return hash.hexdigest()
+
+
+class InferenceCache(object):
+    # On disk cache of instance polygons in tile pixel coordinates, and optionally of instance
+    # RLE masks of the tile, keyed by (tile pixels, model weights, inference parameters), with
+    # LRU eviction by access time
+    def __init__(self, cache_path, max_size, model_file, inference_parameters):
+        self.cache_path = cache_path
+        self.max_size = max_size
+        self.prefix = getFileHash(model_file)
+        self.prefix += json.dumps(inference_parameters, sort_keys=True)
+        self.prefix += str(cache_format)
+        self.entries = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        if not os.path.exists(self.cache_path):
+            os.makedirs(self.cache_path)
+        for entry in os.scandir(self.cache_path):
+            if not entry.name.endswith(cache_file_extension):
+                continue
+            key = entry.name[:-len(cache_file_extension)]
+            stat = entry.stat()
+            self.entries[key] = [stat.st_size, stat.st_mtime]
+            self.size += stat.st_size
+
+    def getKey(self, image):
+        hash = hashlib.sha256()
+        hash.update(self.prefix.encode('utf-8'))
+        hash.update(str(image.shape).encode('utf-8'))
+        hash.update(str(image.dtype).encode('utf-8'))
+        hash.update(np.ascontiguousarray(image).data)
+        return hash.hexdigest()
+
+    def getFilePath(self, key):
+        return os.path.join(self.cache_path, key + cache_file_extension)
+
+    def get(self, key, with_rle=False):
+        # (instances, rle instances) or None, rle instances is None if they were not stored,
+        # and the entry is a miss if they are needed
+        if not key in self.entries:
+            self.misses += 1
+            return None
+        file_path = self.getFilePath(key)
+        try:
+            with open(file_path, 'r') as input_file:
+                data = json.load(input_file)
+            os.utime(file_path)
+        except (OSError, ValueError):
+            self.remove(key)
+            self.misses += 1
+            return None
+        self.entries[key][1] = os.path.getmtime(file_path)
+        if with_rle and data['rle'] is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        instances = []
+        for seg_class, contours in data['contours']:
+            instance_contours = []
+            for contour in contours:
+                instance_contours.append(np.array(contour, dtype=np.float32).reshape(-1, 2))
+            instances.append([seg_class, instance_contours])
+        return instances, data['rle']
+
+    def put(self, key, instances, rle_instances=None):
+        data = {}
+        data['contours'] = []
+        for seg_class, contours in instances:
+            data['contours'].append([seg_class, [contour.ravel().tolist() for contour in contours]])
+        data['rle'] = rle_instances
+        file_path = self.getFilePath(key)
+        tmp_file_path = file_path + '.' + str(os.getpid()) + '.tmp'
+        with open(tmp_file_path, 'w') as output_file:
+            json.dump(data, output_file, separators=(',', ':'))
+        os.replace(tmp_file_path, file_path)
+        if key in self.entries:
+            self.size -= self.entries[key][0]
+        stat = os.stat(file_path)
+        self.entries[key] = [stat.st_size, stat.st_mtime]
+        self.size += stat.st_size
+        self.evict()
+
+    def remove(self, key):
+        if not key in self.entries:
+            return
+        try:
+            os.remove(self.getFilePath(key))
+        except OSError:
+            pass
+        self.size -= self.entries[key][0]
+        del self.entries[key]
+
+    def evict(self):
+        if self.size <= self.max_size:
+            return
+        keys = sorted(self.entries.keys(), key=lambda key: self.entries[key][1])
+        for key in keys:
+            if self.size <= self.max_size:
+                break
+            self.remove(key)
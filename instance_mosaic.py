@@ -0,0 +1,103 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+# Instance label raster for the full image in mosaic output mode of PredictWktFormat. Each
+# instance mask of a tile gets a unique id, its class is kept in a lookup table, and parts
+# of instances of the same class touching across a tile limit are merged in a union-find
+# structure, so touching objects inside a tile are not merged by the polygonization
+
+import os
+import numpy as np
+
+relabel_block_rows = 1024
+
+
+def getTileBoxes(image_tiles, tile_sizes):
+    # (first column, first row, last column, last row) of each tile in the full image, from
+    # the catalog origin if exists, otherwise from row and column with the size of the
+    # first tile, and always with the size (width, height) of each tile image
+    first_width, first_height = tile_sizes[0]
+    boxes = []
+    for tile, (width, height) in zip(image_tiles, tile_sizes):
+        if tile.get('first_column') is not None and tile.get('first_row') is not None:
+            first_column = int(tile['first_column'])
+            first_row = int(tile['first_row'])
+        else:
+            first_column = (tile['column'] - 1) * first_width
+            first_row = (tile['row'] - 1) * first_height
+        boxes.append((first_column, first_row, first_column + width, first_row + height))
+    return boxes
+
+
+def getMosaicSize(boxes):
+    # width and height of the raster covering all tiles
+    return max([box[2] for box in boxes]), max([box[3] for box in boxes])
+
+
+class InstanceMosaic(object):
+    def __init__(self, file_path, width, height):
+        self.file_path = file_path
+        self.labels = np.memmap(file_path, dtype=np.uint32, mode='w+', shape=(height, width))
+        # id 0 is background
+        self.classes = ['']
+        self.parents = [0]
+
+    def getRoot(self, instance_id):
+        root = instance_id
+        while self.parents[root] != root:
+            root = self.parents[root]
+        while self.parents[instance_id] != root:
+            self.parents[instance_id], instance_id = root, self.parents[instance_id]
+        return root
+
+    def merge(self, first_id, second_id):
+        first_root = self.getRoot(first_id)
+        second_root = self.getRoot(second_id)
+        if first_root != second_root:
+            self.parents[max(first_root, second_root)] = min(first_root, second_root)
+
+    def mergeBorder(self, first_labels, second_labels):
+        # adjacent pixels of two tiles, instances of the same class touching are merged
+        touching = (first_labels > 0) & (second_labels > 0)
+        if not touching.any():
+            return
+        pairs = np.unique(np.stack((first_labels[touching], second_labels[touching]), axis=1), axis=0)
+        for first_id, second_id in pairs.tolist():
+            if self.classes[first_id] == self.classes[second_id]:
+                self.merge(first_id, second_id)
+
+    def addTile(self, box, instances_masks):
+        # instance masks as (class, boolean mask) of tile size, a later instance is over
+        # the previous ones. Tiles at the left and above must be added before
+        first_column, first_row, last_column, last_row = box
+        last_column = min(last_column, self.labels.shape[1])
+        last_row = min(last_row, self.labels.shape[0])
+        tile_labels = self.labels[first_row:last_row, first_column:last_column]
+        for seg_class, mask in instances_masks:
+            instance_id = len(self.parents)
+            self.parents.append(instance_id)
+            self.classes.append(seg_class)
+            tile_labels[mask[:tile_labels.shape[0], :tile_labels.shape[1]]] = instance_id
+        if first_column > 0:
+            self.mergeBorder(self.labels[first_row:last_row, first_column - 1],
+                             self.labels[first_row:last_row, first_column])
+        if first_row > 0:
+            self.mergeBorder(self.labels[first_row - 1, first_column:last_column],
+                             self.labels[first_row, first_column:last_column])
+
+    def relabel(self):
+        # each pixel gets the root id of its instance, by blocks of rows
+        roots = np.array([self.getRoot(instance_id) for instance_id in range(len(self.parents))],
+                         dtype=np.uint32)
+        for first_row in range(0, self.labels.shape[0], relabel_block_rows):
+            block = self.labels[first_row:first_row + relabel_block_rows]
+            block[:] = roots[block]
+        self.labels.flush()
+
+    def getClass(self, instance_id):
+        return self.classes[instance_id]
+
+    def remove(self):
+        self.labels = None
+        if os.path.exists(self.file_path):
+            os.remove(self.file_path)
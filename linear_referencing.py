@@ -0,0 +1,137 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+# Linear referencing along a polyline (rail or centerline): cumulative length (chainage)
+# of vertices and segments with an STR-tree of segment boxes. Point at chainage is a
+# binary search on chainages and chainage of a point a nearest segment query in the tree
+
+import numpy as np
+
+from spatial_index import STRtree
+
+
+class LinearReferencingIndex(object):
+    def __init__(self, points):
+        # points as (x, y) or (x, y, z), a polyline without points is valid
+        points = np.array(points, dtype=np.float64)
+        if points.ndim != 2:
+            points = points.reshape(-1, 2)
+        points = points[:, 0:2]
+        self.points = points
+        increments = np.diff(points, axis=0)
+        lengths = np.hypot(increments[:, 0], increments[:, 1])
+        # chainage of each vertex
+        self.vertex_chainages = np.concatenate(([0.], np.cumsum(lengths)))[0:points.shape[0]]
+        self.length = float(self.vertex_chainages[-1]) if points.shape[0] > 0 else 0.
+        # segments with length, zero length segments are not used
+        valid = lengths > 0.
+        self.starts = points[:-1][valid]
+        self.ends = points[1:][valid]
+        self.lengths = lengths[valid]
+        self.directions = increments[valid] / self.lengths[:, None] if self.lengths.size > 0 \
+            else np.zeros((0, 2), dtype=np.float64)
+        self.chainages = self.vertex_chainages[:-1][valid]
+        self.end_chainages = self.chainages + self.lengths
+        boxes = np.concatenate((np.minimum(self.starts, self.ends), np.maximum(self.starts, self.ends)), axis=1)
+        self.tree = STRtree(boxes)
+        self.search_distance = float(np.median(self.lengths)) if self.lengths.size > 0 else 1.
+
+    def getSegments(self, chainages):
+        # segment of each chainage, the first one ending at or after it
+        segments = np.searchsorted(self.end_chainages, chainages, side='left')
+        return np.minimum(segments, self.lengths.size - 1)
+
+    def pointAtChainage(self, chainages):
+        # points and segment directions at chainages, outside the polyline are extrapolated
+        chainages = np.asarray(chainages, dtype=np.float64)
+        if self.lengths.size == 0:
+            # polyline without length, its first point if any
+            origin = self.points[0] if self.points.shape[0] > 0 else np.full(2, np.nan)
+            shape = chainages.shape + (2,)
+            return np.broadcast_to(origin, shape).copy(), np.zeros(shape, dtype=np.float64)
+        segments = self.getSegments(chainages)
+        directions = self.directions[segments]
+        points = self.starts[segments] + (chainages - self.chainages[segments])[..., None] * directions
+        return points, directions
+
+    def getNearestOnSegments(self, point, segments):
+        # chainage and distance of the nearest point in each segment
+        factors = np.einsum('ij,ij->i', point - self.starts[segments], self.directions[segments])
+        factors = np.clip(factors, 0., self.lengths[segments])
+        nearest_points = self.starts[segments] + factors[:, None] * self.directions[segments]
+        distances = np.hypot(nearest_points[:, 0] - point[0], nearest_points[:, 1] - point[1])
+        return self.chainages[segments] + factors, distances
+
+    def chainageOfPoint(self, point):
+        # chainage of the nearest point of the polyline and distance to it
+        if self.lengths.size == 0:
+            return 0., float('inf')
+        point = np.asarray(point, dtype=np.float64)[0:2]
+        search_distance = self.search_distance
+        while True:
+            segments = self.tree.query((point[0] - search_distance, point[1] - search_distance,
+                                        point[0] + search_distance, point[1] + search_distance))
+            if segments.size > 0:
+                break
+            search_distance = 2. * search_distance
+        chainages, distances = self.getNearestOnSegments(point, segments)
+        nearest = int(np.argmin(distances))
+        if distances[nearest] > search_distance:
+            # a segment out of the searched box may be nearer
+            search_distance = float(distances[nearest])
+            segments = self.tree.query((point[0] - search_distance, point[1] - search_distance,
+                                        point[0] + search_distance, point[1] + search_distance))
+            chainages, distances = self.getNearestOnSegments(point, segments)
+            nearest = int(np.argmin(distances))
+        return float(chainages[nearest]), float(distances[nearest])
+
+    def getStepChainages(self, step, tolerance=0.001):
+        # chainages at fixed step and the length as last one, steps closer than tolerance to
+        # the length are dropped so the last interval is not a sliver
+        chainages = np.arange(0., self.length, step)
+        chainages = chainages[chainages < self.length - tolerance]
+        if chainages.size == 0:
+            chainages = np.zeros(1, dtype=np.float64)
+        return np.append(chainages, self.length)
+
+    def getChunkChainages(self, chunk_length):
+        # start and end chainages of consecutive chunks of chunk_length, the last one shorter
+        chainages = self.getStepChainages(chunk_length)
+        return chainages[:-1], chainages[1:]
+
+    def getSubline(self, start_chainage, end_chainage):
+        # points of the polyline between two chainages
+        start_chainage = min(max(start_chainage, 0.), self.length)
+        end_chainage = min(max(end_chainage, start_chainage), self.length)
+        if self.lengths.size == 0:
+            return self.points[0:1].copy()
+        inner = (self.vertex_chainages > start_chainage) & (self.vertex_chainages < end_chainage)
+        end_points, end_directions = self.pointAtChainage(np.array([start_chainage, end_chainage]))
+        return np.concatenate((end_points[0:1], self.points[inner], end_points[1:2]))
+
+    def getVertexDirections(self, vertices):
+        # mean direction of the segments before and after each inner vertex
+        segments = self.getSegments(self.vertex_chainages[vertices])
+        directions = self.directions[segments] + self.directions[np.minimum(segments + 1, self.lengths.size - 1)]
+        norms = np.hypot(directions[:, 0], directions[:, 1])
+        # a vertex where the polyline goes back keeps the direction of the previous segment
+        reversed_vertices = norms < 1.e-9
+        directions[reversed_vertices] = self.directions[segments[reversed_vertices]]
+        norms[reversed_vertices] = 1.
+        return directions / norms[:, None]
+
+    def getChunkCell(self, start_chainage, end_chainage, half_width):
+        # closed ring around the polyline between the normals at both chainages, half_width at
+        # each side. Chainages out of the polyline are extrapolated. Cells of consecutive chunks
+        # share the side at their common chainage, so polygons clipped by them do not overlap
+        if self.lengths.size == 0:
+            return None
+        end_points, end_directions = self.pointAtChainage(np.array([start_chainage, end_chainage]))
+        inner = np.flatnonzero((self.vertex_chainages > start_chainage) & (self.vertex_chainages < end_chainage))
+        points = np.concatenate((end_points[0:1], self.points[inner], end_points[1:2]))
+        directions = np.concatenate((end_directions[0:1], self.getVertexDirections(inner), end_directions[1:2]))
+        normals = np.column_stack((-directions[:, 1], directions[:, 0]))
+        left = points + half_width * normals
+        right = points - half_width * normals
+        return np.concatenate((left, right[::-1], left[0:1]))
+
@@ -0,0 +1,95 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+# COCO uncompressed run length encoding: column major order and counts starting
+# with the run of background pixels, {'size': [height, width], 'counts': [...]}
+
+import json
+import numpy as np
+import cv2
+
+
+def encodeMask(mask):
+    pixels = np.asarray(mask, dtype=bool).ravel(order='F')
+    rle = {}
+    rle['size'] = [int(mask.shape[0]), int(mask.shape[1])]
+    if pixels.size == 0:
+        rle['counts'] = []
+        return rle
+    changes = np.flatnonzero(pixels[1:] != pixels[:-1]) + 1
+    counts = np.diff(np.concatenate(([0], changes, [pixels.size])))
+    if pixels[0]:
+        counts = np.concatenate(([0], counts))
+    rle['counts'] = counts.tolist()
+    return rle
+
+
+def decodeMask(rle):
+    height, width = rle['size']
+    counts = np.asarray(rle['counts'], dtype=np.int64)
+    values = np.zeros(len(counts), dtype=bool)
+    values[1::2] = True
+    pixels = np.repeat(values, counts)
+    return pixels.reshape((height, width), order='F')
+
+
+def getArea(rle):
+    return int(np.sum(np.asarray(rle['counts'], dtype=np.int64)[1::2]))
+
+
+def getIntervals(rle):
+    # foreground runs as [start, end) in column major pixel index
+    bounds = np.cumsum(np.asarray(rle['counts'], dtype=np.int64))
+    ends = bounds[1::2]
+    starts = bounds[0::2][:len(ends)]
+    return starts, ends
+
+
+def getForegroundBefore(starts, ends, cumulative_lengths, positions):
+    # number of foreground pixels with index lower than each position
+    index = np.searchsorted(starts, positions, side='right')
+    values = cumulative_lengths[index]
+    last = index - 1
+    inside = last >= 0
+    last_ends = ends[np.maximum(last, 0)]
+    overflow = np.where(inside, np.maximum(last_ends - positions, 0), 0)
+    return values - overflow
+
+
+def getIntersectionArea(rle_1, rle_2):
+    if list(rle_1['size']) != list(rle_2['size']):
+        return 0
+    starts_1, ends_1 = getIntervals(rle_1)
+    starts_2, ends_2 = getIntervals(rle_2)
+    if len(starts_1) == 0 or len(starts_2) == 0:
+        return 0
+    cumulative_lengths_2 = np.concatenate(([0], np.cumsum(ends_2 - starts_2)))
+    area = getForegroundBefore(starts_2, ends_2, cumulative_lengths_2, ends_1) \
+        - getForegroundBefore(starts_2, ends_2, cumulative_lengths_2, starts_1)
+    return int(np.sum(area))
+
+
+def getIoU(rle_1, rle_2):
+    intersection_area = getIntersectionArea(rle_1, rle_2)
+    union_area = getArea(rle_1) + getArea(rle_2) - intersection_area
+    if union_area == 0:
+        return 0.
+    return intersection_area / union_area
+
+
+def getContours(rle):
+    # polygons are only computed when a consumer needs them
+    mask = decodeMask(rle).astype(np.uint8) * 255
+    contours, hierarchy = cv2.findContours(mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    return [contour.reshape(-1, 2).astype(np.float32) for contour in contours]
+
+
+def writeRleFile(file_path, instances):
+    with open(file_path, 'w') as output_file:
+        json.dump(instances, output_file, separators=(',', ':'))
+
+
+def readRleFile(file_path):
+    with open(file_path, 'r') as input_file:
+        instances = json.load(input_file)
+    return instances
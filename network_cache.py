@@ -0,0 +1,48 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+# .npz cache of the rail network arrays next to the input file, keyed by modification time
+# and size of its files and the field names, so any change of the input invalidates it
+
+import os
+import numpy as np
+
+cache_file_extension = '.network.npz'
+cache_version = 1
+
+
+def getCacheKey(input_file, field_idRail, field_idRailway):
+    values = [str(cache_version), str(field_idRail), str(field_idRailway)]
+    base = os.path.splitext(input_file)[0]
+    for file_path in [input_file, base + '.dbf', base + '.prj']:
+        if os.path.exists(file_path):
+            stat = os.stat(file_path)
+            values.extend([os.path.basename(file_path), str(stat.st_mtime_ns), str(stat.st_size)])
+    return ';'.join(values)
+
+
+def readCache(cache_file, cache_key):
+    # coordinates, offsets, rail ids, railway ids and crs wkt, None if not valid for the key
+    if not os.path.exists(cache_file):
+        return None
+    try:
+        with np.load(cache_file, allow_pickle=False) as data:
+            if str(data['key']) != cache_key:
+                return None
+            return (data['coordinates'], data['offsets'], data['rail_ids'], data['railway_ids'],
+                    str(data['crs_wkt']))
+    except Exception:
+        return None
+
+
+def writeCache(cache_file, cache_key, network):
+    # cache is optional, a read only input path is not an error
+    tmp_cache_file = cache_file + '.' + str(os.getpid()) + '.tmp.npz'
+    try:
+        np.savez(tmp_cache_file, key=np.array(cache_key), coordinates=network.coordinates,
+                 offsets=network.offsets, rail_ids=network.rail_ids, railway_ids=network.railway_ids,
+                 crs_wkt=np.array(network.crs_wkt))
+        os.replace(tmp_cache_file, cache_file)
+    except OSError:
+        if os.path.exists(tmp_cache_file):
+            os.remove(tmp_cache_file)
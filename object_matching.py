@@ -0,0 +1,26 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+# One-to-one matching of objects of two epochs for DetectChanges: candidate pairs of all
+# chunks of the second epoch are matched together, best IoU first, so the result does not
+# depend on the chunk size nor on the order of the objects
+
+import numpy as np
+
+
+def matchPairs(pairs, number_of_objects_a, number_of_objects_b):
+    # pairs as (iou, index a, index b), returns the positions in pairs of the matched ones.
+    # Ties are resolved by the indexes of a and b
+    matched_a = np.zeros(number_of_objects_a, dtype=bool)
+    matched_b = np.zeros(number_of_objects_b, dtype=bool)
+    matches = []
+    order = sorted(range(len(pairs)), key=lambda position: (-pairs[position][0], pairs[position][1],
+                                                             pairs[position][2]))
+    for position in order:
+        iou, index_a, index_b = pairs[position][0:3]
+        if matched_a[index_a] or matched_b[index_b]:
+            continue
+        matched_a[index_a] = True
+        matched_b[index_b] = True
+        matches.append(position)
+    return matches, matched_a, matched_b
@@ -0,0 +1,144 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+# Clipping of a LAS/LAZ point cloud by polygons with an identifier. Points are read by
+# chunks, clipped with a PolygonIndex, in a process pool when there are several workers,
+# and appended to one output point cloud by id
+
+import os
+from collections import OrderedDict, deque
+from multiprocessing import Pool
+import numpy as np
+import laspy
+
+from polygon_index import PolygonIndex, getPolygonIds
+
+laz_file_extension = '.laz'
+# polygon index of each worker process
+worker_polygon_index = None
+
+
+class PointCloudWriters(object):
+    # one output point cloud by id, at most max_open_files open at the same time, the least
+    # recently used is closed and opened again in append mode for its next points
+    def __init__(self, output_path, base_name, file_extension, header, max_open_files):
+        self.output_path = output_path
+        self.base_name = base_name
+        self.file_extension = file_extension
+        self.header = header
+        self.max_open_files = max_open_files
+        self.writers = OrderedDict()
+        self.created = set()
+        self.number_of_points = {}
+
+    def getFilePath(self, output_id):
+        return os.path.normpath(os.path.join(self.output_path,
+                                             self.base_name + "_" + output_id + self.file_extension))
+
+    def writePoints(self, output_id, points):
+        if output_id in self.writers:
+            self.writers.move_to_end(output_id)
+            writer, append = self.writers[output_id]
+        else:
+            if len(self.writers) >= self.max_open_files:
+                oldest_id, (oldest_writer, oldest_append) = self.writers.popitem(last=False)
+                oldest_writer.close()
+            file_path = self.getFilePath(output_id)
+            append = output_id in self.created
+            if append:
+                writer = laspy.open(file_path, mode='a')
+            else:
+                # an existing file is replaced
+                writer = laspy.open(file_path, mode='w', header=self.header)
+                self.created.add(output_id)
+                self.number_of_points[output_id] = 0
+            self.writers[output_id] = (writer, append)
+        if append:
+            writer.append_points(points)
+        else:
+            writer.write_points(points)
+        self.number_of_points[output_id] += len(points)
+
+    def close(self):
+        for writer, append in self.writers.values():
+            writer.close()
+        self.writers = OrderedDict()
+
+
+def checkLazBackend(file_path):
+    # LAZ input and outputs need lazrs, the only laspy backend appending points to LAZ files,
+    # checked before reading polygons and points
+    str_error = ''
+    if os.path.splitext(file_path)[1].lower() != laz_file_extension:
+        return str_error
+    if not laspy.LazBackend.Lazrs in laspy.LazBackend.detect_available():
+        str_error = "Function checkLazBackend"
+        str_error += "\nNot exists lazrs LAZ backend for laspy, install lazrs, for file:\n{}".format(file_path)
+    return str_error
+
+
+def initWorker(polygons_rings, polygons_ids):
+    # polygon index prepared once in each worker process
+    global worker_polygon_index
+    worker_polygon_index = PolygonIndex(polygons_rings, polygons_ids)
+
+
+def clipChunk(arguments):
+    # indexes of chunk points in the polygons of each id, in a worker process
+    x, y = arguments
+    return worker_polygon_index.getPointsInPolygons(x, y)
+
+
+def getChunkCoordinates(points):
+    return np.asarray(points.x, dtype=np.float64), np.asarray(points.y, dtype=np.float64)
+
+
+def writeChunk(writers, ids, points, points_in_polygons):
+    for id_position, point_indexes in points_in_polygons:
+        writers.writePoints(ids[id_position], points[point_indexes])
+
+
+def clipPointCloud(input_point_cloud,
+                   polygons_rings,
+                   polygons_ids,
+                   output_path,
+                   chunk_size,
+                   max_open_files,
+                   workers=1):
+    # number of points written by id
+    number_of_points = {}
+    str_error = checkLazBackend(input_point_cloud)
+    if str_error:
+        return str_error, number_of_points
+    ids = getPolygonIds(polygons_ids)
+    base_name, file_extension = os.path.splitext(os.path.basename(input_point_cloud))
+    try:
+        reader = laspy.open(input_point_cloud, mode='r')
+    except Exception as e:
+        str_error = "Function clipPointCloud"
+        str_error += "\nError opening point cloud:\n{}\n{}".format(input_point_cloud, str(e))
+        return str_error, number_of_points
+    writers = PointCloudWriters(output_path, base_name, file_extension.lower(), reader.header, max_open_files)
+    # points are read by chunks, memory does not depend on the size of the point cloud
+    if workers == 1:
+        initWorker(polygons_rings, polygons_ids)
+        for points in reader.chunk_iterator(chunk_size):
+            writeChunk(writers, ids, points, clipChunk(getChunkCoordinates(points)))
+    else:
+        # chunks clipped in the pool, at most two by worker waiting, and written in the
+        # order of the point cloud by this process
+        with Pool(processes=workers, initializer=initWorker, initargs=(polygons_rings, polygons_ids)) as pool:
+            chunks_in_flight = deque()
+            for points in reader.chunk_iterator(chunk_size):
+                if len(chunks_in_flight) >= 2 * workers:
+                    chunk_points, chunk_result = chunks_in_flight.popleft()
+                    writeChunk(writers, ids, chunk_points, chunk_result.get())
+                chunks_in_flight.append((points, pool.apply_async(clipChunk, (getChunkCoordinates(points),))))
+            while len(chunks_in_flight) > 0:
+                chunk_points, chunk_result = chunks_in_flight.popleft()
+                writeChunk(writers, ids, chunk_points, chunk_result.get())
+    writers.close()
+    reader.close()
+    for output_id in sorted(writers.number_of_points.keys()):
+        number_of_points[writers.getFilePath(output_id)] = writers.number_of_points[output_id]
+    return str_error, number_of_points
@@ -0,0 +1,133 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+# Point in polygon tests for many points and polygons with NumPy. Each polygon is prepared
+# once: its edges, from all rings, are stored by horizontal bands so the even-odd crossing
+# test of a point only uses the edges of its band. Polygon bounding boxes are in an
+# STR-tree and points out of a polygon box are rejected before testing its edges
+
+from math import ceil
+import numpy as np
+
+from spatial_index import STRtree
+
+max_edges_in_band = 8
+max_number_of_bands = 4096
+
+
+class PreparedPolygon(object):
+    def __init__(self, rings):
+        # rings as arrays of (x, y), exterior and holes, closed or not
+        starts = []
+        ends = []
+        for ring in rings:
+            ring = np.asarray(ring, dtype=np.float64)[:, 0:2]
+            if ring.shape[0] < 3:
+                continue
+            starts.append(ring)
+            ends.append(np.roll(ring, -1, axis=0))
+        if len(starts) == 0:
+            starts = [np.zeros((0, 2), dtype=np.float64)]
+            ends = [np.zeros((0, 2), dtype=np.float64)]
+        starts = np.concatenate(starts)
+        ends = np.concatenate(ends)
+        # horizontal edges never cross a horizontal ray
+        valid = starts[:, 1] != ends[:, 1]
+        starts = starts[valid]
+        ends = ends[valid]
+        self.x0 = starts[:, 0]
+        self.y0 = starts[:, 1]
+        self.x1 = ends[:, 0]
+        self.y1 = ends[:, 1]
+        self.slopes = (self.x1 - self.x0) / (self.y1 - self.y0)
+        if starts.shape[0] == 0:
+            self.box = (0., 0., -1., -1.)
+            self.number_of_bands = 0
+            return
+        all_points = np.concatenate((starts, ends))
+        self.box = (float(all_points[:, 0].min()), float(all_points[:, 1].min()),
+                    float(all_points[:, 0].max()), float(all_points[:, 1].max()))
+        self.number_of_bands = int(min(max_number_of_bands, max(1, ceil(starts.shape[0] / max_edges_in_band))))
+        self.band_height = (self.box[3] - self.box[1]) / self.number_of_bands
+        if self.band_height <= 0.:
+            self.band_height = 1.
+        # edges of each band as compressed rows: band_edges[band_offsets[i]:band_offsets[i + 1]]
+        first_bands = self.getBands(np.minimum(self.y0, self.y1))
+        last_bands = self.getBands(np.maximum(self.y0, self.y1))
+        counts = last_bands - first_bands + 1
+        edges = np.repeat(np.arange(starts.shape[0]), counts)
+        edge_offsets = np.repeat(np.cumsum(counts) - counts, counts)
+        bands = np.repeat(first_bands, counts) + np.arange(edges.size) - edge_offsets
+        order = np.argsort(bands, kind='stable')
+        self.band_edges = edges[order]
+        self.band_offsets = np.searchsorted(bands[order], np.arange(self.number_of_bands + 1), side='left')
+
+    def getBands(self, y):
+        bands = np.floor((y - self.box[1]) / self.band_height).astype(np.int64)
+        return np.clip(bands, 0, self.number_of_bands - 1)
+
+    def contains(self, x, y):
+        # boolean array of points inside the polygon, even-odd rule
+        inside = np.zeros(x.size, dtype=bool)
+        if self.number_of_bands == 0 or x.size == 0:
+            return inside
+        bands = self.getBands(y)
+        order = np.argsort(bands, kind='stable')
+        points_offsets = np.searchsorted(bands[order], np.arange(self.number_of_bands + 1), side='left')
+        for band in np.unique(bands):
+            points = order[points_offsets[band]:points_offsets[band + 1]]
+            edges = self.band_edges[self.band_offsets[band]:self.band_offsets[band + 1]]
+            if edges.size == 0:
+                continue
+            px = x[points][None, :]
+            py = y[points][None, :]
+            y0 = self.y0[edges][:, None]
+            y1 = self.y1[edges][:, None]
+            crossings = ((y0 > py) != (y1 > py)) \
+                & (px < self.x0[edges][:, None] + (py - y0) * self.slopes[edges][:, None])
+            inside[points] = (np.count_nonzero(crossings, axis=0) % 2) == 1
+        return inside
+
+
+def getPolygonIds(polygons_ids):
+    # sorted distinct ids, results refer to ids by their position in this list
+    return sorted(set(polygons_ids))
+
+
+class PolygonIndex(object):
+    def __init__(self, polygons_rings, polygons_ids):
+        # polygons as lists of rings, several polygons may have the same id
+        self.polygons = [PreparedPolygon(rings) for rings in polygons_rings]
+        self.polygons_ids = list(polygons_ids)
+        self.ids = getPolygonIds(self.polygons_ids)
+        self.id_positions = dict((polygon_id, position) for position, polygon_id in enumerate(self.ids))
+        self.tree = STRtree([polygon.box for polygon in self.polygons])
+
+    def getPointsInPolygons(self, x, y):
+        # list of (id position, sorted indexes of points inside polygons of the id)
+        results = []
+        if x.size == 0:
+            return results
+        chunk_box = (float(x.min()), float(y.min()), float(x.max()), float(y.max()))
+        # points sorted by x to get the candidates of each polygon box by binary search
+        order = np.argsort(x, kind='stable')
+        sorted_x = x[order]
+        points_by_id = {}
+        for polygon_index in self.tree.query(chunk_box):
+            polygon = self.polygons[polygon_index]
+            first = np.searchsorted(sorted_x, polygon.box[0], side='left')
+            last = np.searchsorted(sorted_x, polygon.box[2], side='right')
+            candidates = order[first:last]
+            candidates = candidates[(y[candidates] >= polygon.box[1]) & (y[candidates] <= polygon.box[3])]
+            if candidates.size == 0:
+                continue
+            points = candidates[polygon.contains(x[candidates], y[candidates])]
+            if points.size == 0:
+                continue
+            id_position = self.id_positions[self.polygons_ids[polygon_index]]
+            if not id_position in points_by_id:
+                points_by_id[id_position] = []
+            points_by_id[id_position].append(points)
+        for id_position in sorted(points_by_id.keys()):
+            results.append((id_position, np.unique(np.concatenate(points_by_id[id_position]))))
+        return results
@@ -0,0 +1,34 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+# Process pool helpers shared by the scripts with a --workers option: results are mapped
+# in the order of the arguments so the single writer of each script sets the same ids as
+# a serial run
+
+from multiprocessing import Pool, cpu_count
+
+
+def getNumberOfWorkers(str_workers):
+    # number of processes from the --workers option, number of CPUs by default
+    str_error = ''
+    workers = 0
+    if not str_workers:
+        str_workers = str(cpu_count())
+    try:
+        workers = int(str_workers)
+    except ValueError:
+        workers = 0
+    if workers < 1:
+        str_error = "Invalid number of workers: {}".format(str_workers)
+    return str_error, workers
+
+
+def mapInOrder(function, arguments_list, workers):
+    if workers == 1:
+        for arguments in arguments_list:
+            yield function(arguments)
+        return
+    with Pool(processes=workers) as pool:
+        chunk_size = max(1, min(16, len(arguments_list) // (4 * workers)))
+        for results in pool.imap(function, arguments_list, chunk_size):
+            yield results
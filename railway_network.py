@@ -0,0 +1,166 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+# Rail network of the railway scripts from a LineString layer with rail and railway
+# identifier fields, parsed once into NumPy arrays: coordinates of all rails, offsets of
+# each rail in coordinates, rail ids and railway ids. The cache of network_cache skips OGR
+# parsing in repeated runs over the same restitution
+
+import struct
+import numpy as np
+from osgeo import osr, ogr
+
+from network_cache import cache_file_extension, getCacheKey, readCache, writeCache
+
+line_string_types = [ogr.wkbLineString, ogr.wkbLineStringM, ogr.wkbLineStringZM, ogr.wkbLineString25D]
+
+
+class RailNetwork(object):
+    def __init__(self, coordinates, offsets, rail_ids, railway_ids, crs_wkt):
+        self.coordinates = coordinates
+        self.offsets = offsets
+        self.rail_ids = rail_ids
+        self.railway_ids = railway_ids
+        self.crs_wkt = crs_wkt
+        self.rail_indexes = {}
+        # railway id to rail ids, in input order
+        self.railways = {}
+        for rail_index in range(len(rail_ids)):
+            rail_id = str(rail_ids[rail_index])
+            railway_id = str(railway_ids[rail_index])
+            self.rail_indexes[rail_id] = rail_index
+            if not railway_id in self.railways:
+                self.railways[railway_id] = []
+            self.railways[railway_id].append(rail_id)
+
+    def getCrs(self):
+        if not self.crs_wkt:
+            return None
+        crs = osr.SpatialReference()
+        crs.ImportFromWkt(self.crs_wkt)
+        return crs
+
+    def getRailPoints(self, rail_id):
+        rail_index = self.rail_indexes[rail_id]
+        return self.coordinates[self.offsets[rail_index]:self.offsets[rail_index + 1]]
+
+    def getRailWkb(self, rail_id):
+        points = self.getRailPoints(rail_id)
+        geometry_type = ogr.wkbLineString
+        if points.shape[1] == 3:
+            geometry_type = ogr.wkbLineString25D
+        return struct.pack('<BII', 1, geometry_type & 0xffffffff, points.shape[0]) + points.astype('<f8').tobytes()
+
+    def getRailGeometry(self, rail_id):
+        return ogr.CreateGeometryFromWkb(self.getRailWkb(rail_id))
+
+
+def readNetwork(input_file, field_idRail, field_idRailway, max_rails_in_railway):
+    str_error = ''
+    try:
+        input_ds = ogr.Open(input_file, 0)  # 0 means read-only. 1 means writeable.
+    except Exception as e:
+        str_error = "Function readNetwork"
+        str_error += "\nError opening file:\n{}\n{}".format(input_file, str(e))
+        return str_error, None
+    if input_ds is None:
+        str_error = "Function readNetwork"
+        str_error += "\nError opening file:\n{}".format(input_file)
+        return str_error, None
+    layer = input_ds.GetLayer()
+    if not layer.GetGeomType() in line_string_types:
+        str_error = "Function readNetwork"
+        str_error += "\nNot LineString geometry type in file:\n{}".format(input_file)
+        return str_error, None
+    layer_definition = layer.GetLayerDefn()
+    field_indexes = []
+    for field_name in [field_idRail, field_idRailway]:
+        if field_name is None:
+            field_indexes.append(-1)
+            continue
+        field_index = layer_definition.GetFieldIndex(field_name)
+        if field_index == -1:
+            str_error = "Function readNetwork"
+            str_error += "\nField: {} not exists in file:\n{}".format(field_name, input_file)
+            return str_error, None
+        field_type = layer_definition.GetFieldDefn(field_index).GetType()
+        if not field_type == ogr.OFTInteger \
+                and not field_type == ogr.OFTString \
+                and not field_type == ogr.OFTReal:
+            str_error = "Function readNetwork"
+            str_error += "\nField: {} is not valid type in file:\n{}".format(field_name, input_file)
+            return str_error, None
+        field_indexes.append(field_index)
+    field_idRail_index, field_idRailway_index = field_indexes
+    has_z = ogr.GT_HasZ(layer.GetGeomType())
+    crs = layer.GetSpatialRef()
+    crs_wkt = ''
+    if crs is not None:
+        crs_wkt = crs.ExportToWkt()
+    rails_points = []
+    rail_ids = []
+    rail_ids_set = set()
+    railway_ids = []
+    rails_in_railways = {}
+    for feature in layer:
+        geom = feature.GetGeometryRef()
+        str_railwayId = feature.GetFieldAsString(field_idRailway_index).lower()
+        # without rail field, as centerlines, rail ids are feature ids
+        if field_idRail_index == -1:
+            str_railId = str(feature.GetFID())
+        else:
+            str_railId = feature.GetFieldAsString(field_idRail_index).lower()
+        if str_railId in rail_ids_set:
+            str_error = "Function readNetwork"
+            str_error += "\nRepeated rail id: {} in file:\n{}".format(str_railId, input_file)
+            return str_error, None
+        if not str_railwayId in rails_in_railways:
+            rails_in_railways[str_railwayId] = []
+        if max_rails_in_railway is not None and len(rails_in_railways[str_railwayId]) == max_rails_in_railway:
+            str_error = "Function readNetwork"
+            str_error += "\nMore than two rails in railway id: {} in file:\n{}".format(str_railwayId,
+                                                                                       input_file)
+            return str_error, None
+        rails_in_railways[str_railwayId].append(str_railId)
+        if geom is None or geom.GetPointCount() == 0:
+            points = np.zeros((0, 2), dtype=np.float64)
+        else:
+            points = np.array(geom.GetPoints(), dtype=np.float64).reshape(geom.GetPointCount(), -1)
+        if has_z:
+            if points.shape[1] == 2:
+                points = np.concatenate((points, np.zeros((points.shape[0], 1))), axis=1)
+        else:
+            points = points[:, 0:2]
+        rails_points.append(points)
+        rail_ids.append(str_railId)
+        rail_ids_set.add(str_railId)
+        railway_ids.append(str_railwayId)
+    input_ds = None
+    dimension = 3 if has_z else 2
+    offsets = np.zeros(len(rails_points) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([points.shape[0] for points in rails_points])
+    coordinates = np.zeros((0, dimension), dtype=np.float64)
+    if len(rails_points) > 0:
+        coordinates = np.concatenate(rails_points)
+    network = RailNetwork(coordinates, offsets, np.array(rail_ids, dtype=np.str_),
+                          np.array(railway_ids, dtype=np.str_), crs_wkt)
+    return str_error, network
+
+
+def loadRailNetwork(input_file, field_idRail, field_idRailway, max_rails_in_railway=2, use_cache=True):
+    # returns error message and network, field_idRail may be None for one feature by railway
+    cache_file = input_file + cache_file_extension
+    cache_key = getCacheKey(input_file, field_idRail, field_idRailway)
+    if use_cache:
+        values = readCache(cache_file, cache_key)
+        if values is not None:
+            network = RailNetwork(*values)
+            if max_rails_in_railway is None \
+                    or all(len(rail_ids) <= max_rails_in_railway for rail_ids in network.railways.values()):
+                return '', network
+    str_error, network = readNetwork(input_file, field_idRail, field_idRailway, max_rails_in_railway)
+    if str_error:
+        return str_error, None
+    if use_cache:
+        writeCache(cache_file, cache_key, network)
+    return str_error, network
@@ -0,0 +1,100 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+# Spatial indexes of bounding boxes as (min x, min y, max x, max y):
+# static R-tree packed with the Sort-Tile-Recursive algorithm, built in O(n log n) by
+# sorting, each query visits only the nodes whose box intersects the query box, and
+# incremental uniform grid for boxes accepted one by one
+
+from math import ceil, floor, sqrt
+import numpy as np
+
+
+def getBoxesIntersect(boxes, box):
+    return (boxes[:, 0] <= box[2]) & (boxes[:, 2] >= box[0]) \
+        & (boxes[:, 1] <= box[3]) & (boxes[:, 3] >= box[1])
+
+
+def getParentBoxes(boxes, node_capacity):
+    number_of_parents = int(ceil(boxes.shape[0] / node_capacity))
+    starts = np.arange(number_of_parents) * node_capacity
+    parent_boxes = np.empty((number_of_parents, 4), dtype=np.float64)
+    parent_boxes[:, 0] = np.minimum.reduceat(boxes[:, 0], starts)
+    parent_boxes[:, 1] = np.minimum.reduceat(boxes[:, 1], starts)
+    parent_boxes[:, 2] = np.maximum.reduceat(boxes[:, 2], starts)
+    parent_boxes[:, 3] = np.maximum.reduceat(boxes[:, 3], starts)
+    return parent_boxes
+
+
+class STRtree(object):
+    def __init__(self, boxes, node_capacity=16):
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        self.node_capacity = node_capacity
+        self.size = boxes.shape[0]
+        self.levels = []
+        self.indexes = np.zeros(0, dtype=np.int64)
+        if self.size == 0:
+            return
+        # leaves sorted in vertical slices by x center and inside each slice by y center
+        number_of_leaves = int(ceil(self.size / node_capacity))
+        number_of_slices = int(ceil(sqrt(number_of_leaves)))
+        slice_size = number_of_slices * node_capacity
+        centers_x = 0.5 * (boxes[:, 0] + boxes[:, 2])
+        centers_y = 0.5 * (boxes[:, 1] + boxes[:, 3])
+        indexes = np.argsort(centers_x, kind='stable')
+        slices = np.arange(self.size) // slice_size
+        indexes = indexes[np.lexsort((centers_y[indexes], slices))]
+        self.indexes = indexes
+        level_boxes = boxes[indexes]
+        self.levels.append(level_boxes)
+        while level_boxes.shape[0] > 1:
+            level_boxes = getParentBoxes(level_boxes, node_capacity)
+            self.levels.append(level_boxes)
+
+    def query(self, box):
+        # indexes of input boxes intersecting box
+        if self.size == 0:
+            return np.zeros(0, dtype=np.int64)
+        nodes = np.zeros(1, dtype=np.int64)
+        for level in range(len(self.levels) - 1, -1, -1):
+            level_boxes = self.levels[level]
+            nodes = nodes[getBoxesIntersect(level_boxes[nodes], box)]
+            if level == 0 or nodes.size == 0:
+                break
+            # children of each node in the lower level
+            children = (nodes[:, None] * self.node_capacity + np.arange(self.node_capacity)).ravel()
+            nodes = children[children < self.levels[level - 1].shape[0]]
+        return np.sort(self.indexes[nodes])
+
+
+class GridIndex(object):
+    # Incremental index of bounding boxes in a uniform grid of cells, for boxes inserted
+    # one by one and queried while inserting, each box is stored in every cell it touches
+    def __init__(self, cell_size):
+        self.cell_size = float(cell_size)
+        self.cells = {}
+
+    def getCells(self, box):
+        first_column = int(floor(box[0] / self.cell_size))
+        first_row = int(floor(box[1] / self.cell_size))
+        last_column = int(floor(box[2] / self.cell_size))
+        last_row = int(floor(box[3] / self.cell_size))
+        for column in range(first_column, last_column + 1):
+            for row in range(first_row, last_row + 1):
+                yield column, row
+
+    def insert(self, index, box):
+        for cell in self.getCells(box):
+            if not cell in self.cells:
+                self.cells[cell] = []
+            self.cells[cell].append((index, box))
+
+    def query(self, box):
+        # indexes of inserted boxes intersecting box, in insertion order
+        indexes = set()
+        for cell in self.getCells(box):
+            for index, cell_box in self.cells.get(cell, []):
+                if cell_box[0] <= box[2] and cell_box[2] >= box[0] \
+                        and cell_box[1] <= box[3] and cell_box[3] >= box[1]:
+                    indexes.add(index)
+        return sorted(indexes)
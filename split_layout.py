@@ -0,0 +1,25 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+# Names of the outputs of polygons split by railway, without GDAL: one file by railway, one
+# GeoPackage with one layer by railway or one GeoPackage with one layer and an indexed
+# railway field
+
+import os
+
+output_formats = {'shp': '.shp', 'gpkg': '.gpkg', 'fgb': '.fgb'}
+output_layouts = ['files', 'layers', 'layer']
+
+
+def getSplitFilePath(output_path, base_name, output_format, output_layout, railway_id):
+    if output_layout == 'files':
+        name = base_name + "_Railway_" + railway_id
+    else:
+        name = base_name + "_Railways"
+    return os.path.normpath(os.path.join(output_path, name + output_formats[output_format]))
+
+
+def getSplitLayerName(base_name, output_layout, railway_id):
+    if output_layout == 'layer':
+        return base_name + "_Railways"
+    return base_name + "_Railway_" + railway_id
@@ -0,0 +1,9 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+# tools and shared modules are at the top level of the repository
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -0,0 +1,69 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+import struct
+import numpy as np
+import pytest
+
+pytest.importorskip('osgeo')
+pytest.importorskip('scipy')
+
+from osgeo import ogr
+from CreateCenterlinesForRailway import processRailway
+
+
+def getRailWkb(points):
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    return struct.pack('<BII', 1, ogr.wkbLineString, points.shape[0]) + points.astype('<f8').tobytes()
+
+
+@pytest.mark.parametrize('first_rail, second_rail', [
+    ([], [(0., 1.435), (10., 1.435)]),
+    ([(0., 0.), (10., 0.)], [(0., 1.435)]),
+    ([(0., 0.), (10., 0.)], []),
+])
+@pytest.mark.parametrize('output_measures, resample_step', [(False, None), (True, None), (True, 1.)])
+def test_degenerate_rails_give_empty_centerline(first_rail, second_rail, output_measures, resample_step):
+    centerline_wkb = processRailway((getRailWkb(first_rail), getRailWkb(second_rail),
+                                     output_measures, resample_step))
+    geom_centerline = ogr.CreateGeometryFromWkb(centerline_wkb)
+    assert geom_centerline.GetPointCount() == 0
+
+
+def test_straight_rails_centerline():
+    first_rail = [(0., 0.), (5., 0.), (10., 0.)]
+    second_rail = [(0., 1.4), (4., 1.4), (10., 1.4)]
+    centerline_wkb = processRailway((getRailWkb(first_rail), getRailWkb(second_rail), True, None))
+    geom_centerline = ogr.CreateGeometryFromWkb(centerline_wkb)
+    points = np.array(geom_centerline.GetPoints())
+    assert np.allclose(points[:, 1], 0.7)
+    assert np.allclose([geom_centerline.GetM(i) for i in range(3)], [0., 5., 10.])
+
+
+def test_vertical_rails_centerline():
+    first_rail = [(0., 0.), (0., 5.), (0., 10.)]
+    second_rail = [(1.4, 0.), (1.4, 4.), (1.4, 10.)]
+    centerline_wkb = processRailway((getRailWkb(first_rail), getRailWkb(second_rail), False, None))
+    points = np.array(ogr.CreateGeometryFromWkb(centerline_wkb).GetPoints())
+    assert np.allclose(points, [(0.7, 0.), (0.7, 5.), (0.7, 10.)])
+
+
+def test_curved_rails_same_as_brute_force_pairing():
+    # concentric arcs with irregular vertex spacing, nearest vertices of the second rail by
+    # all distances
+    rng = np.random.default_rng(0)
+    first_angles = np.sort(rng.uniform(0., 0.5, 40))
+    second_angles = np.sort(rng.uniform(-0.05, 0.55, 60))
+    first_rail = np.column_stack((300. * np.cos(first_angles), 300. * np.sin(first_angles)))
+    second_rail = np.column_stack((301.435 * np.cos(second_angles), 301.435 * np.sin(second_angles)))
+    centerline_wkb = processRailway((getRailWkb(first_rail), getRailWkb(second_rail), False, None))
+    points = np.array(ogr.CreateGeometryFromWkb(centerline_wkb).GetPoints())
+    distances = np.hypot(first_rail[:, None, 0] - second_rail[None, :, 0],
+                         first_rail[:, None, 1] - second_rail[None, :, 1])
+    nearest = np.argsort(distances, axis=1)[:, 0:2]
+    first_points = second_rail[nearest[:, 0]]
+    directions = second_rail[nearest[:, 1]] - first_points
+    factors = np.sum((first_rail - first_points) * directions, axis=1) / np.sum(directions * directions, axis=1)
+    expected = 0.5 * (first_rail + first_points + factors[:, None] * directions)
+    assert np.allclose(points, expected)
+    assert np.allclose(np.hypot(points[:, 0], points[:, 1]), 300.7175, atol=0.05)
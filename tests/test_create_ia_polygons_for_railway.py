@@ -0,0 +1,64 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+import numpy as np
+import pytest
+
+pytest.importorskip('osgeo')
+
+from CreateIAPolygonsForRailway import getSectionBoxes, getRailSegments, clipBoxToRailBuffer, railwayWidth
+
+
+def test_section_boxes_straight_rail():
+    boxes = getSectionBoxes([(0., 0.), (20., 0.)], 2., 1., 1.)
+    assert boxes.shape == (6, 5, 2)
+    # centers every section length plus distance, from 1 m after the first point
+    assert np.allclose(np.mean(boxes[:, 0:4], axis=1), [[center, 0.] for center in [2., 5., 8., 11., 14., 17.]])
+    half_width = 0.5 + railwayWidth / 4.
+    assert np.allclose(boxes[0], [(1., half_width), (3., half_width), (3., -half_width), (1., -half_width),
+                                  (1., half_width)])
+
+
+def test_section_boxes_several_in_a_segment():
+    # all sections of the long second segment are on it, along its direction
+    boxes = getSectionBoxes([(0., 0.), (10., 0.), (10., 0.), (10., 10.)], 2., 1., 1.)
+    centers = np.mean(boxes[:, 0:4], axis=1)
+    assert np.allclose(centers, [(2., 0.), (5., 0.), (8., 0.), (10., 1.), (10., 4.), (10., 7.)])
+    assert np.allclose(boxes[3:, 1] - boxes[3:, 0], [(0., 2.)] * 3)
+
+
+def test_section_boxes_degenerate_rails():
+    assert getSectionBoxes([], 2., 1., 1.).shape == (0, 5, 2)
+    assert getSectionBoxes([(3., 3.), (3., 3.)], 2., 1., 1.).shape == (0, 5, 2)
+
+
+def getBox(min_x, min_y, max_x, max_y):
+    return np.array([(min_x, max_y), (max_x, max_y), (max_x, min_y), (min_x, min_y), (min_x, max_y)])
+
+
+def getRingArea(ring):
+    return 0.5 * abs(np.sum(ring[:-1, 0] * ring[1:, 1] - ring[1:, 0] * ring[:-1, 1]))
+
+
+def test_clip_box_to_straight_rail_buffer():
+    # rail along y = 1 with several collinear segments, buffer strip between y = 0.5 and 1.5
+    rail_segments = getRailSegments([(-50., 1.), (0., 1.), (3., 1.), (50., 1.)])
+    analytic, ring = clipBoxToRailBuffer(getBox(1., -1., 4., 1.2), rail_segments, 0.5)
+    assert analytic
+    assert np.isclose(getRingArea(ring), 3. * 0.7)
+    assert np.allclose(ring[0], ring[-1])
+    assert np.all((ring[:, 1] >= 0.5 - 1.e-12) & (ring[:, 1] <= 1.2 + 1.e-12))
+    # box out of the buffer but near the rail
+    analytic, ring = clipBoxToRailBuffer(getBox(1., -1., 4., 0.2), rail_segments, 0.5)
+    assert analytic and ring is None
+    # box far from the rail
+    analytic, ring = clipBoxToRailBuffer(getBox(1., 20., 4., 22.), rail_segments, 0.5)
+    assert analytic and ring is None
+
+
+def test_clip_box_needs_geos():
+    # curved rail near the box and rail end near the box
+    rail_segments = getRailSegments([(-50., 0.), (2., 0.), (50., 5.)])
+    assert clipBoxToRailBuffer(getBox(1., -1., 4., 1.), rail_segments, 0.5) == (False, None)
+    rail_segments = getRailSegments([(-50., 0.), (3., 0.)])
+    assert clipBoxToRailBuffer(getBox(1., -1., 4., 1.), rail_segments, 0.5) == (False, None)
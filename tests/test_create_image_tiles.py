@@ -0,0 +1,29 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+import numpy as np
+from PIL import Image
+
+from CreateImageTiles import getTiles, getTileImage
+
+
+def test_tiles_cover_image_with_offsets():
+    tiles = getTiles(250, 130, 100, 0.5)
+    assert [(tile['row'], tile['column']) for tile in tiles] == [(1, 1), (1, 2), (1, 3), (2, 1), (2, 2), (2, 3)]
+    assert [tile['box'] for tile in tiles] == [(0, 0, 100, 65), (100, 0, 200, 65), (200, 0, 300, 65),
+                                               (0, 65, 100, 130), (100, 65, 200, 130), (200, 65, 300, 130)]
+
+
+def test_tile_image_padding_as_pil_crop():
+    # edge tiles are padded with black as the tiles written by CreateImageTiles
+    rng = np.random.default_rng(0)
+    image = rng.integers(1, 256, size=(130, 250, 3), dtype=np.uint8)
+    pil_image = Image.fromarray(image)
+    for tile in getTiles(250, 130, 100, 60):
+        tile_image = getTileImage(image, tile['box'])
+        assert tile_image.shape == (60, 100, 3)
+        assert tile_image.flags['C_CONTIGUOUS']
+        assert np.array_equal(tile_image, np.asarray(pil_image.crop(tile['box'])))
+    tile_image = getTileImage(image, (200, 120, 300, 180))
+    assert np.array_equal(tile_image[:10, :50], image[120:, 200:])
+    assert not tile_image[10:].any() and not tile_image[:, 50:].any()
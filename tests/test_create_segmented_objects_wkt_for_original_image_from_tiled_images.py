@@ -0,0 +1,39 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+import os
+
+from CreateSegmentedObjectsWktForOriginalImageFromTiledImages import joinTiles, joinTilesFromArguments
+
+
+def writeLabels(file_path, lines):
+    with open(file_path, 'w') as output_file:
+        output_file.write('\n'.join(lines) + '\n')
+
+
+def test_join_tiles_offsets(tmp_path):
+    # polygons of each tile moved by its row and column, rows as negative coordinates
+    writeLabels(str(tmp_path / 'tile_1_1.txt'), ['0 0.1 0.2 0.5 0.2 0.5 0.6'])
+    writeLabels(str(tmp_path / 'tile_2_3.txt'), ['1 0 0 1 0 1 1'])
+    image_tiles = [{'row': 1, 'column': 1, 'file': str(tmp_path / 'tile_1_1.txt')},
+                   {'row': 2, 'column': 2, 'file': str(tmp_path / 'missing.txt')},
+                   {'row': 2, 'column': 3, 'file': str(tmp_path / 'tile_2_3.txt')}]
+    success, str_error = joinTiles('image', image_tiles, 100, 50, str(tmp_path))
+    assert success and not str_error
+    with open(str(tmp_path / 'image.txt'), 'r') as input_file:
+        lines = input_file.read().splitlines()
+    assert len(lines) == 3 and lines[0] == 'type;wkt'
+    assert lines[1].startswith('0;POLYGON((')
+    assert lines[2].startswith('1;POLYGON((')
+    values = [[float(value) for value in point.split()] for point in lines[2][len('1;POLYGON(('):-2].split(',')]
+    assert values == [[200., -50.], [300., -50.], [300., -100.], [200., -50.]]
+
+
+def test_failed_image_without_partial_output(tmp_path):
+    writeLabels(str(tmp_path / 'tile_1_1.txt'), ['0 0.1 0.2 x 0.2 0.5 0.6'])
+    writeLabels(str(tmp_path / 'image.txt'), ['type;wkt'])
+    image_tiles = [{'row': 1, 'column': 1, 'file': str(tmp_path / 'tile_1_1.txt')}]
+    image_file_name, success, str_error = joinTilesFromArguments(('image', image_tiles, 100, 50, str(tmp_path)))
+    assert image_file_name == 'image'
+    assert not success and str_error
+    assert not os.path.exists(str(tmp_path / 'image.txt'))
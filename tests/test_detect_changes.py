@@ -0,0 +1,51 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+import os
+
+import pytest
+
+ogr = pytest.importorskip('osgeo.ogr')
+
+from DetectChanges import process
+
+
+def getSquareWkt(x, y, size):
+    return 'POLYGON (({0} {1},{2} {1},{2} {3},{0} {3},{0} {1}))'.format(x, y, x + size, y + size)
+
+
+def writePredictions(path, squares):
+    os.makedirs(path)
+    with open(os.path.join(path, 'predictions.txt'), 'w') as output_file:
+        output_file.write('type;wkt\n')
+        for x, y, size in squares:
+            output_file.write('sleeper;' + getSquareWkt(x, y, size) + '\n')
+
+
+def readChanges(file_path):
+    ds = ogr.Open(file_path, 0)
+    layer = ds.GetLayer()
+    changes = sorted([(feature.GetField('change'), feature.GetField('id_a'), feature.GetField('id_b'))
+                      for feature in layer])
+    ds = None
+    return changes
+
+
+def test_changes_independent_of_chunk_size(tmp_path):
+    # the first object of b overlaps the first object of a less than the second object of b,
+    # matching by chunks of one object would match the first one
+    squares_a = [(0., 0., 10.), (8., 0., 10.), (30., 0., 10.), (60., 0., 10.)]
+    squares_b = [(2., 0., 10.), (1., 0., 10.), (9., 0., 10.), (31., 0., 12.), (90., 0., 10.)]
+    writePredictions(str(tmp_path / 'a'), squares_a)
+    writePredictions(str(tmp_path / 'b'), squares_b)
+    results = []
+    for chunk_size in [1, 2, 100]:
+        output_file = str(tmp_path / 'changes_{}.gpkg'.format(chunk_size))
+        str_error = process(str(tmp_path / 'a'), str(tmp_path / 'b'), 'type', output_file, 0.3, 0.1, 0.5,
+                            chunk_size)
+        assert str_error == ''
+        results.append(readChanges(output_file))
+    assert results[0] == results[1] == results[2]
+    assert ('disappeared', 'predictions.txt:5', '') in results[0]
+    assert ('appeared', '', 'predictions.txt:2') in results[0]
+    assert ('appeared', '', 'predictions.txt:6') in results[0]
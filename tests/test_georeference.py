@@ -0,0 +1,60 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+import numpy as np
+
+from georeference import readWorldFile, getWorldFilePath, getGeoTransform, findGeoTransform, \
+    transformPixelCoordinates, getCoordinatesFormat, writeProjectionFile, readProjectionFile
+
+crs_wkt = 'PROJCS["ETRS89 / UTM zone 30N"]'
+
+
+def writeWorldFile(file_path):
+    # 0.05 m pixels, upper left pixel center at (500000.025, 4300000.975)
+    with open(file_path, 'w') as output_file:
+        output_file.write("0.05\n0.0\n0.0\n-0.05\n500000.025\n4300000.975\n")
+
+
+def test_world_file_refers_to_pixel_center(tmp_path):
+    world_file_path = str(tmp_path / 'image.jgw')
+    writeWorldFile(world_file_path)
+    geo_transform = readWorldFile(world_file_path)
+    assert np.allclose(geo_transform, (500000., 0.05, 0., 4300001., 0., -0.05))
+    # upper left corner and center of the upper left pixel
+    xs, ys = transformPixelCoordinates(geo_transform, [0., 0.5, 100.], [0., 0.5, 20.])
+    assert np.allclose(xs, [500000., 500000.025, 500005.])
+    assert np.allclose(ys, [4300001., 4300000.975, 4300000.])
+    with open(world_file_path, 'w') as output_file:
+        output_file.write("0.05\n0.0\n0.0\n")
+    assert readWorldFile(world_file_path) is None
+
+
+def test_world_file_path(tmp_path):
+    image_path = str(tmp_path / 'image.jpg')
+    assert getWorldFilePath(image_path) is None
+    for world_file_name in ['image.wld', 'image.jpgw', 'image.jgw']:
+        writeWorldFile(str(tmp_path / world_file_name))
+        assert getWorldFilePath(image_path) == str(tmp_path / world_file_name)
+
+
+def test_find_geotransform_and_projection(tmp_path):
+    writeWorldFile(str(tmp_path / 'image_1.tfw'))
+    writeProjectionFile(str(tmp_path / 'image_1.tif'), crs_wkt)
+    assert readProjectionFile(str(tmp_path / 'image_1.tfw')) == crs_wkt
+    geo_transform, image_crs_wkt = findGeoTransform(str(tmp_path), 'image_1')
+    assert np.allclose(geo_transform, (500000., 0.05, 0., 4300001., 0., -0.05))
+    assert image_crs_wkt == crs_wkt
+    writeWorldFile(str(tmp_path / 'image_2.jpgw'))
+    (tmp_path / 'image_2.jpg').write_bytes(b'')
+    geo_transform, image_crs_wkt = getGeoTransform(str(tmp_path / 'image_2.jpg'))
+    assert geo_transform is not None and image_crs_wkt == ''
+    assert findGeoTransform(str(tmp_path), 'image_3') == (None, '')
+    # an empty crs does not write a projection file
+    writeProjectionFile(str(tmp_path / 'image_3.txt'), '')
+    assert readProjectionFile(str(tmp_path / 'image_3.txt')) == ''
+
+
+def test_coordinates_format():
+    assert getCoordinatesFormat(None).format(1.234, 5.678) == "1.23 5.68"
+    assert getCoordinatesFormat((0., 0.05, 0., 0., 0., -0.05)).format(500000.0123, 1.) == "500000.0123 1.0000"
+    assert getCoordinatesFormat((0., 10., 0., 0., 0., -10.)).format(1.234, 1.) == "1.23 1.00"
@@ -0,0 +1,97 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+import os
+import numpy as np
+
+from inference_cache import InferenceCache, getFileHash
+
+inference_parameters = {'conf': 0.5, 'iou': 0.7}
+
+
+def getModelFile(tmp_path, content):
+    model_file = tmp_path / 'model.pt'
+    model_file.write_bytes(content)
+    return str(model_file)
+
+
+def getInstances(value):
+    return [['rail', [np.array([[value, 0.], [value + 1., 0.], [value, 1.]], dtype=np.float32)]],
+            ['sleeper', []]]
+
+
+def test_keys(tmp_path):
+    model_file = getModelFile(tmp_path, b'weights 1')
+    assert getFileHash(model_file) == getFileHash(model_file)
+    cache = InferenceCache(str(tmp_path / 'cache'), 1024 * 1024, model_file, inference_parameters)
+    image = np.zeros((4, 4, 3), dtype=np.uint8)
+    key = cache.getKey(image)
+    assert key == cache.getKey(image.copy())
+    other_image = image.copy()
+    other_image[0, 0, 0] = 1
+    assert key != cache.getKey(other_image)
+    assert key != cache.getKey(image.reshape(8, 2, 3))
+    other_cache = InferenceCache(str(tmp_path / 'cache'), 1024 * 1024, model_file, {'conf': 0.25, 'iou': 0.7})
+    assert key != other_cache.getKey(image)
+    other_model_file = getModelFile(tmp_path, b'weights 2')
+    other_cache = InferenceCache(str(tmp_path / 'cache'), 1024 * 1024, other_model_file, inference_parameters)
+    assert key != other_cache.getKey(image)
+
+
+def test_put_get_and_reopen(tmp_path):
+    model_file = getModelFile(tmp_path, b'weights')
+    cache_path = str(tmp_path / 'cache')
+    cache = InferenceCache(cache_path, 1024 * 1024, model_file, inference_parameters)
+    key = cache.getKey(np.ones((2, 2), dtype=np.uint8))
+    assert cache.get(key) is None
+    cache.put(key, getInstances(2.))
+    instances, rle_instances = cache.get(key)
+    assert rle_instances is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert [seg_class for seg_class, contours in instances] == ['rail', 'sleeper']
+    assert np.array_equal(instances[0][1][0], getInstances(2.)[0][1][0])
+    assert instances[1][1] == []
+    cache = InferenceCache(cache_path, 1024 * 1024, model_file, inference_parameters)
+    assert cache.size == os.path.getsize(cache.getFilePath(key))
+    assert cache.get(key) is not None
+    # a corrupted entry is a miss and is removed
+    with open(cache.getFilePath(key), 'w') as output_file:
+        output_file.write('[[')
+    assert cache.get(key) is None
+    assert not os.path.exists(cache.getFilePath(key))
+    assert cache.size == 0
+
+
+def test_least_recently_used_eviction(tmp_path):
+    model_file = getModelFile(tmp_path, b'weights')
+    cache_path = str(tmp_path / 'cache')
+    cache = InferenceCache(cache_path, 1024 * 1024, model_file, inference_parameters)
+    keys = [cache.getKey(np.full((2, 2), value, dtype=np.uint8)) for value in range(3)]
+    cache.put(keys[0], getInstances(0.))
+    cache.put(keys[1], getInstances(1.))
+    entry_size = os.path.getsize(cache.getFilePath(keys[0]))
+    os.utime(cache.getFilePath(keys[0]), (100., 100.))
+    os.utime(cache.getFilePath(keys[1]), (200., 200.))
+    # room for two entries, the first one is used again so the second is evicted
+    cache = InferenceCache(cache_path, 2 * entry_size + entry_size // 2, model_file, inference_parameters)
+    assert cache.get(keys[0]) is not None
+    cache.put(keys[2], getInstances(2.))
+    assert sorted(cache.entries.keys()) == sorted([keys[0], keys[2]])
+    assert not os.path.exists(cache.getFilePath(keys[1]))
+    assert cache.size <= cache.max_size
+
+
+def test_rle_instances(tmp_path):
+    model_file = getModelFile(tmp_path, b'weights')
+    cache = InferenceCache(str(tmp_path / 'cache'), 1024 * 1024, model_file, inference_parameters)
+    key = cache.getKey(np.ones((2, 2), dtype=np.uint8))
+    # an entry without rle instances is a miss when they are needed
+    cache.put(key, getInstances(1.))
+    assert cache.get(key, True) is None
+    assert cache.get(key) is not None
+    rle_instances = [{'size': [2, 2], 'counts': [1, 2, 1], 'type': 'rail'}]
+    cache.put(key, getInstances(1.), rle_instances)
+    instances, cached_rle_instances = cache.get(key, True)
+    assert cached_rle_instances == rle_instances
+    assert [seg_class for seg_class, contours in instances] == ['rail', 'sleeper']
+    assert (cache.hits, cache.misses) == (2, 1)
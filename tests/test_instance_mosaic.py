@@ -0,0 +1,66 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+import numpy as np
+
+from instance_mosaic import InstanceMosaic, getTileBoxes, getMosaicSize
+
+
+def getMask(shape, first_row, last_row, first_column, last_column):
+    mask = np.zeros(shape, dtype=bool)
+    mask[first_row:last_row, first_column:last_column] = True
+    return mask
+
+
+def test_tile_boxes_and_size():
+    # tiles from file names, the last column and row smaller than the first tile
+    image_tiles = [{'row': 1, 'column': 1}, {'row': 1, 'column': 2},
+                   {'row': 2, 'column': 1}, {'row': 2, 'column': 2}]
+    tile_sizes = [(100, 80), (30, 80), (100, 20), (30, 20)]
+    boxes = getTileBoxes(image_tiles, tile_sizes)
+    assert boxes == [(0, 0, 100, 80), (100, 0, 130, 80), (0, 80, 100, 100), (100, 80, 130, 100)]
+    assert getMosaicSize(boxes) == (130, 100)
+    # tiles from the catalog keep their origin
+    image_tiles = [{'row': 1, 'column': 1, 'first_column': 0, 'first_row': 0},
+                   {'row': 1, 'column': 2, 'first_column': 90, 'first_row': 0}]
+    boxes = getTileBoxes(image_tiles, [(100, 80), (100, 80)])
+    assert boxes == [(0, 0, 100, 80), (90, 0, 190, 80)]
+    assert getMosaicSize(boxes) == (190, 80)
+
+
+def test_touching_instances_in_tile_are_not_merged(tmp_path):
+    mosaic = InstanceMosaic(str(tmp_path / 'labels'), 10, 10)
+    mosaic.addTile((0, 0, 10, 10), [('rail', getMask((10, 10), 0, 10, 0, 5)),
+                                    ('rail', getMask((10, 10), 0, 10, 5, 10))])
+    mosaic.relabel()
+    assert sorted(np.unique(mosaic.labels).tolist()) == [1, 2]
+    assert mosaic.getClass(1) == 'rail' and mosaic.getClass(2) == 'rail'
+    mosaic.remove()
+    assert not (tmp_path / 'labels').exists()
+
+
+def test_instances_across_tile_limits(tmp_path):
+    mosaic = InstanceMosaic(str(tmp_path / 'labels'), 20, 20)
+    shape = (10, 10)
+    # a rail crossing the four tiles, a sleeper touching it at a tile limit, and
+    # a sleeper of the next tile not touching the first one
+    mosaic.addTile((0, 0, 10, 10), [('rail', getMask(shape, 4, 10, 4, 10)),
+                                    ('sleeper', getMask(shape, 0, 2, 8, 10))])
+    mosaic.addTile((10, 0, 20, 10), [('rail', getMask(shape, 4, 10, 0, 6)),
+                                     ('sleeper', getMask(shape, 0, 2, 0, 3)),
+                                     ('sleeper', getMask(shape, 0, 2, 6, 10))])
+    mosaic.addTile((0, 10, 10, 20), [('rail', getMask(shape, 0, 6, 4, 10)),
+                                     ('sleeper', getMask(shape, 0, 2, 0, 5))])
+    mosaic.addTile((10, 10, 20, 20), [('rail', getMask(shape, 0, 6, 0, 6))])
+    mosaic.relabel()
+    labels = np.asarray(mosaic.labels)
+    rail_ids = np.unique(labels[4:16, 5:16])
+    assert rail_ids.size == 1 and mosaic.getClass(int(rail_ids[0])) == 'rail'
+    # the sleepers touching across the first column limit are one instance
+    assert labels[0, 9] == labels[0, 10]
+    assert labels[0, 9] != labels[0, 16]
+    # the sleeper of the third tile touches the rail of the same tile, classes are different
+    assert labels[10, 3] != rail_ids[0]
+    assert mosaic.getClass(int(labels[10, 3])) == 'sleeper'
+    assert len(np.unique(labels)) == 5
+    mosaic.remove()
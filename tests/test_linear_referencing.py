@@ -0,0 +1,121 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+import numpy as np
+
+from linear_referencing import LinearReferencingIndex
+from polygon_index import PreparedPolygon
+
+
+def test_empty_polyline():
+    for points in [np.zeros((0, 2)), np.zeros((0, 3)), []]:
+        index = LinearReferencingIndex(points)
+        assert index.points.shape == (0, 2)
+        assert index.vertex_chainages.size == 0
+        assert index.length == 0.
+        assert index.lengths.size == 0
+        assert index.chainageOfPoint((1., 1.))[1] == float('inf')
+        assert index.getSubline(0., 1.).shape == (0, 2)
+
+
+def test_single_point_polyline():
+    index = LinearReferencingIndex([(2., 3.)])
+    assert index.vertex_chainages.tolist() == [0.]
+    points, directions = index.pointAtChainage(np.array([0., 5.]))
+    assert points.tolist() == [[2., 3.], [2., 3.]]
+    assert directions.tolist() == [[0., 0.], [0., 0.]]
+    assert index.getSubline(0., 1.).tolist() == [[2., 3.]]
+
+
+def getBruteForceChainage(points, point):
+    # nearest point on each segment, without index
+    best_chainage = 0.
+    best_distance = float('inf')
+    chainage = 0.
+    for start, end in zip(points[:-1], points[1:]):
+        length = float(np.hypot(*(end - start)))
+        if length > 0.:
+            factor = min(max(np.dot(point - start, end - start) / length, 0.), length)
+            nearest = start + factor * (end - start) / length
+            distance = float(np.hypot(*(nearest - point)))
+            if distance < best_distance:
+                best_distance = distance
+                best_chainage = chainage + factor
+        chainage += length
+    return best_chainage, best_distance
+
+
+def test_point_at_chainage():
+    # L shaped polyline with a repeated vertex
+    index = LinearReferencingIndex([(0., 0.), (10., 0.), (10., 0.), (10., 5.)])
+    assert index.length == 15.
+    assert index.vertex_chainages.tolist() == [0., 10., 10., 15.]
+    points, directions = index.pointAtChainage(np.array([0., 4., 10., 12., 15., 17.]))
+    assert np.allclose(points, [[0., 0.], [4., 0.], [10., 0.], [10., 2.], [10., 5.], [10., 7.]])
+    assert np.allclose(directions, [[1., 0.], [1., 0.], [1., 0.], [0., 1.], [0., 1.], [0., 1.]])
+    points, directions = index.pointAtChainage(-2.)
+    assert np.allclose(points, [-2., 0.])
+
+
+def test_chainage_of_point():
+    generator = np.random.default_rng(1)
+    angles = np.cumsum(generator.uniform(-0.3, 0.3, 200))
+    steps = generator.uniform(0.5, 20., 200)
+    points = np.cumsum(np.column_stack((steps * np.cos(angles), steps * np.sin(angles))), axis=0)
+    index = LinearReferencingIndex(points)
+    box_min = points.min(axis=0) - 50.
+    box_max = points.max(axis=0) + 50.
+    for point in generator.uniform(box_min, box_max, (300, 2)):
+        chainage, distance = index.chainageOfPoint(point)
+        expected_chainage, expected_distance = getBruteForceChainage(points, point)
+        assert np.isclose(distance, expected_distance)
+        on_line, direction = index.pointAtChainage(chainage)
+        assert np.isclose(np.hypot(*(on_line - point)), expected_distance)
+
+
+def test_chunks_and_sublines():
+    index = LinearReferencingIndex([(0., 0.), (10., 0.), (10., 5.)])
+    starts, ends = index.getChunkChainages(4.)
+    assert starts.tolist() == [0., 4., 8., 12.]
+    assert ends.tolist() == [4., 8., 12., 15.]
+    assert np.allclose(index.getSubline(8., 12.), [[8., 0.], [10., 0.], [10., 2.]])
+    assert np.allclose(index.getSubline(-1., 3.), [[0., 0.], [3., 0.]])
+    assert np.allclose(index.getSubline(14., 20.), [[10., 4.], [10., 5.]])
+    sublines_length = 0.
+    for start, end in zip(starts, ends):
+        subline = index.getSubline(start, end)
+        sublines_length += float(np.sum(np.hypot(*np.diff(subline, axis=0).T)))
+    assert np.isclose(sublines_length, index.length)
+
+
+def test_chunk_cells_do_not_overlap():
+    # curved polyline, points near it must be in exactly one cell and no point in two cells
+    angles = np.linspace(0., np.pi, 30)
+    index = LinearReferencingIndex(np.column_stack((50. * np.cos(angles), 50. * np.sin(angles))))
+    starts, ends = index.getChunkChainages(17.)
+    half_width = 4.
+    starts[0] = -half_width
+    ends[-1] = index.length + half_width
+    cells = [PreparedPolygon([index.getChunkCell(start, end, half_width)]) for start, end in zip(starts, ends)]
+    rng = np.random.default_rng(0)
+    chainages = rng.uniform(-2., index.length + 2., 5000)
+    offsets = rng.uniform(-3., 3., 5000)
+    points, directions = index.pointAtChainage(chainages)
+    x = points[:, 0] - offsets * directions[:, 1]
+    y = points[:, 1] + offsets * directions[:, 0]
+    counts = np.sum([cell.contains(x, y) for cell in cells], axis=0)
+    assert np.all(counts == 1)
+
+
+def test_step_chainages_without_sliver():
+    # a length just over a multiple of the step does not add a sample next to the end
+    index = LinearReferencingIndex([(0., 0.), (3. + 1.e-9, 0.)])
+    assert np.allclose(index.getStepChainages(1.), [0., 1., 2., 3. + 1.e-9])
+    # length 0.1 + 0.2, the last step of numpy.arange is the length itself
+    index = LinearReferencingIndex([(0., 0.), (0.1, 0.), (0.1, 0.2)])
+    chainages = index.getStepChainages(0.1)
+    assert chainages.size == 4
+    assert np.all(np.diff(chainages) > 0.05)
+    assert chainages[-1] == index.length
+    starts, ends = index.getChunkChainages(0.1)
+    assert np.array_equal(starts, chainages[:-1]) and np.array_equal(ends, chainages[1:])
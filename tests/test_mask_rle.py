@@ -0,0 +1,64 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+
+from mask_rle import encodeMask, decodeMask, getArea, getIntersectionArea, getIoU, getContours, \
+    writeRleFile, readRleFile
+
+
+def getRandomMask(generator, shape, density):
+    return generator.uniform(0., 1., shape) < density
+
+
+def test_encode_decode():
+    generator = np.random.default_rng(6)
+    for shape in [(1, 1), (7, 5), (64, 48)]:
+        for density in [0., 0.3, 1.]:
+            mask = getRandomMask(generator, shape, density)
+            rle = encodeMask(mask)
+            assert rle['size'] == list(shape)
+            assert sum(rle['counts']) == mask.size
+            assert np.array_equal(decodeMask(rle), mask)
+            assert getArea(rle) == int(np.count_nonzero(mask))
+
+
+def test_column_major_counts():
+    mask = np.array([[1, 0], [1, 1]], dtype=bool)
+    # column major: 1 1 0 1, counts start with the background run
+    assert encodeMask(mask)['counts'] == [0, 2, 1, 1]
+    assert encodeMask(np.zeros((0, 3), dtype=bool)) == {'size': [0, 3], 'counts': []}
+
+
+def test_intersection_and_iou():
+    generator = np.random.default_rng(7)
+    for density_1, density_2 in [(0.5, 0.5), (0.1, 0.9), (0., 0.5), (1., 1.)]:
+        mask_1 = getRandomMask(generator, (40, 30), density_1)
+        mask_2 = getRandomMask(generator, (40, 30), density_2)
+        rle_1 = encodeMask(mask_1)
+        rle_2 = encodeMask(mask_2)
+        intersection_area = int(np.count_nonzero(mask_1 & mask_2))
+        union_area = int(np.count_nonzero(mask_1 | mask_2))
+        assert getIntersectionArea(rle_1, rle_2) == intersection_area
+        assert getIntersectionArea(rle_2, rle_1) == intersection_area
+        expected_iou = intersection_area / union_area if union_area > 0 else 0.
+        assert getIoU(rle_1, rle_2) == pytest.approx(expected_iou)
+    # masks of different size do not intersect
+    assert getIntersectionArea(encodeMask(np.ones((2, 2))), encodeMask(np.ones((2, 3)))) == 0
+
+
+def test_contours_and_files(tmp_path):
+    mask = np.zeros((20, 20), dtype=bool)
+    mask[5:10, 3:15] = True
+    rle = encodeMask(mask)
+    contours = getContours(rle)
+    assert len(contours) == 1
+    assert contours[0][:, 0].min() == 3 and contours[0][:, 0].max() == 14
+    assert contours[0][:, 1].min() == 5 and contours[0][:, 1].max() == 9
+    file_path = str(tmp_path / 'image.json')
+    instances = [{'class': 0, 'score': 0.9, 'segmentation': rle}]
+    writeRleFile(file_path, instances)
+    assert readRleFile(file_path) == instances
@@ -0,0 +1,68 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+import os
+
+import numpy as np
+
+from network_cache import cache_file_extension, getCacheKey, readCache, writeCache
+
+
+class Network(object):
+    def __init__(self):
+        self.coordinates = np.array([(0., 0.), (1., 0.), (0., 1.4), (1., 1.4)])
+        self.offsets = np.array([0, 2, 4], dtype=np.int64)
+        self.rail_ids = np.array(['1', '2'], dtype=np.str_)
+        self.railway_ids = np.array(['a', 'a'], dtype=np.str_)
+        self.crs_wkt = 'LOCAL_CS["test"]'
+
+
+def writeFile(file_path, text):
+    with open(file_path, 'w') as output_file:
+        output_file.write(text)
+
+
+def test_cache_round_trip(tmp_path):
+    input_file = str(tmp_path / 'rails.shp')
+    writeFile(input_file, 'shp')
+    cache_file = input_file + cache_file_extension
+    cache_key = getCacheKey(input_file, 'id_rail', 'id_railway')
+    assert readCache(cache_file, cache_key) is None
+    network = Network()
+    writeCache(cache_file, cache_key, network)
+    coordinates, offsets, rail_ids, railway_ids, crs_wkt = readCache(cache_file, cache_key)
+    assert np.array_equal(coordinates, network.coordinates)
+    assert np.array_equal(offsets, network.offsets)
+    assert rail_ids.tolist() == ['1', '2'] and railway_ids.tolist() == ['a', 'a']
+    assert crs_wkt == network.crs_wkt
+    assert [file_name for file_name in os.listdir(str(tmp_path)) if file_name.endswith('.tmp.npz')] == []
+
+
+def test_cache_invalidation(tmp_path):
+    input_file = str(tmp_path / 'rails.shp')
+    writeFile(input_file, 'shp')
+    writeFile(str(tmp_path / 'rails.dbf'), 'dbf')
+    cache_file = input_file + cache_file_extension
+    cache_key = getCacheKey(input_file, 'id_rail', 'id_railway')
+    writeCache(cache_file, cache_key, Network())
+    assert readCache(cache_file, getCacheKey(input_file, 'id_rail', 'id_railway')) is not None
+    # other fields
+    assert readCache(cache_file, getCacheKey(input_file, 'id_rail', 'railway')) is None
+    assert readCache(cache_file, getCacheKey(input_file, None, 'id_railway')) is None
+    # modified attributes, same size
+    stat = os.stat(str(tmp_path / 'rails.dbf'))
+    os.utime(str(tmp_path / 'rails.dbf'), ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+    assert readCache(cache_file, getCacheKey(input_file, 'id_rail', 'id_railway')) is None
+    cache_key = getCacheKey(input_file, 'id_rail', 'id_railway')
+    writeCache(cache_file, cache_key, Network())
+    # new projection file
+    writeFile(str(tmp_path / 'rails.prj'), 'LOCAL_CS["test"]')
+    assert readCache(cache_file, getCacheKey(input_file, 'id_rail', 'id_railway')) is None
+
+
+def test_invalid_cache_file(tmp_path):
+    input_file = str(tmp_path / 'rails.shp')
+    writeFile(input_file, 'shp')
+    cache_file = input_file + cache_file_extension
+    writeFile(cache_file, 'not a npz file')
+    assert readCache(cache_file, getCacheKey(input_file, 'id_rail', 'id_railway')) is None
@@ -0,0 +1,39 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+import numpy as np
+
+from object_matching import matchPairs
+
+
+def getMatches(pairs, number_of_objects_a, number_of_objects_b):
+    matches, matched_a, matched_b = matchPairs(pairs, number_of_objects_a, number_of_objects_b)
+    return sorted([pairs[position][1:3] for position in matches]), matched_a.tolist(), matched_b.tolist()
+
+
+def test_best_iou_first():
+    # b 0 overlaps a 0 and a 1, b 1 overlaps only a 0: greedy by IoU, not by order of b
+    pairs = [(0.5, 0, 0), (0.4, 1, 0), (0.9, 0, 1)]
+    matches, matched_a, matched_b = getMatches(pairs, 3, 2)
+    assert matches == [(0, 1), (1, 0)]
+    assert matched_a == [True, True, False]
+    assert matched_b == [True, True]
+
+
+def test_independent_of_chunks_and_order():
+    # pairs of chunks of b of any size, and in any order, give the same matches
+    rng = np.random.default_rng(0)
+    number_of_objects_a = 60
+    number_of_objects_b = 50
+    pairs = []
+    for index_b in range(number_of_objects_b):
+        for index_a in rng.choice(number_of_objects_a, 4, replace=False):
+            pairs.append((float(rng.choice([0.3, 0.5, 0.7, 0.9])), int(index_a), index_b))
+    expected = getMatches(pairs, number_of_objects_a, number_of_objects_b)
+    for chunk_size in [1, 7, 1000]:
+        chunks_pairs = []
+        for chunk_start in range(0, number_of_objects_b, chunk_size):
+            chunks_pairs.extend([pair for pair in pairs if chunk_start <= pair[2] < chunk_start + chunk_size])
+        assert getMatches(chunks_pairs, number_of_objects_a, number_of_objects_b) == expected
+    shuffled_pairs = [pairs[position] for position in rng.permutation(len(pairs))]
+    assert getMatches(shuffled_pairs, number_of_objects_a, number_of_objects_b) == expected
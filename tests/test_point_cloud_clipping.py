@@ -0,0 +1,107 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+import os
+import numpy as np
+import pytest
+
+laspy = pytest.importorskip('laspy')
+
+import point_cloud_clipping
+from point_cloud_clipping import checkLazBackend, clipPointCloud
+
+# square side, not multiple of the coordinates scale so no point is on a polygon edge
+side = 0.7005
+
+
+def getSquare(x, y, size):
+    return np.array([(x, y), (x + size, y), (x + size, y + size), (x, y + size)], dtype=np.float64)
+
+
+def getPolygons():
+    # twelve squares with one id each, the last id also with a second square, and a
+    # square with a hole
+    polygons_rings = []
+    polygons_ids = []
+    for column in range(4):
+        for row in range(3):
+            polygons_rings.append([getSquare(column + 0.1005, row + 0.1005, side)])
+            polygons_ids.append('id_' + str(column * 3 + row))
+    polygons_rings.append([getSquare(4.1005, 0.1005, side)])
+    polygons_ids.append('id_11')
+    polygons_rings.append([getSquare(4.1005, 1.1005, side), getSquare(4.3005, 1.3005, 0.2)])
+    polygons_ids.append('hole')
+    return polygons_rings, polygons_ids
+
+
+def getExpectedIds(x, y):
+    ids = np.full(x.size, '', dtype=object)
+    for column in range(4):
+        for row in range(3):
+            inside = (x > column + 0.1005) & (x < column + 0.1005 + side) \
+                     & (y > row + 0.1005) & (y < row + 0.1005 + side)
+            ids[inside] = 'id_' + str(column * 3 + row)
+    inside = (x > 4.1005) & (x < 4.1005 + side) & (y > 0.1005) & (y < 0.1005 + side)
+    ids[inside] = 'id_11'
+    inside = (x > 4.1005) & (x < 4.1005 + side) & (y > 1.1005) & (y < 1.1005 + side) \
+             & ~((x > 4.3005) & (x < 4.5005) & (y > 1.3005) & (y < 1.5005))
+    ids[inside] = 'hole'
+    return ids
+
+
+def writePointCloud(file_path, number_of_points):
+    header = laspy.LasHeader(point_format=3, version='1.2')
+    header.scales = np.array([0.001, 0.001, 0.001])
+    header.offsets = np.array([0., 0., 0.])
+    las = laspy.LasData(header)
+    generator = np.random.default_rng(0)
+    las.x = generator.uniform(0., 5., number_of_points)
+    las.y = generator.uniform(0., 3., number_of_points)
+    las.z = generator.uniform(0., 1., number_of_points)
+    las.intensity = np.arange(number_of_points) % 65536
+    las.write(file_path)
+
+
+@pytest.mark.parametrize('file_extension', ['.las', '.laz'])
+@pytest.mark.parametrize('workers', [1, 2])
+def test_clip_more_outputs_than_open_files(tmp_path, file_extension, workers):
+    if file_extension == '.laz' and not laspy.LazBackend.Lazrs in laspy.LazBackend.detect_available():
+        pytest.skip('not exists lazrs LAZ backend')
+    input_point_cloud = str(tmp_path / ('cloud' + file_extension))
+    writePointCloud(input_point_cloud, 20000)
+    output_path = tmp_path / 'output'
+    output_path.mkdir()
+    polygons_rings, polygons_ids = getPolygons()
+    # 13 ids with at most 3 open files and small chunks, outputs are reopened in append mode
+    str_error, number_of_points = clipPointCloud(input_point_cloud, polygons_rings, polygons_ids,
+                                                 str(output_path), 1000, 3, workers)
+    assert not str_error
+    las = laspy.read(input_point_cloud)
+    expected_ids = getExpectedIds(np.asarray(las.x), np.asarray(las.y))
+    assert len(number_of_points) == 13
+    for output_id in sorted(set(polygons_ids)):
+        file_path = os.path.normpath(str(output_path / ('cloud_' + output_id + file_extension)))
+        expected_intensities = np.asarray(las.intensity)[expected_ids == output_id]
+        assert number_of_points[file_path] == expected_intensities.size
+        output_las = laspy.read(file_path)
+        assert output_las.header.point_count == expected_intensities.size
+        # points written in the order of the input point cloud
+        assert np.array_equal(np.asarray(output_las.intensity), expected_intensities)
+
+
+def test_missing_laz_backend(tmp_path, monkeypatch):
+    monkeypatch.setattr(point_cloud_clipping.laspy.LazBackend, 'detect_available', lambda: ())
+    assert checkLazBackend(str(tmp_path / 'cloud.laz'))
+    assert not checkLazBackend(str(tmp_path / 'cloud.las'))
+    str_error, number_of_points = clipPointCloud(str(tmp_path / 'cloud.LAZ'), [], [], str(tmp_path), 1000, 3)
+    assert str_error and number_of_points == {}
+
+
+def test_laszip_backend_is_not_enough(tmp_path, monkeypatch):
+    # outputs are appended, laszip backend does not support it
+    monkeypatch.setattr(point_cloud_clipping.laspy.LazBackend, 'detect_available',
+                        lambda: (laspy.LazBackend.Laszip,))
+    assert checkLazBackend(str(tmp_path / 'cloud.laz'))
+    monkeypatch.setattr(point_cloud_clipping.laspy.LazBackend, 'detect_available',
+                        lambda: (laspy.LazBackend.Lazrs, laspy.LazBackend.Laszip))
+    assert not checkLazBackend(str(tmp_path / 'cloud.laz'))
@@ -0,0 +1,72 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+
+from polygon_index import PolygonIndex, PreparedPolygon, getPolygonIds
+
+
+def getStar(center_x, center_y, radius, number_of_vertices, generator):
+    angles = np.sort(generator.uniform(0., 2. * np.pi, number_of_vertices))
+    radii = radius * generator.uniform(0.3, 1., number_of_vertices)
+    return np.column_stack((center_x + radii * np.cos(angles), center_y + radii * np.sin(angles)))
+
+
+def getExpectedInside(rings, x, y):
+    # even-odd rule with OpenCV, points on edges are not used in the tests
+    inside = np.zeros(x.size, dtype=bool)
+    for ring in rings:
+        contour = ring.astype(np.float32).reshape(-1, 1, 2)
+        inside ^= np.array([cv2.pointPolygonTest(contour, (float(px), float(py)), False) > 0
+                            for px, py in zip(x, y)])
+    return inside
+
+
+def test_prepared_polygon_with_hole():
+    generator = np.random.default_rng(4)
+    exterior = getStar(0., 0., 10., 300, generator)
+    hole = getStar(0., 0., 2., 20, generator)
+    polygon = PreparedPolygon([exterior, hole])
+    assert polygon.number_of_bands > 1
+    x = generator.uniform(-11., 11., 3000)
+    y = generator.uniform(-11., 11., 3000)
+    assert np.array_equal(polygon.contains(x, y), getExpectedInside([exterior, hole], x, y))
+
+
+def test_degenerate_polygons():
+    polygon = PreparedPolygon([np.array([(0., 0.), (1., 1.)])])
+    assert polygon.number_of_bands == 0
+    assert not polygon.contains(np.array([0.5]), np.array([0.5])).any()
+    polygon = PreparedPolygon([np.array([(0., 0.), (1., 0.), (1., 1.), (0., 1.), (0., 0.)])])
+    assert polygon.contains(np.array([0.5, 1.5]), np.array([0.5, 0.5])).tolist() == [True, False]
+    assert polygon.contains(np.zeros(0), np.zeros(0)).size == 0
+
+
+def test_points_in_polygons_by_id():
+    generator = np.random.default_rng(5)
+    polygons_rings = []
+    polygons_ids = []
+    for polygon_index in range(40):
+        center = generator.uniform(0., 100., 2)
+        polygons_rings.append([getStar(center[0], center[1], 8., 12, generator)])
+        # several polygons with the same id
+        polygons_ids.append('id_' + str(polygon_index % 15))
+    index = PolygonIndex(polygons_rings, polygons_ids)
+    assert index.ids == getPolygonIds(polygons_ids)
+    assert len(index.ids) == 15
+    x = generator.uniform(-10., 110., 5000)
+    y = generator.uniform(-10., 110., 5000)
+    expected = {}
+    for rings, polygon_id in zip(polygons_rings, polygons_ids):
+        inside = getExpectedInside(rings, x, y)
+        expected[polygon_id] = expected.get(polygon_id, np.zeros(x.size, dtype=bool)) | inside
+    results = index.getPointsInPolygons(x, y)
+    assert [id_position for id_position, points in results] == sorted(id_position for id_position, points in results)
+    results = dict((index.ids[id_position], points) for id_position, points in results)
+    for polygon_id in index.ids:
+        expected_points = np.flatnonzero(expected[polygon_id])
+        assert results.get(polygon_id, np.zeros(0, dtype=np.int64)).tolist() == expected_points.tolist()
+    assert index.getPointsInPolygons(np.zeros(0), np.zeros(0)) == []
@@ -0,0 +1,24 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+from process_pool import getNumberOfWorkers, mapInOrder
+
+
+def square(value):
+    return value * value
+
+
+def test_map_in_order():
+    arguments_list = list(range(100))
+    expected = [value * value for value in arguments_list]
+    assert list(mapInOrder(square, arguments_list, 1)) == expected
+    assert list(mapInOrder(square, arguments_list, 3)) == expected
+    assert list(mapInOrder(square, [], 2)) == []
+
+
+def test_number_of_workers():
+    str_error, workers = getNumberOfWorkers(None)
+    assert not str_error and workers >= 1
+    assert getNumberOfWorkers('4') == ('', 4)
+    assert getNumberOfWorkers('0')[0]
+    assert getNumberOfWorkers('two')[0]
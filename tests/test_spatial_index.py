@@ -0,0 +1,43 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+import numpy as np
+
+from spatial_index import GridIndex, STRtree, getBoxesIntersect
+
+
+def getRandomBoxes(generator, number_of_boxes):
+    corners = generator.uniform(0., 1000., (number_of_boxes, 2))
+    sizes = generator.uniform(0., 30., (number_of_boxes, 2))
+    return np.concatenate((corners, corners + sizes), axis=1)
+
+
+def test_strtree_query_equals_brute_force():
+    generator = np.random.default_rng(2)
+    for number_of_boxes, node_capacity in [(1, 16), (15, 4), (1000, 16), (777, 5)]:
+        boxes = getRandomBoxes(generator, number_of_boxes)
+        tree = STRtree(boxes, node_capacity)
+        for box in getRandomBoxes(generator, 100):
+            expected = np.flatnonzero(getBoxesIntersect(boxes, box))
+            assert tree.query(box).tolist() == expected.tolist()
+
+
+def test_strtree_touching_and_empty():
+    tree = STRtree([(0., 0., 1., 1.), (2., 2., 3., 3.)])
+    # boxes touching at a side or a corner intersect
+    assert tree.query((1., 1., 2., 2.)).tolist() == [0, 1]
+    assert tree.query((1.5, 1.5, 1.8, 1.8)).tolist() == []
+    assert STRtree([]).query((0., 0., 1., 1.)).size == 0
+
+
+def test_grid_index_while_inserting():
+    generator = np.random.default_rng(3)
+    boxes = getRandomBoxes(generator, 500)
+    # negative coordinates and boxes larger than a cell
+    boxes[0:50] = boxes[0:50] - 500.
+    boxes[50:60, 2:4] = boxes[50:60, 2:4] + 100.
+    grid = GridIndex(20.)
+    for index, box in enumerate(boxes):
+        expected = np.flatnonzero(getBoxesIntersect(boxes[0:index], box))
+        assert grid.query(box) == expected.tolist()
+        grid.insert(index, box)
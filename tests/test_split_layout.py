@@ -0,0 +1,50 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+import os
+
+import pytest
+
+from split_layout import getSplitFilePath, getSplitLayerName, output_layouts
+
+
+def test_files_layout():
+    assert getSplitFilePath('out', 'rails', 'shp', 'files', '12') == os.path.join('out', 'rails_Railway_12.shp')
+    assert getSplitFilePath('out', 'rails', 'fgb', 'files', '7') == os.path.join('out', 'rails_Railway_7.fgb')
+    assert getSplitLayerName('rails', 'files', '12') == 'rails_Railway_12'
+
+
+def test_geopackage_layouts():
+    # one GeoPackage for all railways, a layer by railway or a single layer
+    for railway_id in ['12', '7']:
+        for output_layout in ['layers', 'layer']:
+            assert getSplitFilePath('out', 'rails', 'gpkg', output_layout, railway_id) \
+                   == os.path.join('out', 'rails_Railways.gpkg')
+        assert getSplitLayerName('rails', 'layers', railway_id) == 'rails_Railway_' + railway_id
+        assert getSplitLayerName('rails', 'layer', railway_id) == 'rails_Railways'
+    assert getSplitLayerName('rails', 'layer', None) == 'rails_Railways'
+
+
+@pytest.mark.parametrize('output_layout', output_layouts)
+def test_split_output_layouts(tmp_path, output_layout):
+    ogr = pytest.importorskip('osgeo.ogr')
+    from vector_output import SplitOutput
+    output_format = 'shp' if output_layout == 'files' else 'gpkg'
+    split_output = SplitOutput(str(tmp_path), 'rails', output_format, output_layout, None, ogr.wkbPolygon,
+                               [("railway", ogr.OFTString)])
+    for railway_id in ['1', '1', '2']:
+        str_error, output_layer = split_output.getLayer(railway_id)
+        assert not str_error
+        feature = ogr.Feature(output_layer.getLayerDefinition())
+        feature.SetField("railway", railway_id)
+        feature.SetGeometry(ogr.CreateGeometryFromWkt('POLYGON ((0 0,1 0,1 1,0 0))'))
+        output_layer.createFeature(feature)
+    split_output.close()
+    counts = {}
+    for railway_id in ['1', '2']:
+        ds = ogr.Open(getSplitFilePath(str(tmp_path), 'rails', output_format, output_layout, railway_id))
+        layer = ds.GetLayerByName(getSplitLayerName('rails', output_layout, railway_id))
+        layer.SetAttributeFilter("railway = '{}'".format(railway_id))
+        counts[railway_id] = layer.GetFeatureCount()
+        ds = None
+    assert counts == {'1': 2, '2': 1}
@@ -0,0 +1,59 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+import os
+
+from tile_catalog import TileCatalog, getStatusesFrom, status_pending, status_predicted, status_joined
+
+
+def addImage(catalog, image):
+    tiles = []
+    for row in range(1, 3):
+        for column in range(1, 3):
+            tiles.append({'row': row, 'column': column,
+                          'box': [(column - 1) * 640, (row - 1) * 640, column * 640, row * 640],
+                          'file': image + '_row_' + str(row) + '_column_' + str(column) + '.jpg'})
+    catalog.addTiles(image, tiles)
+
+
+def test_statuses_order():
+    assert getStatusesFrom(status_pending) == [status_pending, status_predicted, status_joined]
+    assert getStatusesFrom(status_predicted) == [status_predicted, status_joined]
+    assert getStatusesFrom(status_joined) == [status_joined]
+
+
+def test_tiles_ordered_by_row_and_column(tmp_path):
+    catalog = TileCatalog(str(tmp_path / 'catalog.sqlite'))
+    addImage(catalog, 'image_1')
+    tiles = catalog.getImages()['image_1']
+    assert [(tile['row'], tile['column']) for tile in tiles] == [(1, 1), (1, 2), (2, 1), (2, 2)]
+    assert all(tile['status'] == status_pending for tile in tiles)
+    catalog.close()
+
+
+def test_predict_join_rerun(tmp_path):
+    catalog_file = str(tmp_path / 'catalog.sqlite')
+    catalog = TileCatalog(catalog_file)
+    addImage(catalog, 'image_1')
+    addImage(catalog, 'image_2')
+    # prediction of all images, as PredictWktFormat
+    images = catalog.getImages(exclude_status=status_predicted)
+    assert sorted(images.keys()) == ['image_1', 'image_2']
+    for image in images.keys():
+        catalog.setImageStatus(image, status_predicted, 'prediction_file', os.path.join('out', image + '.txt'))
+    # join of predicted images, as CreateSegmentedObjectsWktForOriginalImageFromTiledImages
+    images = catalog.getImages(exclude_status=status_joined)
+    assert sorted(images.keys()) == ['image_1', 'image_2']
+    catalog.setImageStatus('image_1', status_joined, 'joined_file', os.path.join('out', 'image_1.txt'))
+    catalog.close()
+    # re-run of both stages in a new connection
+    catalog = TileCatalog(catalog_file)
+    assert catalog.getImages(exclude_status=status_predicted) == {}
+    assert list(catalog.getImages(exclude_status=status_joined).keys()) == ['image_2']
+    catalog.setImageStatus('image_2', status_joined, 'joined_file', os.path.join('out', 'image_2.txt'))
+    assert catalog.getImages(exclude_status=status_predicted) == {}
+    assert catalog.getImages(exclude_status=status_joined) == {}
+    # new tiles of an image are pending again
+    addImage(catalog, 'image_1')
+    assert list(catalog.getImages(exclude_status=status_predicted).keys()) == ['image_1']
+    catalog.close()
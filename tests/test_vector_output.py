@@ -0,0 +1,44 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+import pytest
+
+ogr = pytest.importorskip('osgeo.ogr')
+
+from vector_output import createVectorOutput, getLayerName
+
+
+def writeFeatures(file_path, number_of_features, batch_size):
+    str_error, output = createVectorOutput(file_path, batch_size)
+    assert not str_error
+    output_layer = output.createLayer(getLayerName(file_path), None, ogr.wkbPolygon, [("id", ogr.OFTInteger)])
+    for feature_id in range(number_of_features):
+        feature = ogr.Feature(output_layer.getLayerDefinition())
+        feature.SetField("id", feature_id)
+        feature.SetGeometry(ogr.CreateGeometryFromWkt('POLYGON (({0} 0,{1} 0,{1} 1,{0} 0))'.format(feature_id,
+                                                                                                 feature_id + 1)))
+        output_layer.createFeature(feature)
+    output.close()
+
+
+def readIds(file_path):
+    ds = ogr.Open(file_path)
+    ids = sorted([feature.GetField("id") for feature in ds.GetLayer()])
+    ds = None
+    return ids
+
+
+@pytest.mark.parametrize('file_extension', ['.shp', '.gpkg', '.fgb'])
+@pytest.mark.parametrize('batch_size', [None, 1, 7, 10000])
+def test_all_features_written_in_batches(tmp_path, file_extension, batch_size):
+    file_path = str(tmp_path / ('polygons' + file_extension))
+    writeFeatures(file_path, 25, batch_size)
+    assert readIds(file_path) == list(range(25))
+    # an existing output is replaced
+    writeFeatures(file_path, 3, batch_size)
+    assert readIds(file_path) == [0, 1, 2]
+
+
+def test_invalid_output_extension(tmp_path):
+    str_error, output = createVectorOutput(str(tmp_path / 'polygons.txt'))
+    assert str_error and output is None
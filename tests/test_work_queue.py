@@ -0,0 +1,75 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+import os
+import time
+from multiprocessing import Process
+
+from work_queue import SharedWorkQueue, lease_file_extension
+
+units = ['image_' + str(unit_index) for unit_index in range(40)]
+
+
+def processUnits(queue_path, node_id, output_file_path):
+    # short lease time, units leased by the other node are checked again after half a second
+    queue = SharedWorkQueue(queue_path, node_id, 2.)
+    with open(output_file_path, 'w') as output_file:
+        for unit in queue.iterateUnits(units):
+            time.sleep(0.01)
+            queue.renew(unit)
+            output_file.write(unit + '\n')
+            output_file.flush()
+            queue.complete(unit)
+
+
+def test_two_workers_same_queue(tmp_path):
+    queue_path = str(tmp_path / 'queue')
+    workers = []
+    for node_index in range(2):
+        output_file_path = str(tmp_path / ('node_' + str(node_index) + '.txt'))
+        workers.append((Process(target=processUnits, args=(queue_path, 'node_' + str(node_index),
+                                                           output_file_path)), output_file_path))
+    for worker, output_file_path in workers:
+        worker.start()
+    processed_units = []
+    for worker, output_file_path in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+        with open(output_file_path, 'r') as output_file:
+            processed_units.extend(output_file.read().split())
+    # each unit processed once, by one of the nodes
+    assert sorted(processed_units) == sorted(units)
+    queue = SharedWorkQueue(queue_path, 'node_2', 60.)
+    assert all(queue.isDone(unit) for unit in units)
+    assert not any(file_name.endswith(lease_file_extension) for file_name in os.listdir(queue_path))
+
+
+def test_released_unit_claimed_by_other_node(tmp_path):
+    first_queue = SharedWorkQueue(str(tmp_path), 'node_0', 60.)
+    second_queue = SharedWorkQueue(str(tmp_path), 'node_1', 60.)
+    assert list(first_queue.iterateUnits([])) == []
+    assert first_queue.claim('image_0')
+    assert not second_queue.claim('image_0')
+    # release of a lease from other node is ignored
+    second_queue.release('image_0')
+    assert first_queue.getOwner('image_0') == 'node_0'
+    first_queue.release('image_0')
+    assert list(second_queue.iterateUnits(['image_0'])) == ['image_0']
+    second_queue.complete('image_0')
+    assert not first_queue.claim('image_0')
+    assert list(first_queue.iterateUnits(['image_0'])) == []
+
+
+def test_stale_lease_recovered(tmp_path):
+    dead_queue = SharedWorkQueue(str(tmp_path), 'node_0', 60.)
+    queue = SharedWorkQueue(str(tmp_path), 'node_1', 60.)
+    assert dead_queue.claim('image_0')
+    assert not queue.claim('image_0')
+    lease_file_path = queue.getFilePath('image_0', lease_file_extension)
+    old_time = time.time() - 120.
+    os.utime(lease_file_path, (old_time, old_time))
+    assert queue.claim('image_0')
+    assert queue.getOwner('image_0') == 'node_1'
+    # the dead node can not renew a recovered lease
+    assert not dead_queue.renew('image_0')
+    assert queue.renew('image_0')
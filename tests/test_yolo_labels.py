@@ -0,0 +1,57 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+import numpy as np
+import pytest
+
+from yolo_labels import parseYoloLabels, readYoloLabels
+
+
+def test_parse_labels():
+    text = "0 0.1 0.2 0.3 0.4 0.5 0.6\n\n  \n2 0.7 0.8 0.9 1.0 0.5 0.5 0.25 0.25\r\n"
+    classes, offsets, points = parseYoloLabels(text)
+    assert classes.tolist() == [0, 2]
+    assert offsets.tolist() == [0, 3, 7]
+    assert np.allclose(points[offsets[0]:offsets[1]], [[0.1, 0.2], [0.3, 0.4], [0.5, 0.6]])
+    assert np.allclose(points[offsets[1]:offsets[2]], [[0.7, 0.8], [0.9, 1.0], [0.5, 0.5], [0.25, 0.25]])
+
+
+def test_parse_odd_and_empty():
+    # a last odd coordinate is ignored
+    classes, offsets, points = parseYoloLabels("1 0.1 0.2 0.3\n")
+    assert classes.tolist() == [1]
+    assert offsets.tolist() == [0, 1]
+    assert np.allclose(points, [[0.1, 0.2]])
+    classes, offsets, points = parseYoloLabels("")
+    assert classes.size == 0
+    assert offsets.tolist() == [0]
+    assert points.shape == (0, 2)
+
+
+def test_parse_invalid_values():
+    with pytest.raises(ValueError):
+        parseYoloLabels("0 0.1 x 0.3 0.4\n")
+
+
+def test_read_labels(tmp_path):
+    file_path = tmp_path / 'labels.txt'
+    file_path.write_text("3 0.5 0.5 0.6 0.5 0.6 0.6\n")
+    classes, offsets, points = readYoloLabels(str(file_path))
+    assert classes.tolist() == [3]
+    assert points.shape == (3, 2)
+
+
+def test_parse_equals_line_by_line():
+    generator = np.random.default_rng(8)
+    lines = []
+    for line_index in range(200):
+        number_of_points = int(generator.integers(3, 40))
+        values = ' '.join('{:.6f}'.format(value) for value in generator.uniform(0., 1., 2 * number_of_points))
+        separator = '\t' if line_index % 7 == 0 else ' '
+        lines.append(str(line_index % 5) + separator + values)
+    classes, offsets, points = parseYoloLabels('\n'.join(lines))
+    assert classes.size == len(lines)
+    for line_index, line in enumerate(lines):
+        values = [float(value) for value in line.split()]
+        assert classes[line_index] == int(values[0])
+        assert np.array_equal(points[offsets[line_index]:offsets[line_index + 1]].ravel(), values[1:])
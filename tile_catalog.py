@@ -0,0 +1,104 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+# SQLite catalog of image tiles created by CreateImageTiles and used by PredictWktFormat
+# and CreateSegmentedObjectsWktForOriginalImageFromTiledImages instead of listing and
+# parsing file names of the tiles path in each run
+
+import sqlite3
+
+status_pending = 'pending'
+status_predicted = 'predicted'
+status_joined = 'joined'
+# statuses in processing order, a stage skips images with its status or a later one
+statuses = [status_pending, status_predicted, status_joined]
+
+tile_fields = ['id', 'image', 'row', 'column', 'first_row', 'first_column', 'width', 'height',
+               'file', 'label_file', 'prediction_file', 'joined_file', 'status']
+
+
+def getStatusesFrom(status):
+    return statuses[statuses.index(status):]
+
+
+class TileCatalog(object):
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.connection = sqlite3.connect(file_path, timeout=60.)
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS tiles ("
+                                "id INTEGER PRIMARY KEY, "
+                                "image TEXT NOT NULL, "
+                                "tile_row INTEGER NOT NULL, "
+                                "tile_column INTEGER NOT NULL, "
+                                "first_row INTEGER, "
+                                "first_column INTEGER, "
+                                "width INTEGER, "
+                                "height INTEGER, "
+                                "file TEXT, "
+                                "label_file TEXT, "
+                                "prediction_file TEXT, "
+                                "joined_file TEXT, "
+                                "status TEXT NOT NULL DEFAULT 'pending', "
+                                "UNIQUE (image, tile_row, tile_column))")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS tiles_status ON tiles (status, image)")
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def addTiles(self, image, tiles):
+        # tiles with row, column, box (first column, first row, last column, last row) and file
+        values = []
+        for tile in tiles:
+            box = tile['box']
+            values.append((image, tile['row'], tile['column'], box[1], box[0],
+                           box[2] - box[0], box[3] - box[1], tile['file']))
+        with self.connection:
+            self.connection.execute("DELETE FROM tiles WHERE image = ?", (image,))
+            self.connection.executemany("INSERT INTO tiles (image, tile_row, tile_column, first_row, first_column, "
+                                        "width, height, file) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", values)
+
+    def getImages(self, status=None, exclude_status=None, image=None):
+        # dictionary of image name to list of tiles, ordered by row and column
+        sql = ("SELECT id, image, tile_row, tile_column, first_row, first_column, width, height, "
+               "file, label_file, prediction_file, joined_file, status FROM tiles")
+        conditions = []
+        parameters = []
+        if image is not None:
+            conditions.append("image = ?")
+            parameters.append(image)
+        if status is not None:
+            conditions.append("status = ?")
+            parameters.append(status)
+        if exclude_status is not None:
+            # images with any tile in exclude_status or in a later status
+            later_statuses = getStatusesFrom(exclude_status)
+            conditions.append("image NOT IN (SELECT image FROM tiles WHERE status IN ("
+                              + ", ".join(["?"] * len(later_statuses)) + "))")
+            parameters.extend(later_statuses)
+        if len(conditions) > 0:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY image, tile_row, tile_column"
+        images = {}
+        for values in self.connection.execute(sql, parameters):
+            tile = dict(zip(tile_fields, values))
+            if not tile['image'] in images:
+                images[tile['image']] = []
+            images[tile['image']].append(tile)
+        return images
+
+    def setImageStatus(self, image, status, field=None, file_path=None):
+        with self.connection:
+            if field is None:
+                self.connection.execute("UPDATE tiles SET status = ? WHERE image = ?", (status, image))
+            else:
+                # field is one of the output paths: label_file, prediction_file or joined_file
+                self.connection.execute("UPDATE tiles SET status = ?, " + field + " = ? WHERE image = ?",
+                                        (status, file_path, image))
+
+    def setLabelFiles(self, label_files):
+        # list of (tile id, label file)
+        with self.connection:
+            self.connection.executemany("UPDATE tiles SET label_file = ? WHERE id = ?",
+                                        [(label_file, tile_id) for tile_id, label_file in label_files])
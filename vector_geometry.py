@@ -0,0 +1,55 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+# OGR geometry functions shared by the railway, evaluation and change detection scripts
+
+import struct
+import numpy as np
+from osgeo import ogr
+
+
+def getValidGeometry(geom):
+    if geom is None or geom.IsEmpty():
+        return None
+    if not geom.IsValid():
+        geom = geom.Buffer(0.)
+        if geom is None or geom.IsEmpty():
+            return None
+    return geom
+
+
+def getBox(geom):
+    # ogr envelope is (min x, max x, min y, max y)
+    envelope = geom.GetEnvelope()
+    return [envelope[0], envelope[2], envelope[1], envelope[3]]
+
+
+def getLineStringWkb(points, measures=None):
+    # ISO WKB of a 2D LineString, or LineStringM with measures, from NumPy arrays
+    geometry_type = ogr.wkbLineString
+    coordinates = points[:, 0:2]
+    if measures is not None:
+        geometry_type = ogr.wkbLineStringM
+        coordinates = np.column_stack((coordinates, measures))
+    return struct.pack('<BII', 1, geometry_type, coordinates.shape[0]) \
+        + np.ascontiguousarray(coordinates, dtype='<f8').tobytes()
+
+
+def getPolygonWkb(ring):
+    # little endian polygon with one ring
+    return struct.pack('<BIII', 1, ogr.wkbPolygon, 1, ring.shape[0]) + ring.astype('<f8').tobytes()
+
+
+def getPolygons(geom):
+    # polygon parts of a geometry for polygon layers, results of Intersection or Difference
+    # may be multipolygons or collections with lines and points, which are not used
+    polygons = []
+    if geom is None or geom.IsEmpty():
+        return polygons
+    geometry_type = ogr.GT_Flatten(geom.GetGeometryType())
+    if geometry_type == ogr.wkbPolygon:
+        polygons.append(geom.Clone())
+    elif geometry_type == ogr.wkbMultiPolygon or geometry_type == ogr.wkbGeometryCollection:
+        for part_index in range(geom.GetGeometryCount()):
+            polygons.extend(getPolygons(geom.GetGeometryRef(part_index)))
+    return polygons
@@ -0,0 +1,174 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+# Output vector files of the railway tools, format from file extension: ESRI Shapefile,
+# GeoPackage or FlatGeobuf. Features are written in transactions of batch_size features
+# where the driver supports them, or in a single transaction without batch_size, and spatial
+# and attribute indexes are created when closing
+
+import os
+from osgeo import ogr
+
+from split_layout import getSplitFilePath, getSplitLayerName
+
+output_drivers = {'.shp': 'ESRI Shapefile', '.gpkg': 'GPKG', '.fgb': 'FlatGeobuf'}
+
+
+def getDriverName(file_path):
+    return output_drivers.get(os.path.splitext(file_path)[1].lower())
+
+
+class OutputLayer(object):
+    def __init__(self, output, layer):
+        self.output = output
+        self.layer = layer
+        self.layer_definition = layer.GetLayerDefn()
+        self.attribute_indexes = []
+
+    def getLayerDefinition(self):
+        return self.layer_definition
+
+    def createAttributeIndex(self, field_name):
+        # created when closing the output, after all features
+        self.attribute_indexes.append(field_name)
+
+    def createFeature(self, feature):
+        self.output.startTransaction()
+        self.layer.CreateFeature(feature)
+        self.output.number_of_features_in_transaction += 1
+        if self.output.batch_size is not None \
+                and self.output.number_of_features_in_transaction >= self.output.batch_size:
+            self.output.commitTransaction()
+
+
+class VectorOutput(object):
+    def __init__(self, file_path, batch_size=10000):
+        self.file_path = file_path
+        self.batch_size = batch_size
+        self.driver_name = getDriverName(file_path)
+        self.driver = ogr.GetDriverByName(self.driver_name)
+        self.ds = self.driver.CreateDataSource(file_path)
+        self.use_transactions = self.ds.TestCapability(ogr.ODsCTransactions)
+        self.in_transaction = False
+        self.number_of_features_in_transaction = 0
+        self.layers = []
+
+    def createLayer(self, layer_name, crs, geom_type, fields):
+        # fields as list of (name, ogr field type)
+        if self.batch_size is not None:
+            self.commitTransaction()
+        options = []
+        if self.driver_name == 'GPKG' or self.driver_name == 'FlatGeobuf':
+            options.append('SPATIAL_INDEX=YES')
+        layer = self.ds.CreateLayer(layer_name, crs, geom_type=geom_type, options=options)
+        for field_name, field_type in fields:
+            layer.CreateField(ogr.FieldDefn(field_name, field_type))
+        output_layer = OutputLayer(self, layer)
+        self.layers.append(output_layer)
+        return output_layer
+
+    def startTransaction(self):
+        if self.use_transactions and not self.in_transaction:
+            self.ds.StartTransaction()
+            self.in_transaction = True
+
+    def commitTransaction(self):
+        if self.in_transaction:
+            self.ds.CommitTransaction()
+            self.in_transaction = False
+        self.number_of_features_in_transaction = 0
+
+    def close(self):
+        self.commitTransaction()
+        for output_layer in self.layers:
+            layer_name = output_layer.layer.GetName()
+            if self.driver_name == 'ESRI Shapefile':
+                self.ds.ExecuteSQL("CREATE SPATIAL INDEX ON " + layer_name)
+            for field_name in output_layer.attribute_indexes:
+                if self.driver_name == 'GPKG':
+                    self.ds.ExecuteSQL('CREATE INDEX "idx_{}_{}" ON "{}" ("{}")'.format(layer_name, field_name,
+                                                                                     layer_name, field_name))
+                elif self.driver_name == 'ESRI Shapefile':
+                    self.ds.ExecuteSQL("CREATE INDEX ON " + layer_name + " USING " + field_name)
+        self.layers = []
+        self.ds = None
+
+
+def createVectorOutput(file_path, batch_size=10000):
+    # removes an existing file, returns error message and output, all features in a single
+    # transaction if batch_size is None
+    str_error = ''
+    driver_name = getDriverName(file_path)
+    if driver_name is None:
+        str_error = "Not valid output file extension, shp, gpkg or fgb:\n{}".format(file_path)
+        return str_error, None
+    driver = ogr.GetDriverByName(driver_name)
+    if driver is None:
+        str_error = "Not available GDAL driver {} for output file:\n{}".format(driver_name, file_path)
+        return str_error, None
+    if os.path.exists(file_path):
+        driver.DeleteDataSource(file_path)
+    if os.path.exists(file_path):
+        str_error = "Error removing existing output file:\n{}".format(file_path)
+        return str_error, None
+    return str_error, VectorOutput(file_path, batch_size)
+
+
+def getLayerName(file_path):
+    return os.path.splitext(os.path.basename(file_path))[0]
+
+
+class SplitOutput(object):
+    # output of polygons split by railway in output_path, files or layers named from base_name
+    def __init__(self, output_path, base_name, output_format, output_layout, crs, geom_type, fields):
+        self.output_path = output_path
+        self.base_name = base_name
+        self.output_format = output_format
+        self.output_layout = output_layout
+        self.crs = crs
+        self.geom_type = geom_type
+        self.fields = fields
+        self.output = None
+        self.layers = {}
+        self.railway_id = None
+
+    def getFilePath(self, railway_id):
+        return getSplitFilePath(self.output_path, self.base_name, self.output_format, self.output_layout, railway_id)
+
+    def getLayer(self, railway_id):
+        # returns error message and output layer of railway_id
+        str_error = ''
+        if self.output_layout == 'files':
+            if railway_id == self.railway_id:
+                return str_error, self.layers[railway_id]
+            # one file by railway, an existing one is replaced
+            if self.output is not None:
+                self.output.close()
+            self.layers = {}
+            str_error, self.output = createVectorOutput(self.getFilePath(railway_id))
+            if str_error:
+                return str_error, None
+            name = getSplitLayerName(self.base_name, self.output_layout, railway_id)
+            self.layers[railway_id] = self.output.createLayer(name, self.crs, self.geom_type, self.fields)
+            self.railway_id = railway_id
+            return str_error, self.layers[railway_id]
+        if self.output is None:
+            # one GeoPackage in a single transaction
+            str_error, self.output = createVectorOutput(self.getFilePath(railway_id), None)
+            if str_error:
+                return str_error, None
+        if self.output_layout == 'layer':
+            railway_id = None
+        if not railway_id in self.layers:
+            name = getSplitLayerName(self.base_name, self.output_layout, railway_id)
+            output_layer = self.output.createLayer(name, self.crs, self.geom_type, self.fields)
+            if railway_id is None:
+                output_layer.createAttributeIndex("railway")
+            self.layers[railway_id] = output_layer
+        return str_error, self.layers[railway_id]
+
+    def close(self):
+        if self.output is not None:
+            self.output.close()
+        self.output = None
+        self.layers = {}
@@ -0,0 +1,126 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+import os
+import time
+import socket
+
+lease_file_extension = '.lease'
+recover_file_extension = '.recover'
+done_file_extension = '.done'
+
+
+def getDefaultNodeId():
+    return socket.gethostname() + '_' + str(os.getpid())
+
+
+class SharedWorkQueue(object):
+    # Work queue over a shared directory (NFS, SMB) without broker. Each unit is claimed
+    # by the exclusive creation of a lease file, the owner refreshes its modification time
+    # while working and a lease older than lease_time is considered from a dead node and
+    # recovered by other nodes. A done file marks finished units
+    def __init__(self, queue_path, node_id, lease_time):
+        self.queue_path = queue_path
+        self.node_id = node_id
+        self.lease_time = lease_time
+        if not os.path.exists(self.queue_path):
+            os.makedirs(self.queue_path, exist_ok=True)
+
+    def getFilePath(self, unit, extension):
+        return os.path.join(self.queue_path, unit + extension)
+
+    def isDone(self, unit):
+        return os.path.exists(self.getFilePath(unit, done_file_extension))
+
+    def isStale(self, file_path):
+        try:
+            return (time.time() - os.path.getmtime(file_path)) > self.lease_time
+        except FileNotFoundError:
+            return False
+
+    def createFile(self, file_path):
+        try:
+            fd = os.open(file_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        os.write(fd, (self.node_id + ';' + str(time.time())).encode('utf-8'))
+        os.close(fd)
+        return True
+
+    def getOwner(self, unit):
+        try:
+            with open(self.getFilePath(unit, lease_file_extension), 'r') as lease_file:
+                return lease_file.read().split(';')[0]
+        except FileNotFoundError:
+            return ''
+
+    def recover(self, unit):
+        # only the node holding the recover file removes a stale lease, so a fresh lease
+        # created by other node after recovering is never removed
+        lease_file_path = self.getFilePath(unit, lease_file_extension)
+        recover_file_path = self.getFilePath(unit, recover_file_extension)
+        if self.isStale(recover_file_path):
+            try:
+                os.remove(recover_file_path)
+            except FileNotFoundError:
+                pass
+        if not self.createFile(recover_file_path):
+            return False
+        try:
+            if self.isStale(lease_file_path):
+                os.remove(lease_file_path)
+                print("Recovered stale lease for unit: {}".format(unit))
+        finally:
+            os.remove(recover_file_path)
+        return True
+
+    def claim(self, unit):
+        if self.isDone(unit):
+            return False
+        lease_file_path = self.getFilePath(unit, lease_file_extension)
+        if self.createFile(lease_file_path):
+            if self.isDone(unit):
+                self.release(unit)
+                return False
+            return True
+        if not self.isStale(lease_file_path):
+            return False
+        if not self.recover(unit):
+            return False
+        return self.claim(unit)
+
+    def renew(self, unit):
+        if self.getOwner(unit) != self.node_id:
+            return False
+        os.utime(self.getFilePath(unit, lease_file_extension))
+        return True
+
+    def release(self, unit):
+        if self.getOwner(unit) != self.node_id:
+            return
+        try:
+            os.remove(self.getFilePath(unit, lease_file_extension))
+        except FileNotFoundError:
+            pass
+
+    def complete(self, unit):
+        self.createFile(self.getFilePath(unit, done_file_extension))
+        self.release(unit)
+
+    def iterateUnits(self, units):
+        # units claimed by this node, units leased by other nodes are tried again until
+        # they are done or their leases become stale. A unit released by this node after
+        # a failure is not yielded again
+        pending_units = list(units)
+        while len(pending_units) > 0:
+            leased_units = []
+            for unit in pending_units:
+                if self.isDone(unit):
+                    continue
+                if not self.claim(unit):
+                    leased_units.append(unit)
+                    continue
+                yield unit
+            pending_units = [unit for unit in leased_units if not self.isDone(unit)]
+            if len(pending_units) > 0:
+                time.sleep(min(self.lease_time / 4., 30.))
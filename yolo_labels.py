@@ -0,0 +1,48 @@
+# authors:
+# David Hernandez Lopez, david.hernandez@uclm.es
+
+# YOLO segmentation label files, one polygon for each line:
+# class x1 y1 x2 y2 ... with coordinates normalized to image size
+
+import numpy as np
+
+whitespace_bytes = np.frombuffer(b' \t\n\r\x0b\x0c', dtype=np.uint8)
+
+
+def parseYoloLabels(text):
+    # the whole text is tokenized in one call, values by line are counted on the bytes
+    try:
+        values = np.array(text.split(), dtype=np.float64)
+    except ValueError:
+        raise ValueError("Invalid values in labels")
+    data = np.frombuffer(text.encode('utf-8'), dtype=np.uint8)
+    is_space = np.isin(data, whitespace_bytes)
+    token_starts = ~is_space
+    token_starts[1:] &= is_space[:-1]
+    token_lines = np.cumsum(data == ord('\n'))[token_starts]
+    number_of_values = np.bincount(token_lines)
+    # empty lines are ignored
+    number_of_values = number_of_values[number_of_values > 0]
+    if values.size != int(np.sum(number_of_values)):
+        raise ValueError("Invalid values in labels")
+    number_of_lines = number_of_values.size
+    line_starts = np.cumsum(number_of_values) - number_of_values
+    classes = values[line_starts].astype(np.int64)
+    # a last odd coordinate is ignored
+    number_of_points = (number_of_values - 1) // 2
+    offsets = np.zeros(number_of_lines + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(number_of_points)
+    point_lines = np.repeat(np.arange(number_of_lines), number_of_points)
+    point_ranks = np.arange(offsets[-1]) - offsets[:-1][point_lines]
+    x_indexes = line_starts[point_lines] + 1 + 2 * point_ranks
+    points = np.empty((offsets[-1], 2), dtype=np.float64)
+    points[:, 0] = values[x_indexes]
+    points[:, 1] = values[x_indexes + 1]
+    return classes, offsets, points
+
+
+def readYoloLabels(file_path):
+    # classes, offsets of each polygon in points and points as arrays
+    with open(file_path, 'r') as input_file:
+        text = input_file.read()
+    return parseYoloLabels(text)